@@ -0,0 +1,62 @@
+# airflow/benchmarks/corr_zscore_benchmark.py
+# export PYTHONPATH=$(pwd)/dags:$(pwd)/unit_tests/utils_tests
+# python benchmarks/corr_zscore_benchmark.py [--days 30 182 365 1095] [--jumps-per-month 4] [--repeat 3]
+
+"""
+Weight jumps correction benchmark (ETL DAG, Clean.Scale.Data, correct_weight_variations) on synthetic minute-resolution scale series
+- loop: corr_zscore_loop (previous corr_zscore, rewrites the tail of the series on each jump, unit_tests/utils_tests/reference_scale_functions.py)
+- vectorized: corr_zscore (jumps mask & cumulative sum of the jumps)
+"""
+
+
+# Lib
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from reference_scale_functions import corr_zscore_loop
+from utils.scale_functions import corr_zscore
+
+
+
+def minute_weight_series(days:int, jumps_per_month:int) -> np.ndarray:
+    """
+    One weight per minute (random walk) with harvests & hive additions (large jumps)
+    """
+    rng = np.random.default_rng(0)
+    size = days * 24 * 60
+    weights = 20000 + rng.normal(0, 5, size).cumsum()
+    for index in rng.integers(1, size, max(1, days * jumps_per_month // 30)):
+        weights[index:] += rng.choice([-1, 1]) * rng.uniform(2000, 8000)
+    return weights
+
+
+def measure(func, weights:np.ndarray, repeat:int) -> tuple:
+    timings = []
+    for _ in range(repeat):
+        series = weights.copy()     # corr_zscore_loop modifies its input
+        before_time = time.perf_counter()
+        corrected = func(series)
+        timings.append(time.perf_counter() - before_time)
+    return statistics.median(timings), corrected
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Weight jumps correction benchmark")
+    parser.add_argument("--days", type = int, nargs = "+", default = [30, 182, 365, 1095])
+    parser.add_argument("--jumps-per-month", type = int, default = 4)
+    parser.add_argument("--repeat", type = int, default = 3)
+    args = parser.parse_args()
+
+    for days in args.days:
+        weights = minute_weight_series(days, args.jumps_per_month)
+        loop_time, loop_corrected = measure(corr_zscore_loop, weights, args.repeat)
+        vectorized_time, vectorized_corrected = measure(corr_zscore, weights, args.repeat)
+
+        # Same corrected weights (the cumulative sum only reorders the float additions)
+        assert np.allclose(vectorized_corrected, loop_corrected, rtol = 0, atol = 1e-6)
+
+        print(f"{days:5} days ({len(weights):>9} weights)   loop {loop_time * 1000:10.1f} ms   vectorized {vectorized_time * 1000:8.1f} ms   x{loop_time / vectorized_time:.0f}")
@@ -0,0 +1,86 @@
+# airflow/benchmarks/ingestion_benchmark.py
+# export PYTHONPATH=$(pwd)/dags
+# python benchmarks/ingestion_benchmark.py [--files 3000] [--rows 200] [--workers 8] [--repeat 3]
+
+"""
+Raw scale files ingestion benchmark (ETL DAG, Load.Combine.Raw.Files) on a synthetic directory of provider files
+- baseline: what the task did before (pd.read_csv one file after another, pd.concat in the loop)
+- parallel: load_and_combine_dataframes (pyarrow csv readers in a thread pool, explicit schema, one concat)
+"""
+
+
+# Lib
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.generic_functions import load_and_combine_dataframes
+
+
+
+def write_provider_files(dirpath:str, files:int, rows:int) -> None:
+    """
+    Provider .txt files with the scale columns, one scale per file
+    """
+    rng = np.random.default_rng(0)
+    times = pd.date_range("2023-04-01", periods = rows, freq = "h").strftime("%Y-%m-%d %H:%M:%S")
+    for index in range(files):
+        pd.DataFrame({
+            "const": rng.choice(["BEE", "LAB", "ABC"]),
+            "bal": f"bal_{index}",
+            "name": f"scale {index}",
+            "ruche": f"ruche_{index % 50}",
+            "poids": np.round(20000 + rng.normal(0, 500, rows).cumsum(), 1),
+            "lat": 43 + rng.random(),
+            "lon": 4 + rng.random(),
+            "qloc": rng.integers(0, 3, rows),
+            "activ": rng.integers(0, 2, rows),
+            "time": times,
+        }).to_csv(os.path.join(dirpath, f"provider_{index}.txt"), index = False)
+
+
+def baseline_load(dirpath:str) -> pd.DataFrame:
+    combined_df = pd.DataFrame()
+    for file in os.listdir(dirpath):
+        combined_df = pd.concat([combined_df, pd.read_csv(os.path.join(dirpath, file))])
+    return combined_df
+
+
+def measure(func, repeat:int) -> tuple:
+    timings = []
+    for _ in range(repeat):
+        before_time = time.perf_counter()
+        df = func()
+        timings.append(time.perf_counter() - before_time)
+    return statistics.median(timings), df
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Raw scale files ingestion benchmark")
+    parser.add_argument("--files", type = int, default = 3000)
+    parser.add_argument("--rows", type = int, default = 200, help = "Rows per file")
+    parser.add_argument("--workers", type = int, default = os.cpu_count() or 1)
+    parser.add_argument("--repeat", type = int, default = 3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as dirpath:
+        write_provider_files(dirpath, args.files, args.rows)
+        print(f"{args.files} files x {args.rows} rows")
+
+        baseline_time, baseline_df = measure(lambda: baseline_load(dirpath), args.repeat)
+        results = {"baseline (sequential, concat in loop)": baseline_time}
+        for workers in sorted({1, args.workers}):
+            results[f"parallel ({workers} workers)"], parallel_df = measure(lambda: load_and_combine_dataframes(dirpath, workers = workers), args.repeat)
+
+        # Same rows & values (bal is typed as a string by the schema)
+        assert len(parallel_df) == len(baseline_df)
+        assert np.allclose(np.sort(parallel_df["poids"].to_numpy()), np.sort(baseline_df["poids"].to_numpy()))
+
+        for name, median_time in results.items():
+            print(f"{name:40} {median_time * 1000:10.1f} ms   x{baseline_time / median_time:.1f}")
@@ -4,12 +4,12 @@
 ETL DAG - Execute ETL pipeline to process raw providers scale data to cleaned data
 
 Steps:
-1. Detect new files in raw data directory
+1. Detect new files in raw data directory and claim them (files already ingested are skipped)
 2. Load raw data into staging table
 3. Clean data
 4. Add weather data
 5. Add cartographic data
-6. Save cleaned data to final table
+6. Merge cleaned data into the final table, archive the claimed files and record them in the ingestion manifest
 """
 
 # LIB
@@ -21,15 +21,19 @@ import datetime
 
 from utils.callbacks import alert_on_failure
 from utils.config import ETL_PIPELINE_SCHEDULER as DAG_SCHEDULER
-from utils.config import RAW_DATA_DIR, PROCESSING_DATA_DIR, CLEANED_DATA_DIR, ARCHIVES_DATA_DIR, TEXT_FILE_PATTERN
+from utils.config import RAW_DATA_DIR, PROCESSING_DATA_DIR, CLEANED_DATA_DIR, TEXT_FILE_PATTERN
 from utils.config import WEIGHT_INTERVAL_MIN, WEIGHT_INTERVAL_MAX, CLEAN_SCALE_MIN_DATE_TO_KEEP
-from utils.config import API_ROUTE_CARTO_URL, CARTO_DATA_RADIUS_REQUEST
+from utils.config import API_ROUTE_CARTO_SUMMARY_URL, CARTO_DATA_RADIUS_REQUEST, CARTO_DATA_YEAR, CARTO_SUMMARY_BATCH_SIZE
 from utils.operators import generate_task_file_sensor, generate_task_python_operator, generate_task_bash_operator, generate_task_trigger_dag_operator
 
 
 
 # Generic functions
-from utils.generic_functions import load_file_as_dataframe, load_and_combine_dataframes, save_df_to_file, cleanup_xcom, create_aggregated_df, join_dataframes
+from utils.generic_functions import load_and_combine_dataframes, save_df_to_file, cleanup_xcom, create_aggregated_df, join_dataframes
+# Data handoff functions (DataFrames exchanged as run-scoped parquet files, XCom only carries their reference)
+from utils.generic_functions import handoff_output, get_parquet_reference, cleanup_handoff
+# Raw files ingestion functions
+from utils.ingestion_functions import claim_raw_files, archive_claimed_files
 # Scales functions
 from utils.scale_functions import clean_scale_data
 # Weather data functions
@@ -54,12 +58,12 @@ dag_scale_etl_pipeline = DAG(
         ETL DAG - Execute ETL pipeline to process raw providers scale data to cleaned data
 
         Steps:
-        1. Detect new files in raw data directory
+        1. Detect new files in raw data directory and claim them (files already ingested are skipped)
         2. Load raw data into staging table
         3. Clean data
         4. Add weather data
         5. Add cartographic data
-        6. Save cleaned data to final table
+        6. Merge cleaned data into the final table, archive the claimed files and record them in the ingestion manifest
     """
 )
 
@@ -89,16 +93,33 @@ raw_file_sensor = generate_task_file_sensor(dag = dag_scale_etl_pipeline,
 
 
 
+raw_file_claimer = generate_task_python_operator(dag = dag_scale_etl_pipeline,
+                                            task_id = "Claim.Raw.Files",
+                                            python_callable = claim_raw_files,
+                                            op_kwargs = {"raw_dir": RAW_DATA_DIR, "pattern": TEXT_FILE_PATTERN},
+                                            retries = 0,
+                                            trigger_rule = "all_success",
+                                            on_failure_callback = alert_on_failure,
+                                            doc_md = """
+                                                Claim the new raw files for the run (moved to its claim directory), files arriving during the run are left to the next one
+                                                - Files already in the ingestion manifest (same content hash) are archived as duplicates
+                                                - Files left by failed runs (claim directories of the runs no longer running) are claimed again
+                                                - Skip the run if there is no new file
+                                                """
+                                            )
+
+
+
 raw_file_loader = generate_task_python_operator(dag = dag_scale_etl_pipeline,
                                             task_id = f"Load.Combine.Raw.Files",
-                                            python_callable = load_and_combine_dataframes,
-                                            op_kwargs = {"dirpath": RAW_DATA_DIR},
+                                            python_callable = handoff_output(load_and_combine_dataframes),
+                                            op_kwargs = {"dirpath": "{{ ti.xcom_pull(task_ids = 'Claim.Raw.Files')['claim_dir'] }}"},
                                             retries = 3,
                                             retry_delay = datetime.timedelta(seconds = 10),
                                             trigger_rule = "all_success",
                                             on_failure_callback = alert_on_failure,
                                             doc_md = """
-                                                Load and combine raw data files provided by scale partners into a single combined DataFrame
+                                                Load and combine the raw data files claimed by the run into a single combined DataFrame
                                                 - Suceed if the data is loaded and combined successfully
                                                 - Fail if the data loading and combining process fails or if the dataframe is empty
 
@@ -121,7 +142,8 @@ scale_data_cleaner = generate_task_python_operator(dag = dag_scale_etl_pipeline,
                                                    trigger_rule = "all_success",
                                                    on_failure_callback = alert_on_failure,
                                                    doc_md = """
-                                                        Clean scale data by removing outliers and invalid data
+                                                        Clean scale data by removing outliers and invalid data, by chunks then scale by scale (bounded memory)
+                                                        Writes one parquet file per scale (handoff directory)
                                                         - Succeed if the data is cleaned succesfully
                                                         - Fail if the data cleaning process fails or if the resulting dataframe is empty
 
@@ -148,21 +170,6 @@ save_cleaned_scale_data = generate_task_python_operator(dag = dag_scale_etl_pipe
 
 
 
-move_raw_files_to_archives = generate_task_bash_operator(dag = dag_scale_etl_pipeline,
-                                                        task_id = "Move.Raw.Files.To.Archives",
-                                                        bash_command = f"""
-                                                                mkdir -p {ARCHIVES_DATA_DIR}/{datetime.datetime.now().strftime("%Y-%m-%d")}
-                                                                mv {RAW_DATA_DIR}/* {ARCHIVES_DATA_DIR}/{datetime.datetime.now().strftime("%Y-%m-%d")}
-                                                                """,
-                                                        retries = 0,
-                                                        trigger_rule = "all_success",
-                                                        doc_md = """
-                                                                Move raw data files to archives when scale processing is complete
-                                                                """
-                                                        )
-
-
-
 remove_xcom_block_1 = generate_task_python_operator(dag = dag_scale_etl_pipeline,
                                                     task_id = "Remove.Xcom.Block_1",
                                                     python_callable = cleanup_xcom,
@@ -179,23 +186,23 @@ BLOCK 2 - RELOAD CLEANED DATA, AGGREGATE, FETCH DATA AND SAVE
 """
 scale_processing_file_loader_block2 = generate_task_python_operator(dag = dag_scale_etl_pipeline,
                                                                     task_id = f"Load.Cleaned.Scale.Data",
-                                                                    python_callable = load_file_as_dataframe,
+                                                                    python_callable = get_parquet_reference,
                                                                     op_kwargs = {"path": f"{PROCESSING_DATA_DIR}/cleaned_scale_data.parquet"},
                                                                     retries = 3,
                                                                     retry_delay = datetime.timedelta(seconds = 10),
                                                                     trigger_rule = "all_success",
                                                                     on_failure_callback = alert_on_failure,
                                                                     doc_md = """
-                                                                            Load the cleaned scale data parquet file into a DataFrame to continue processing
-                                                                                - Succeed if the file is loaded and the DataFrame is not empty
-                                                                                - Fail if the file cannot be loaded or the DataFrame is empty
+                                                                            Reference the cleaned scale data parquet file (path & schema) to continue processing
+                                                                                - Succeed if the file exists and is not empty
+                                                                                - Fail if the file cannot be read or is empty
                                                                         """
                                                                     )
 
 
 generate_aggregated_scale_data = generate_task_python_operator(dag = dag_scale_etl_pipeline,
                                                                task_id = "AggregatedScale.Data",
-                                                               python_callable = create_aggregated_df,
+                                                               python_callable = handoff_output(create_aggregated_df),
                                                                op_kwargs = {"task_ids": "Load.Cleaned.Scale.Data",
                                                                             "filepath": f"{PROCESSING_DATA_DIR}/cleaned_scale_data.parquet",
                                                                             "groupby_cols": ["date", "const", "bal", "lat", "lon"],
@@ -242,13 +249,13 @@ BLOCK 2a - ADD WEATHER DATA
 """
 prepare_data_to_request_weather_data = generate_task_python_operator(dag = dag_scale_etl_pipeline,
                                                                     task_id = f"Weather.Data.Preparation",
-                                                                    python_callable = get_start_end_date_by_location,
+                                                                    python_callable = handoff_output(get_start_end_date_by_location),
                                                                     op_kwargs = {"task_ids": "AggregatedScale.Data"},
                                                                     retries = 0,
                                                                     trigger_rule = "all_success",
                                                                     doc_md = """
                                                                         Prepare data to request weather data from OpenMeteo API (aggregate data based on location and dates)   
-                                                                        Returns a DataFrame with the first and last date for each location as Xcom data
+                                                                        Returns a DataFrame with the first and last date for each location (handoff file)
                                                                         """
                                                                     )
 
@@ -256,7 +263,7 @@ prepare_data_to_request_weather_data = generate_task_python_operator(dag = dag_s
 
 fetch_and_fill_weather_data = generate_task_python_operator(dag = dag_scale_etl_pipeline,
                                                             task_id = f"Fetch.Weather.Data",
-                                                            python_callable = fetch_weather_data,
+                                                            python_callable = handoff_output(fetch_weather_data),
                                                             op_kwargs = {"task_ids": "Weather.Data.Preparation"},
                                                             retries = 3,
                                                             retry_delay = datetime.timedelta(seconds = 60),
@@ -294,7 +301,7 @@ BLOCK 2b - ADD CARTOGRAPHIC DATA
 """
 prepare_aggregated_cartographic_data = generate_task_python_operator(dag = dag_scale_etl_pipeline,
                                                                task_id = "Cartographic.Data.Preparation",
-                                                               python_callable = create_cartographic_aggregated_df,
+                                                               python_callable = handoff_output(create_cartographic_aggregated_df),
                                                                op_kwargs = {"task_ids": "AggregatedScale.Data",
                                                                             "filepath": f"{PROCESSING_DATA_DIR}/cleaned_scale_data.parquet",
                                                                             "groupby_cols": ["lat", "lon"],
@@ -304,24 +311,27 @@ prepare_aggregated_cartographic_data = generate_task_python_operator(dag = dag_s
                                                                on_failure_callback = alert_on_failure,
                                                                doc_md = """
                                                                     Prepare data to request cartographic data from our database through the  API (aggregate data based on location)   
-                                                                    Returns a DataFrame with the different locations as Xcom data
+                                                                    Returns a DataFrame with the different locations (handoff file)
                                                                     """
                                                          )
 
 
 request_cartographic_data = generate_task_python_operator(dag = dag_scale_etl_pipeline,
                                                    task_id = "Fetch.Cartographic.Data",
-                                                   python_callable = fetch_cartographic_data,
+                                                   python_callable = handoff_output(fetch_cartographic_data),
                                                    op_kwargs = {"task_ids": "Cartographic.Data.Preparation",
-                                                                "url": API_ROUTE_CARTO_URL,
+                                                                "url": API_ROUTE_CARTO_SUMMARY_URL,
                                                                 "radius": CARTO_DATA_RADIUS_REQUEST,
+                                                                "year": CARTO_DATA_YEAR,
+                                                                "batch_size": CARTO_SUMMARY_BATCH_SIZE,
                                                                 },  
                                                    retries = 3,
                                                    retry_delay = datetime.timedelta(seconds = 180),
                                                    trigger_rule = "all_success",
                                                    on_failure_callback = alert_on_failure,
                                                     doc_md = """
-                                                        Request cartographic data from our database through the API and fill the aggregated scale data
+                                                        Request the land cover summaries of the locations through the API (batched, no geometries) and fill the aggregated scale data
+                                                        with area-weighted features (dominant culture & legend, organic share, share per legend)
                                                         - Succeed if the cartographic data is fetched and filled in the aggregated scale data
                                                         - Fail if the cartographic data cannot be fetched or filled in the aggregated scale data
 
@@ -358,16 +368,16 @@ BLOCK 3 - MERGE ALL DATA AND SAVE
 
 load_weather_data = generate_task_python_operator(dag = dag_scale_etl_pipeline,
                                                         task_id = f"Load.Weather.Data",
-                                                        python_callable = load_file_as_dataframe,
+                                                        python_callable = get_parquet_reference,
                                                         op_kwargs = {"path": f"{PROCESSING_DATA_DIR}/weather_aggregated_data.parquet"},
                                                         retries = 3,
                                                         retry_delay = datetime.timedelta(seconds = 10),
                                                         trigger_rule = "all_success",
                                                         on_failure_callback = alert_on_failure,
                                                         doc_md = """
-                                                                Load the weather aggregated data parquet file into a DataFrame to continue processing
-                                                                    - Succeed if the file is loaded and the DataFrame is not empty
-                                                                    - Fail if the file cannot be loaded or the DataFrame is empty
+                                                                Reference the weather aggregated data parquet file (path & schema) to continue processing
+                                                                    - Succeed if the file exists and is not empty
+                                                                    - Fail if the file cannot be read or is empty
                                                             """
                                                         )
 
@@ -375,16 +385,16 @@ load_weather_data = generate_task_python_operator(dag = dag_scale_etl_pipeline,
 
 load_cartographic_data = generate_task_python_operator(dag = dag_scale_etl_pipeline,
                                                         task_id = f"Load.Cartographic.Data",
-                                                        python_callable = load_file_as_dataframe,
+                                                        python_callable = get_parquet_reference,
                                                         op_kwargs = {"path": f"{PROCESSING_DATA_DIR}/cartographic_aggregated_data.parquet"},
                                                         retries = 3,
                                                         retry_delay = datetime.timedelta(seconds = 10),
                                                         trigger_rule = "all_success",
                                                         on_failure_callback = alert_on_failure,
                                                         doc_md = """
-                                                                Load the cartographic aggregated data parquet file into a DataFrame to continue processing
-                                                                    - Succeed if the file is loaded and the DataFrame is not empty
-                                                                    - Fail if the file cannot be loaded or the DataFrame is empty
+                                                                Reference the cartographic aggregated data parquet file (path & schema) to continue processing
+                                                                    - Succeed if the file exists and is not empty
+                                                                    - Fail if the file cannot be read or is empty
                                                             """
                                                         )
 
@@ -392,23 +402,23 @@ load_cartographic_data = generate_task_python_operator(dag = dag_scale_etl_pipel
 
 scale_processing_file_loader_block3 = generate_task_python_operator(dag = dag_scale_etl_pipeline,
                                                                     task_id = f"Load.Cleaned.Scale.Data.Block3",
-                                                                    python_callable = load_file_as_dataframe,
+                                                                    python_callable = get_parquet_reference,
                                                                     op_kwargs = {"path": f"{PROCESSING_DATA_DIR}/cleaned_scale_data.parquet"},
                                                                     retries = 3,
                                                                     retry_delay = datetime.timedelta(seconds = 10),
                                                                     trigger_rule = "all_success",
                                                                     on_failure_callback = alert_on_failure,
                                                                     doc_md = """
-                                                                            Load the cleaned scale data parquet file into a DataFrame to continue processing
-                                                                                - Succeed if the file is loaded and the DataFrame is not empty
-                                                                                - Fail if the file cannot be loaded or the DataFrame is empty
+                                                                            Reference the cleaned scale data parquet file (path & schema) to continue processing
+                                                                                - Succeed if the file exists and is not empty
+                                                                                - Fail if the file cannot be read or is empty
                                                                         """
                                                                     )
 
 
 merge_weather_and_cartographic_data = generate_task_python_operator(dag = dag_scale_etl_pipeline,
                                                         task_id = f"Merge.Weather.Cartographic.Data",
-                                                        python_callable = join_dataframes,
+                                                        python_callable = handoff_output(join_dataframes),
                                                         op_kwargs = {"task_ids1": "Load.Weather.Data",
                                                                      "task_ids2": "Load.Cartographic.Data",
                                                                      "on_cols": ["lat", "lon"], 
@@ -425,7 +435,7 @@ merge_weather_and_cartographic_data = generate_task_python_operator(dag = dag_sc
 
 merge_to_cleaned_data = generate_task_python_operator(dag = dag_scale_etl_pipeline,
                                                         task_id = f"Merged.Data.To.Cleaned.Scale",
-                                                        python_callable = join_dataframes,
+                                                        python_callable = handoff_output(join_dataframes),
                                                         op_kwargs = {"task_ids1": "Load.Cleaned.Scale.Data.Block3",
                                                                      "task_ids2": "Merge.Weather.Cartographic.Data",
                                                                      "on_cols": ["date", "lat", "lon"],
@@ -448,12 +458,14 @@ save_final_clean_to_cleaned_directory = generate_task_python_operator(dag = dag_
                                                                     op_kwargs = {"task_ids": "Merged.Data.To.Cleaned.Scale",
                                                                                 "savedir": CLEANED_DATA_DIR,
                                                                                 "prefix": "cleaned",
-                                                                                "filename": "data_with_weather_and_cartographic_data"
+                                                                                "filename": "data_with_weather_and_cartographic_data",
+                                                                                "merge_on": ["bal", "time"]
                                                                                 },
                                                                     retries = 0,
                                                                     trigger_rule = "all_success",
                                                                     doc_md = """
-                                                                            Save cleaned data with weather and cartographic data to a parquet file in the cleaned data directory
+                                                                            Merge the cleaned data of the run, with weather and cartographic data, into the parquet file of the cleaned data directory
+                                                                            (rows of the same scale & time are replaced, the history is kept)
                                                                             """
                                                                     )
 
@@ -462,7 +474,7 @@ save_final_clean_to_cleaned_directory = generate_task_python_operator(dag = dag_
 clean_processing_directory = generate_task_bash_operator(dag = dag_scale_etl_pipeline,
                                                         task_id = "Clean.Processing.Directory",
                                                         bash_command = f"""
-                                                                rm {PROCESSING_DATA_DIR}/*
+                                                                rm -rf {PROCESSING_DATA_DIR}/*
                                                                 """,
                                                         retries = 0,
                                                         trigger_rule = "all_success",
@@ -473,6 +485,31 @@ clean_processing_directory = generate_task_bash_operator(dag = dag_scale_etl_pip
 
 
 
+archive_raw_files = generate_task_python_operator(dag = dag_scale_etl_pipeline,
+                                                    task_id = "Archive.Raw.Files",
+                                                    python_callable = archive_claimed_files,
+                                                    retries = 0,
+                                                    trigger_rule = "all_success",
+                                                    doc_md = """
+                                                        Move the files claimed by the run to the archives and record them in the ingestion manifest,
+                                                        once their data is saved (a failed run keeps its files in its claim directory, claimed again by the next run)
+                                                        """
+                                                    )
+
+
+
+remove_handoff_files = generate_task_python_operator(dag = dag_scale_etl_pipeline,
+                                                    task_id = "Remove.Handoff.Files",
+                                                    python_callable = cleanup_handoff,
+                                                    retries = 0,
+                                                    trigger_rule = "all_success",
+                                                    doc_md = """
+                                                        Remove the handoff files of the run (kept on failure to retry or inspect the failed tasks)
+                                                        """
+                                                    )
+
+
+
 remove_xcom_block_3 = generate_task_python_operator(dag = dag_scale_etl_pipeline,
                                                     task_id = "Remove.Xcom.Block_3",
                                                     python_callable = cleanup_xcom,
@@ -502,9 +539,8 @@ next_dag_triggerer = generate_task_trigger_dag_operator(dag = dag_scale_etl_pipe
 DEPENDENCIES
 """
 # BLOCK 1 Dependencies
-raw_file_sensor >> raw_file_loader >> scale_data_cleaner >> save_cleaned_scale_data
+raw_file_sensor >> raw_file_claimer >> raw_file_loader >> scale_data_cleaner >> save_cleaned_scale_data
 save_cleaned_scale_data >> remove_xcom_block_1
-save_cleaned_scale_data >> move_raw_files_to_archives
 # BLOCK 2 Dependencies
 save_cleaned_scale_data >> scale_processing_file_loader_block2 >> generate_aggregated_scale_data
 save_fetched_weather_data >> remove_xcom_block_2
@@ -521,6 +557,10 @@ remove_xcom_block_2 >> scale_processing_file_loader_block3 >> merge_to_cleaned_d
 merge_to_cleaned_data >> save_final_clean_to_cleaned_directory
 save_final_clean_to_cleaned_directory >> clean_processing_directory
 save_final_clean_to_cleaned_directory >> remove_xcom_block_3
+save_final_clean_to_cleaned_directory >> remove_handoff_files
+save_final_clean_to_cleaned_directory >> archive_raw_files
 # NEXT DAG TRIGGERER
 remove_xcom_block_3 >> next_dag_triggerer
-clean_processing_directory >> next_dag_triggerer
\ No newline at end of file
+clean_processing_directory >> next_dag_triggerer
+remove_handoff_files >> next_dag_triggerer
+archive_raw_files >> next_dag_triggerer
@@ -23,7 +23,9 @@ from utils.config import SEGMENTATION_MIN_MONTH, SEGMENTATION_MAX_MONTH, SEGMENT
 from utils.operators import generate_task_python_operator, generate_task_trigger_dag_operator, generate_task_bash_operator
 
 # Generic functions
-from utils.generic_functions import load_file_as_dataframe, save_df_to_file, cleanup_xcom
+from utils.generic_functions import save_df_to_file, cleanup_xcom
+# Data handoff functions (DataFrames exchanged as run-scoped parquet files, XCom only carries their reference)
+from utils.generic_functions import handoff_output, get_parquet_reference, cleanup_handoff
 # Segmentation functions
 from utils.segmentation_functions import df_segmentation_operation
 
@@ -62,14 +64,14 @@ BLOCK 1 - LOAD CLEANED DATA | APPLY SEGMENTATION | AGGREGATE WEATHER INDICATORS
 """
 cleaned_scale_data_loader = generate_task_python_operator(dag = dag_segmented_etl_pipeline,
                                                         task_id = f"Load.Cleaned.Data",
-                                                        python_callable = load_file_as_dataframe,
+                                                        python_callable = get_parquet_reference,
                                                         op_kwargs = {"path": f"{CLEANED_DATA_DIR}/cleaned_data_with_weather_and_cartographic_data.parquet"},
                                                         retries = 3,
                                                         retry_delay = datetime.timedelta(seconds = 10),
                                                         trigger_rule = "all_success",
                                                         on_failure_callback = alert_on_failure,
                                                         doc_md = """
-                                                            Load cleaned data from a file
+                                                            Reference the cleaned data file (path & schema)
                                                             """
                                                         )
 
@@ -77,7 +79,7 @@ cleaned_scale_data_loader = generate_task_python_operator(dag = dag_segmented_et
 
 apply_segmentation_on_data = generate_task_python_operator(dag = dag_segmented_etl_pipeline,
                                                         task_id = f"Apply.Segmentation",
-                                                        python_callable = df_segmentation_operation,
+                                                        python_callable = handoff_output(df_segmentation_operation),
                                                         op_kwargs = {"task_ids": "Load.Cleaned.Data",
                                                                      "segmentation_min_month": SEGMENTATION_MIN_MONTH,
                                                                      "segmentation_max_month": SEGMENTATION_MAX_MONTH,
@@ -119,6 +121,17 @@ save_segmented_data = generate_task_python_operator(dag = dag_segmented_etl_pipe
                                                     )
 
 
+remove_handoff_files = generate_task_python_operator(dag = dag_segmented_etl_pipeline,
+                                                    task_id = "Remove.Handoff.Files",
+                                                    python_callable = cleanup_handoff,
+                                                    retries = 0,
+                                                    trigger_rule = "all_success",
+                                                    doc_md = """
+                                                        Remove the handoff files of the run (kept on failure to retry or inspect the failed tasks)
+                                                        """
+                                                    )
+
+
 remove_xcom = generate_task_python_operator(dag = dag_segmented_etl_pipeline,
                                             task_id = "Remove.Xcom.",
                                             python_callable = cleanup_xcom,
@@ -158,6 +171,8 @@ cleaned_scale_data_loader >> apply_segmentation_on_data
 apply_segmentation_on_data >> save_segmented_data
 apply_segmentation_on_data >> save_segmented_model
 save_segmented_data >> remove_xcom
+save_segmented_data >> remove_handoff_files
 save_segmented_model >> remove_xcom
 remove_xcom >> next_dag_triggerer
+remove_handoff_files >> next_dag_triggerer
 
@@ -6,9 +6,15 @@ import numpy as np
 import pandas as pd
 import requests
 
+from utils.generic_functions import pull_dataframe
 from utils.logger import basic_logger
 
 
+# Features of a location whose summary is unknown (failed request, summary not built yet by the API)
+MISSING_LANDCOVER_FEATURES = {"culture": np.nan, "bio": np.nan, "legende": np.nan, "rpg_part": np.nan}
+
+
+
 # CARTOGRAPHIC FUNCTIONS
 def create_cartographic_aggregated_df(**kwargs) -> pd.DataFrame:
     """
@@ -24,7 +30,7 @@ def create_cartographic_aggregated_df(**kwargs) -> pd.DataFrame:
         - pd.DataFrame: DataFrame with the groupby_cols only
     """
     task_instance = kwargs.get('task_instance')
-    df = task_instance.xcom_pull(task_ids = kwargs["task_ids"])
+    df = pull_dataframe(task_instance, kwargs["task_ids"], columns = kwargs["groupby_cols"])
 
     loc_gb = df.groupby(kwargs["groupby_cols"]).size().reset_index(name = "count")
     loc_gb.drop(columns = ["count"], inplace = True)
@@ -35,22 +41,52 @@ def create_cartographic_aggregated_df(**kwargs) -> pd.DataFrame:
 
 
 
+def get_landcover_features(summary:list) -> dict:
+    """
+    Area-weighted features of a location from its RPG land cover summary (area & share of the buffer per culture).
+
+    args:
+        - summary: list, RPG summary rows of the location, sorted by share (API carto summary route)
+
+    return:
+        - dict: dominant culture & apicultural legend (by area), organic share of the RPG area, covered share & share per legend ("part_<legende>")
+    """
+    if not summary:
+        return {"culture": np.nan, "bio": np.nan, "legende": np.nan, "rpg_part": 0.0}
+
+    rows = pd.DataFrame(summary)
+    legend_parts = rows.groupby("legende")["part"].sum()
+    features = {
+        "culture": rows["culture"].iloc[0],
+        "bio": rows["aire_bio"].fillna(0).sum() / rows["aire"].sum() if rows["aire"].sum() > 0 else np.nan,
+        "legende": legend_parts.idxmax(),
+        "rpg_part": rows["part"].sum(),
+    }
+    features.update({f"part_{legende}": part for legende, part in legend_parts.items()})
+
+    return features
+
+
+
 def fetch_cartographic_data(**kwargs) -> pd.DataFrame:
     """
-    Fetch the cartographic data from the API and fill the DataFrame with the culture and bio values.
+    Fetch the land cover summaries of the locations from the API (batched) and fill the DataFrame with area-weighted features.
 
     args:
         - **kwargs: dict with the following keys
             - task_instance: task_instance object
             - task_ids: str, task id to pull the XCom
-            - url: str, url to fetch the data
+            - url: str, url of the carto summary route
             - radius: int, radius to fetch the data
+            - year: int, RPG year
+            - batch_size: int, locations per request
 
     return:
-        - pd.DataFrame: DataFrame with the culture and bio values
+        - pd.DataFrame: DataFrame with the culture, bio, legende, rpg_part and part_<legende> values (share of the buffer, missing legends at 0, NaN if the summary is unknown)
     """
     task_instance = kwargs.get('task_instance')
-    df_to_fill = task_instance.xcom_pull(task_ids = kwargs["task_ids"])
+    df_to_fill = pull_dataframe(task_instance, kwargs["task_ids"])
+    year = kwargs["year"]
 
 
     headers = {
@@ -59,41 +95,41 @@ def fetch_cartographic_data(**kwargs) -> pd.DataFrame:
     }
 
 
-
-    for index, row in df_to_fill.iterrows():
+    features = []
+    rows = df_to_fill.reset_index(drop = True)
+    for start in range(0, len(rows), kwargs["batch_size"]):
+        batch = rows.iloc[start:start + kwargs["batch_size"]]
         data_to_request = [
             {
-                "location_name": "location",
+                "location_name": str(index),
                 "latitude": row["lat"],
                 "longitude": row["lon"],
                 "data_type": ["rpg"],
-                "years": [2022],
+                "years": [year],
                 "radius": kwargs["radius"]
             }
+            for index, row in batch.iterrows()
         ]
 
         try:
             results = requests.post(kwargs["url"], headers = headers, json = data_to_request)
+            results.raise_for_status()
             results_json = results.json()
 
-        except:
-            basic_logger.error(f"Error: {results.text}")
-            df_to_fill.loc[index, "culture"] = np.nan
-            df_to_fill.loc[index, "bio"] = np.nan
+        except Exception as e:
+            basic_logger.error(f"Error: {e}")
+            features.extend(dict(MISSING_LANDCOVER_FEATURES) for _ in range(len(batch)))
 
         else:
-            year = 2022
-            basic_logger.info(f"Results: {results_json}")
-            if results_json["location"][f"rpg-{year}"][f"rpg-{year}"]:
-                culture = results_json["location"][f"rpg-{year}"][f"rpg-{year}"][0]["culture"]
-                bio = results_json["location"][f"rpg-{year}"][f"rpg-{year}"][0]["bio"]
-                legende = results_json["location"][f"rpg-{year}"][f"rpg-{year}"][0]["legende"]
-                df_to_fill.loc[index, "culture"] = culture
-                df_to_fill.loc[index, "bio"] = bio
-                df_to_fill.loc[index, "legende"] = legende
-            else:
-                df_to_fill.loc[index, "culture"] = np.nan
-                df_to_fill.loc[index, "bio"] = np.nan
-                df_to_fill.loc[index, "legende"] = np.nan
-
-    return df_to_fill
\ No newline at end of file
+            basic_logger.info(f"Summaries fetched: {start + len(batch)}/{len(rows)}")
+            # Summaries over the API on demand builds budget are left out of the response
+            summaries = [results_json[str(index)].get(f"rpg-{year}") for index in batch.index]
+            features.extend(dict(MISSING_LANDCOVER_FEATURES) if summary is None else get_landcover_features(summary) for summary in summaries)
+
+    features_df = pd.DataFrame(features, index = rows.index)
+    part_columns = [column for column in features_df.columns if column.startswith("part_")]
+    # Legends missing from a known summary cover 0% of the buffer, unknown summaries (NaN rpg_part) keep NaN shares
+    known = features_df["rpg_part"].notna()
+    features_df.loc[known, part_columns] = features_df.loc[known, part_columns].fillna(0.0)
+
+    return pd.concat([rows, features_df], axis = 1)
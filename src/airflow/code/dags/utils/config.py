@@ -23,6 +23,9 @@ RAW_DATA_DIR = f"{STORAGE_DIR}/raw_data"
 PROCESSING_DATA_DIR = f"{STORAGE_DIR}/processing_data"
 CLEANED_DATA_DIR = f"{STORAGE_DIR}/cleaned_data"
 ARCHIVES_DATA_DIR = f"{STORAGE_DIR}/archives_data"
+HANDOFF_DATA_DIR = f"{STORAGE_DIR}/handoff_data"          # Run-scoped parquet files exchanged by the tasks (XCom only carries their reference)
+RAW_FILES_CLAIM_DIR = f"{RAW_DATA_DIR}/.claimed"                 # Files claimed by a run (same volume as the raw files: claimed by an atomic rename)
+INGESTION_MANIFEST_PATH = f"{ARCHIVES_DATA_DIR}/ingested_files_manifest.csv"     # Files ingested by the ETL (path, size, mtime, hash)
 SEGMENTATION_MODEL_DIR = f"{STORAGE_DIR}/segmentation_models"
 MLFLOW_TRACKING_URI = "/opt/airflow/storage/mlflow/"
 
@@ -44,7 +47,10 @@ API_URL = os.getenv("API_URL")
 API_VERSION = os.getenv("API_VERSION")
 ROUTE_CARTO_SUFIX = os.getenv("ROUTE_CARTO_SUFIX")
 API_ROUTE_CARTO_URL = f"{API_URL}/{API_VERSION}/{ROUTE_CARTO_SUFIX}"
+API_ROUTE_CARTO_SUMMARY_URL = f"{API_ROUTE_CARTO_URL}/summary"
 CARTO_DATA_RADIUS_REQUEST = 500
+CARTO_DATA_YEAR = 2022
+CARTO_SUMMARY_BATCH_SIZE = 200          # Locations per summary request (API CARTO_SUMMARY_MAX_LOCATIONS)
 
 
 
@@ -55,9 +61,12 @@ PARQUET_FILE_PATTERN = "*.parquet"
 SEGMENTED_FILE_PATTERN = "segmented_*.parquet"
 
 # ETL DAG
+RAW_FILES_MIN_AGE:int = 10         # In seconds, newer raw files may still be written and are left to the next run
+RAW_FILES_READ_WORKERS:int = int(os.getenv("RAW_FILES_READ_WORKERS", os.cpu_count() or 1))     # Raw files parsed concurrently
 WEIGHT_INTERVAL_MIN:int = 15000
 WEIGHT_INTERVAL_MAX:int = 200000
 CLEAN_SCALE_MIN_DATE_TO_KEEP = "2022-01-01"
+CLEAN_SCALE_CHUNK_ROWS:int = 1_000_000      # Raw rows cleaned at once (the weight correction then loads one scale at a time)
 
 # SEGMENTATION DAG
 SEGMENTATION_MIN_MONTH = "-04-01"
@@ -4,17 +4,45 @@
 
 # LIB
 from airflow.models import XCom
+from airflow.operators.python import get_current_context
 from airflow.utils.db import provide_session
+from concurrent.futures import ThreadPoolExecutor
+import functools
 import os
 import pandas as pd
-from typing import Union
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.dataset as pa_dataset
+import pyarrow.parquet as pq
+import re
+import shutil
+from typing import Callable, Union
 
 
+from utils.config import HANDOFF_DATA_DIR, RAW_FILES_READ_WORKERS
 from utils.logger import basic_logger
 
 
 
 
+# Scale providers files (.txt, csv with header): explicit types, nothing is inferred per file.
+# Columns missing from a file are read as nulls, columns not listed are ignored
+SCALE_FILE_SCHEMA = pa.schema([
+    ("const", pa.string()),
+    ("bal", pa.string()),
+    ("name", pa.string()),
+    ("ruche", pa.string()),
+    ("poids", pa.float64()),
+    ("lat", pa.float64()),
+    ("lon", pa.float64()),
+    ("qloc", pa.string()),
+    ("activ", pa.string()),
+    ("time", pa.string()),
+])
+
+
+
+
 """
 GENERAL FUNCTIONS
 """
@@ -28,35 +56,6 @@ def cleanup_xcom(session=None):
 
 
 
-def convert_dict_df(data_object:Union[dict, pd.DataFrame] = None) -> Union[pd.DataFrame, dict]:
-    """
-    Convert a dict to a DataFrame or a DataFrame to a dict depending on the output parameter
-
-    args:
-        data_object (Union[dict, pd.DataFrame]): data object to convert
-    return:
-        Union[pd.DataFrame, dict]: converted data object
-    raises: 
-        ValueError: if data_object is None or empty
-    """
-    if data_object is None:
-        raise ValueError("data_object is None")
-    
-    if isinstance(data_object, dict):
-        if len(data_object) == 0:
-            raise ValueError("dict is empty")
-        else:
-            return pd.DataFrame(data_object)
-        
-
-    elif isinstance(data_object, pd.DataFrame):
-        if data_object is None or data_object.empty:
-            raise ValueError("df is empty")
-        else:
-            return data_object.to_dict()
-
-
-
 def save_df_to_file(**kwargs) -> None:
     """
     Save DataFrame to a parquet file in the specified directory
@@ -66,21 +65,63 @@ def save_df_to_file(**kwargs) -> None:
     - filename: str - Name of the file to save
     - savedir: str - Directory to save the file
     - prefix: str - prefix to add to the file name (default: None)
+    - merge_on: list - key columns: rows are upserted into the existing file instead of replacing it (default: None)
     """
     task_instance = kwargs.get('task_instance')
-    df = task_instance.xcom_pull(task_ids = kwargs["task_ids"])
+    data = task_instance.xcom_pull(task_ids = kwargs["task_ids"])
 
     if kwargs["prefix"] is None:
         filepath = kwargs["savedir"] + "/" + kwargs["filename"] + ".parquet"
     else:
         filepath = kwargs["savedir"] + "/" + kwargs["prefix"] + "_" + kwargs["filename"] + ".parquet"
 
-    df.to_parquet(filepath, index=False)
+    if kwargs.get("merge_on") and os.path.exists(filepath):
+        merge_df_into_file(pull_dataframe(task_instance, kwargs["task_ids"]), filepath, kwargs["merge_on"])
+    # Handoff files are already parquet: copied without being loaded (directories: partitioned parquet)
+    elif is_handoff_reference(data) and os.path.isdir(data["path"]):
+        shutil.rmtree(filepath, ignore_errors = True)
+        shutil.copytree(data["path"], filepath)
+    elif is_handoff_reference(data):
+        shutil.copyfile(data["path"], filepath)
+    else:
+        data.to_parquet(filepath, index=False)
 
     basic_logger.info(f"Data saved to {filepath}")
 
 
 
+def merge_df_into_file(df:pd.DataFrame, filepath:str, merge_on:list) -> None:
+    """
+    Upsert the rows of a DataFrame into a parquet file: stored rows having the same keys are replaced, the other ones are kept
+
+    args:
+        - df: pd.DataFrame - New rows
+        - filepath: str - Parquet file to update
+        - merge_on: list - Key columns
+    """
+    stored_df = pd.read_parquet(filepath)
+    # Files written before the datetime64 dates & times hold strings: converted, a column mixing both cannot be written
+    for column in df.columns.intersection(stored_df.columns):
+        if pd.api.types.is_datetime64_any_dtype(df[column]) and not pd.api.types.is_datetime64_any_dtype(stored_df[column]):
+            stored_df[column] = pd.to_datetime(stored_df[column])
+
+    keys = df[merge_on].drop_duplicates()
+    # Keys compared as values: categories differ between files
+    for column in merge_on:
+        if isinstance(keys[column].dtype, pd.CategoricalDtype):
+            keys[column] = keys[column].astype(str)
+            stored_df[column] = stored_df[column].astype(str)
+    stored_df = stored_df.merge(keys, on = merge_on, how = "left", indicator = True)
+    stored_df = stored_df[stored_df["_merge"] == "left_only"].drop(columns = ["_merge"])
+
+    merged_df = pd.concat([stored_df, df], ignore_index = True)
+    merged_df.to_parquet(f"{filepath}.tmp", index = False)
+    os.replace(f"{filepath}.tmp", filepath)
+
+    basic_logger.info(f"{len(df)} rows merged into {filepath}: {len(merged_df)} rows")
+
+
+
 def create_aggregated_df(**kwargs) -> None:
     """
     Create an aggregated DataFrame from a DataFrame and save it to a file
@@ -106,7 +147,7 @@ def create_aggregated_df(**kwargs) -> None:
 
     df = load_file_as_dataframe(kwargs["filepath"])
 
-    agg_df = df.groupby(groupby_cols)[agg_cols].agg(agg_funcs).reset_index()
+    agg_df = df.groupby(groupby_cols, observed = True)[agg_cols].agg(agg_funcs).reset_index()
 
 
     if kwargs["rename_cols"] == True:
@@ -158,47 +199,72 @@ def load_file_as_dataframe(path:str) -> pd.DataFrame:
 
 
 
-def load_and_combine_dataframes(dirpath:str) -> dict:
+def read_scale_file(path:str) -> pa.Table:
+    """
+    Read a scale provider file into an arrow Table with the SCALE_FILE_SCHEMA columns
+
+    args:
+        - path: str - File to read, csv & txt files are parsed by pyarrow, other extensions by load_file_as_dataframe
+
+    returns:
+        - pa.Table: Table of the file
+    """
+    extension = os.path.splitext(path)[1]
+
+    if extension == ".csv" or extension == ".txt":
+        # One thread per file: files are read in parallel by load_and_combine_dataframes
+        return pa_csv.read_csv(
+            path,
+            read_options = pa_csv.ReadOptions(use_threads = False),
+            convert_options = pa_csv.ConvertOptions(column_types = SCALE_FILE_SCHEMA,
+                                                    include_columns = SCALE_FILE_SCHEMA.names,
+                                                    include_missing_columns = True,
+                                                    strings_can_be_null = True),      # Empty values are NaN, as with pd.read_csv
+        )
+
+    df = load_file_as_dataframe(path).reindex(columns = SCALE_FILE_SCHEMA.names)
+    return pa.Table.from_pandas(df, preserve_index = False).cast(SCALE_FILE_SCHEMA)
+
+
+
+def load_and_combine_dataframes(dirpath:str, workers:int = RAW_FILES_READ_WORKERS) -> pd.DataFrame:
     """
     Load and combine all files in a directory into a single DataFrame
+    Files are read in parallel (pyarrow releases the GIL while parsing) and concatenated once
 
     args:
         - path: str - Directory path to load files from
+        - workers: int - Files read concurrently
 
     returns:
-        - dict: Combined DataFrame as a dictionary
+        - pd.DataFrame: Combined DataFrame (SCALE_FILE_SCHEMA columns)
 
     raises:
         - ValueError: If the combined DataFrame is empty
-        - Exception: If there is an error loading a file
     """
+    filepaths = sorted(os.path.join(dirpath, file) for file in os.listdir(dirpath))
 
-    combined_df = pd.DataFrame()
-
-    for file in os.listdir(dirpath):
-        filepath = os.path.join(dirpath, file)
-
+    def read_or_skip(filepath:str) -> Union[pa.Table, None]:
         try:
-            df = load_file_as_dataframe(filepath)
+            return read_scale_file(filepath)
         except Exception as e:
             basic_logger.warning(f"Error loading file: {filepath}")
             basic_logger.warning(e)
+            return None
 
+    with ThreadPoolExecutor(max_workers = workers) as executor:
+        tables = [table for table in executor.map(read_or_skip, filepaths) if table is not None]
 
-        else:
-            combined_df = pd.concat([combined_df, df])
-
-        finally:  
-            basic_logger.info(f"Combined DataFrame: {combined_df.shape}")
-
+    basic_logger.info(f"Files loaded: {len(tables)}/{len(filepaths)}")
+    combined_df = pa.concat_tables(tables).to_pandas() if tables else pd.DataFrame()
+    basic_logger.info(f"Combined DataFrame: {combined_df.shape}")
 
     if combined_df.empty:
         basic_logger.warning("Combined DataFrame is empty, exiting task...")
         raise ValueError("Combined DataFrame is empty")
 
     else:
-        combined_dict = convert_dict_df(combined_df)  # Convert to dict avoids issues with XCom serialization
-        return combined_dict
+        return combined_df
 
 
 
@@ -216,8 +282,8 @@ def join_dataframes(**kwargs) -> pd.DataFrame:
         joined_df (pd.DataFrame): joined DataFrame
     """
     task_instance = kwargs.get('task_instance')
-    df1 = task_instance.xcom_pull(task_ids = kwargs["task_ids1"])
-    df2 = task_instance.xcom_pull(task_ids = kwargs["task_ids2"])
+    df1 = pull_dataframe(task_instance, kwargs["task_ids1"])
+    df2 = pull_dataframe(task_instance, kwargs["task_ids2"])
     basic_logger.info(f"DataFrames loaded: {df1.shape}, {df2.shape}")
 
     cols_joined = kwargs["on_cols"]
@@ -233,8 +299,127 @@ def fillna_dataframe(**kwargs) -> pd.DataFrame:
     
     """
     task_instance = kwargs.get('task_instance')
-    df = task_instance.xcom_pull(task_ids = kwargs["task_ids"])
+    df = pull_dataframe(task_instance, kwargs["task_ids"])
     df.fillna(kwargs["default_value"], inplace = True)
     
 
-    return df
\ No newline at end of file
+    return df
+
+
+
+
+"""
+DATA HANDOFF FUNCTIONS
+- Tasks exchange DataFrames as parquet files in a run-scoped directory (HANDOFF_DATA_DIR/<dag_id>/<run_id>),
+  XCom only carries their reference (path, schema, rows): the metadata database load does not grow with the data
+- Wrap a callable returning a DataFrame with handoff_output, read the upstream DataFrames with pull_dataframe
+"""
+def get_run_dirname(run_id:str) -> str:
+    """
+    Directory name of a DAG run (run ids contain ":" & "+")
+    """
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", run_id)
+
+
+
+def get_handoff_dir(context:dict) -> str:
+    """
+    Handoff directory of a DAG run
+
+    args:
+        - context: dict - Airflow task context
+    """
+    return os.path.join(HANDOFF_DATA_DIR, context["dag"].dag_id, get_run_dirname(context["run_id"]))
+
+
+
+def is_handoff_reference(data) -> bool:
+    return isinstance(data, dict) and "path" in data and "schema" in data
+
+
+
+def get_parquet_reference(path:str) -> dict:
+    """
+    Reference of a parquet file or directory of parquet files (path, schema, rows), read from their metadata only
+
+    raises:
+        - ValueError: If there is no rows
+    """
+    if os.path.isdir(path):
+        dataset = pa_dataset.dataset(path, format = "parquet")
+        schema, rows = dataset.schema, dataset.count_rows()
+    else:
+        metadata = pq.read_metadata(path)
+        schema, rows = metadata.schema.to_arrow_schema(), metadata.num_rows
+
+    if rows == 0:
+        raise ValueError(f"{path} is empty")
+
+    return {"path": path, "schema": {field.name: str(field.type) for field in schema}, "rows": rows}
+
+
+
+def write_handoff(df:pd.DataFrame, context:dict) -> dict:
+    """
+    Write a DataFrame to the handoff directory of the run (one file per task) and return its reference
+
+    args:
+        - df: pd.DataFrame - DataFrame returned by the task
+        - context: dict - Airflow task context
+
+    returns:
+        - dict: path, schema (column: arrow type) and rows of the file
+    """
+    handoff_dir = get_handoff_dir(context)
+    os.makedirs(handoff_dir, exist_ok = True)
+    path = os.path.join(handoff_dir, f"{context['task_instance'].task_id}.parquet")
+
+    table = pa.Table.from_pandas(df, preserve_index = False)
+    # Written then renamed: a retried task never leaves a partial file to the downstream tasks
+    pq.write_table(table, f"{path}.tmp")
+    os.replace(f"{path}.tmp", path)
+
+    basic_logger.info(f"Handoff written: {path} {table.shape}")
+    return {"path": path, "schema": {field.name: str(field.type) for field in table.schema}, "rows": table.num_rows}
+
+
+
+def pull_dataframe(task_instance, task_ids:str, columns:list = None) -> pd.DataFrame:
+    """
+    DataFrame returned by an upstream task
+
+    args:
+        - task_instance: Airflow task instance
+        - task_ids: str - Id of the upstream task
+        - columns: list - Columns to read (default: all), only read from the file (or directory) for handoff references
+
+    returns:
+        - pd.DataFrame: the DataFrame, read from the handoff file or pushed as is by a task without handoff
+    """
+    data = task_instance.xcom_pull(task_ids = task_ids)
+    if is_handoff_reference(data):
+        return pq.read_table(data["path"], columns = columns).to_pandas()
+
+    return data
+
+
+
+def handoff_output(python_callable:Callable) -> Callable:
+    """
+    Wrap a task callable returning a DataFrame: the DataFrame is written to the handoff directory, its reference is pushed to XCom
+    """
+    @functools.wraps(python_callable)
+    def wrapper(*args, **kwargs) -> dict:
+        return write_handoff(python_callable(*args, **kwargs), get_current_context())
+
+    return wrapper
+
+
+
+def cleanup_handoff(**kwargs) -> None:
+    """
+    Remove the handoff directory of the run
+    """
+    handoff_dir = get_handoff_dir(kwargs)
+    shutil.rmtree(handoff_dir, ignore_errors = True)
+    basic_logger.info(f"Handoff removed: {handoff_dir}")
@@ -0,0 +1,226 @@
+#airflow/code/dags/utils/ingestion_functions.py
+
+
+
+# LIB
+from airflow.exceptions import AirflowSkipException
+from airflow.models import DagRun
+from airflow.utils.state import DagRunState
+import datetime
+import fcntl
+import fnmatch
+import hashlib
+import os
+import pandas as pd
+import shutil
+import time
+
+
+from utils.config import RAW_DATA_DIR, ARCHIVES_DATA_DIR, RAW_FILES_CLAIM_DIR, INGESTION_MANIFEST_PATH, RAW_FILES_MIN_AGE, TEXT_FILE_PATTERN
+from utils.generic_functions import get_run_dirname
+from utils.logger import basic_logger
+
+
+
+
+"""
+RAW FILES INGESTION FUNCTIONS
+- Each run claims the new raw files by moving them to its claim directory (atomic rename): files arriving during a run are left to the next one
+- A manifest (path, size, mtime, content hash) records the ingested files: a file sent again is archived as a duplicate without being processed
+- The claimed files are archived & recorded once the run saved their data, a failed run keeps them in its claim directory:
+  the next run adopts the claim directories of the runs no longer running, each file is processed exactly once
+"""
+MANIFEST_COLUMNS = ["path", "archive_path", "size", "mtime", "hash", "run_id", "ingested_at"]
+
+
+
+def get_claim_dir(run_id:str, claim_root:str = RAW_FILES_CLAIM_DIR) -> str:
+    return os.path.join(claim_root, get_run_dirname(run_id))
+
+
+
+def get_free_path(directory:str, file:str) -> str:
+    """
+    Path of the file in the directory, prefixed by a counter if the name is taken (os.rename would replace the existing file)
+    """
+    path, index = os.path.join(directory, file), 1
+    while os.path.exists(path):
+        path, index = os.path.join(directory, f"{index}_{file}"), index + 1
+    return path
+
+
+
+def get_running_run_dirnames(dag_id:str) -> set:
+    """
+    Claim directory names of the running runs of the DAG (Airflow metadata database)
+    """
+    return {get_run_dirname(dag_run.run_id) for dag_run in DagRun.find(dag_id = dag_id, state = DagRunState.RUNNING)}
+
+
+
+def adopt_orphan_claims(claim_dir:str, running_dirnames:set) -> int:
+    """
+    Move the files claimed by runs no longer running (failed, killed before archiving) to the claim directory of the run
+
+    args:
+        - claim_dir: str - Claim directory of the run
+        - running_dirnames: set - Claim directory names of the running runs, their files are left to them
+
+    returns:
+        - int: Number of files adopted
+    """
+    claim_root, run_dirname = os.path.split(claim_dir)
+    adopted = 0
+    for orphan_dirname in sorted(os.listdir(claim_root)):
+        orphan_dir = os.path.join(claim_root, orphan_dirname)
+        if orphan_dirname == run_dirname or orphan_dirname in running_dirnames or not os.path.isdir(orphan_dir):
+            continue
+        for file in sorted(os.listdir(orphan_dir)):
+            try:
+                os.rename(os.path.join(orphan_dir, file), get_free_path(claim_dir, file))
+                adopted += 1
+            except FileNotFoundError:
+                basic_logger.info(f"{file} adopted by another run")
+        # Pending manifest entries of the orphan run are computed again by the run
+        try:
+            os.rmdir(orphan_dir)
+            os.remove(f"{orphan_dir}.csv")
+        except OSError:
+            pass
+        basic_logger.warning(f"Claim directory of the run {orphan_dirname} (not running) adopted")
+    return adopted
+
+
+
+def get_file_hash(path:str, chunk_size:int = 1024 * 1024) -> str:
+    """
+    SHA-256 of the file content, read by chunks
+    """
+    file_hash = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+
+def read_manifest(manifest_path:str = INGESTION_MANIFEST_PATH) -> pd.DataFrame:
+    """
+    Read the manifest, locked (shared): rows being appended by another run are never read partially
+    """
+    if not os.path.exists(manifest_path):
+        return pd.DataFrame(columns = MANIFEST_COLUMNS)
+    with open(manifest_path, "r") as manifest:
+        fcntl.flock(manifest, fcntl.LOCK_SH)
+        try:
+            # Created by append_to_manifest before its header is written
+            if os.fstat(manifest.fileno()).st_size == 0:
+                return pd.DataFrame(columns = MANIFEST_COLUMNS)
+            return pd.read_csv(manifest)
+        finally:
+            fcntl.flock(manifest, fcntl.LOCK_UN)
+
+
+
+def append_to_manifest(entries:pd.DataFrame, manifest_path:str = INGESTION_MANIFEST_PATH) -> None:
+    """
+    Append entries to the manifest, locked: concurrent runs never interleave their rows
+    """
+    with open(manifest_path, "a") as manifest:
+        fcntl.flock(manifest, fcntl.LOCK_EX)
+        try:
+            entries[MANIFEST_COLUMNS].to_csv(manifest, header = manifest.tell() == 0, index = False)
+        finally:
+            fcntl.flock(manifest, fcntl.LOCK_UN)
+
+
+
+def claim_raw_files(raw_dir:str = RAW_DATA_DIR, pattern:str = TEXT_FILE_PATTERN, min_age:int = RAW_FILES_MIN_AGE, claim_root:str = RAW_FILES_CLAIM_DIR,
+                    archives_dir:str = ARCHIVES_DATA_DIR, manifest_path:str = INGESTION_MANIFEST_PATH, **kwargs) -> dict:
+    """
+    Claim the new raw files for the run: moved to its claim directory, files already in the manifest are archived as duplicates.
+    The files left by the runs no longer running (adopt_orphan_claims) are claimed too.
+
+    args:
+        - raw_dir: str - Raw data directory
+        - pattern: str - Pattern of the raw files
+        - min_age: int - In seconds, files modified more recently may still be written and are not claimed
+        - claim_root, archives_dir, manifest_path: str - Claim directories, archives directory & ingestion manifest
+        - run_id: str - Airflow run id (task context)
+        - dag: DAG - Airflow DAG (task context), its running runs keep their claimed files
+
+    returns:
+        - dict: claim directory & number of files to process (the files of a previous try of the run are kept)
+
+    raises:
+        - AirflowSkipException: If there is no new file, downstream tasks are skipped
+    """
+    claim_dir = get_claim_dir(kwargs["run_id"], claim_root)
+    os.makedirs(claim_dir, exist_ok = True)
+    adopted = adopt_orphan_claims(claim_dir, get_running_run_dirnames(kwargs["dag"].dag_id))
+    if adopted:
+        basic_logger.warning(f"Files of failed runs claimed again: {adopted}")
+
+    now = time.time()
+    for file in sorted(os.listdir(raw_dir)):
+        path = os.path.join(raw_dir, file)
+        if not fnmatch.fnmatch(file, pattern) or not os.path.isfile(path) or now - os.path.getmtime(path) < min_age:
+            continue
+        try:
+            os.rename(path, get_free_path(claim_dir, file))
+        except FileNotFoundError:
+            basic_logger.info(f"{path} claimed by another run")
+
+    # Files of the run, compared to the manifest & to each other
+    ingested_hashes = set(read_manifest(manifest_path)["hash"])
+    entries = []
+    for file in sorted(os.listdir(claim_dir)):
+        path = os.path.join(claim_dir, file)
+        stat = os.stat(path)
+        file_hash = get_file_hash(path)
+        if file_hash in ingested_hashes:
+            duplicates_dir = os.path.join(archives_dir, "duplicates", get_run_dirname(kwargs["run_id"]))
+            os.makedirs(duplicates_dir, exist_ok = True)
+            shutil.move(path, os.path.join(duplicates_dir, file))
+            basic_logger.warning(f"{file} already ingested, archived to {duplicates_dir}")
+            continue
+        ingested_hashes.add(file_hash)
+        entries.append({"path": os.path.join(raw_dir, file), "size": stat.st_size, "mtime": stat.st_mtime, "hash": file_hash})
+
+    basic_logger.info(f"Files claimed: {len(entries)} ({claim_dir})")
+    if not entries:
+        os.rmdir(claim_dir)
+        raise AirflowSkipException("No new raw files")
+
+    # Entries recorded in the manifest when the files are archived
+    pd.DataFrame(entries, columns = ["path", "size", "mtime", "hash"]).to_csv(f"{claim_dir}.csv", index = False)
+
+    return {"claim_dir": claim_dir, "files": len(entries)}
+
+
+
+def archive_claimed_files(archives_dir:str = ARCHIVES_DATA_DIR, claim_root:str = RAW_FILES_CLAIM_DIR, manifest_path:str = INGESTION_MANIFEST_PATH, **kwargs) -> None:
+    """
+    Move the files claimed by the run to the archives (dated directory) and record them in the manifest
+
+    args:
+        - archives_dir: str - Archives directory
+        - claim_root, manifest_path: str - Claim directories & ingestion manifest
+        - run_id: str - Airflow run id (task context)
+    """
+    claim_dir = get_claim_dir(kwargs["run_id"], claim_root)
+    archive_dir = os.path.join(archives_dir, datetime.date.today().isoformat(), get_run_dirname(kwargs["run_id"]))
+    os.makedirs(archive_dir, exist_ok = True)
+
+    entries = pd.read_csv(f"{claim_dir}.csv")
+    entries["archive_path"] = [os.path.join(archive_dir, os.path.basename(path)) for path in entries["path"]]
+    for file in os.listdir(claim_dir):
+        shutil.move(os.path.join(claim_dir, file), os.path.join(archive_dir, file))
+
+    entries["run_id"] = kwargs["run_id"]
+    entries["ingested_at"] = datetime.datetime.now().isoformat()
+    append_to_manifest(entries, manifest_path)
+
+    os.remove(f"{claim_dir}.csv")
+    os.rmdir(claim_dir)
+    basic_logger.info(f"Files archived: {len(entries)} ({archive_dir})")
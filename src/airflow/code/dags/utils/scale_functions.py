@@ -5,12 +5,16 @@
 # LIB
 from scipy.stats import zscore
 import numpy as np
+import os
 import pandas as pd
+import pyarrow.parquet as pq
+import shutil
 from typing import Callable
 
 
 
-from utils.generic_functions import convert_dict_df
+from utils.config import CLEAN_SCALE_CHUNK_ROWS
+from utils.generic_functions import get_handoff_dir, get_parquet_reference
 from utils.logger import basic_logger
 
 
@@ -23,20 +27,20 @@ def corr_zscore(x, quant_corr = 0.995):
     """
     Apply zscore method to remove anomalies from time weight series.
     x must be a time-ordered series of weight measured by one scale (and only one !).
+    Each jump (diff whose absolute zscore is above the quant_corr quantile) is subtracted from the following weights:
+    the correction is the cumulative sum of the jumps, O(n). x is not modified.
     """
-    
+    x = np.asarray(x)
+    if x.size == 0:
+        return x.copy()
+
     diff = np.append(np.array(0), np.diff(x))
     zscore_x = zscore(diff)
 
     z_treshold = np.quantile(zscore_x, quant_corr)
-    
-    corr = x
-    
-    for idx in range(len(x)):
-        if (abs(zscore_x[idx]) > z_treshold):
-            corr[idx:] = (x[idx:] - diff[idx])
-            
-    return(corr)
+    jumps = np.abs(zscore_x) > z_treshold
+
+    return x - np.cumsum(np.where(jumps, diff, 0))
 
 
 
@@ -62,80 +66,109 @@ def correct_weight_variations(df: pd.DataFrame, method:Callable = corr_zscore) -
 
 
 
+def filter_scale_rows(df:pd.DataFrame, weight_interval_min:float, weight_interval_max:float, min_date:str) -> pd.DataFrame:
+    """
+    Row rules of the scale data cleaning (a row is kept or removed on its own values): applied chunk by chunk
+
+    args:
+        - df: pd.DataFrame - Chunk of the combined raw data
+        - weight_interval_min, weight_interval_max: float - Acceptable weight values (excluded)
+        - min_date: str - Rows measured before are removed
+
+    returns:
+        - pd.DataFrame: Kept rows, without the unnecessary columns and with the time parsed
+    """
+    # LOCATION (LAT / LON)
+    # Some providers invert LAT & LON
+    lab = df["const"] == "LAB"
+    df.loc[lab, ["lat", "lon"]] = df.loc[lab, ["lon", "lat"]].to_numpy()
+
+    # Remove missing or zero lat/long values & bad weight values (not in the weight_interval)
+    keep = df["lat"].notna() & df["lon"].notna() & (df["lat"] != 0) & (df["lon"] != 0)
+    keep &= (df["poids"] > weight_interval_min) & (df["poids"] < weight_interval_max)
+
+    # COLS
+    # Remove unnecessary columns (keep const for weight variation), drop NaN
+    df = df.loc[keep].drop(columns = ["name", "ruche", "qloc", "activ"]).dropna()
+
+    # Dates before specified min date are not kept (the min date day is kept)
+    df["time"] = pd.to_datetime(df["time"])
+    return df[df["time"] >= pd.Timestamp(min_date)]
+
+
+
+def compact_scale_dtypes(df:pd.DataFrame) -> pd.DataFrame:
+    """
+    Categoricals for the provider & scale, float32 weights (time & date are datetime64)
+    """
+    return df.astype({"const": "category", "bal": "category", "poids": "float32", "corrected_weight": "float32"})
+
+
+
 def clean_scale_data(weight_variation_function:Callable = correct_weight_variations, **kwargs) -> dict:
     """
-    Cleans and processes scale data from a combined DataFrame, applies weight variation corrections, and returns the cleaned DataFrame.
+    Cleans and processes the combined raw scale data by chunks, applies weight variation corrections scale by scale,
+    and writes the cleaned data as one flat parquet file per scale (scale-<n>.parquet, not a bal= partitioned dataset).
+    Peak memory is bounded by the largest chunk or scale history, not by the combined data size.
     Args:
         weight_variation_function (Callable, optional): Function to correct weight variations. Defaults to correct_weight_variations.
         **kwargs: Additional keyword arguments required for processing:
             - task_instance: The task instance from which to pull XCom data.
-            - task_ids: The task IDs to pull XCom data from.
+            - task_ids: The task IDs to pull XCom data from (handoff reference of the combined raw data).
             - weight_interval_min: Minimum acceptable weight value.
             - weight_interval_max: Maximum acceptable weight value.
             - min_date: Minimum acceptable date for the data.
+            - chunk_rows: Rows read at once (default: CLEAN_SCALE_CHUNK_ROWS).
     Returns:
-        dict: The cleaned and processed DataFrame as a dictionary.
+        dict: Handoff reference (path, schema, rows) of the cleaned data directory.
     Raises:
         ValueError: If the cleaned combined DataFrame is empty.
     Notes:
-        - The function handles location data by correcting inverted latitude and longitude values for specific providers.
-        - It removes rows with missing or zero latitude/longitude values.
-        - It filters out rows with weight values outside the specified interval.
-        - Unnecessary columns are dropped, and the DataFrame is cleaned of NaN values and duplicates.
-        - Rows with dates before the specified minimum date are removed.
-        - The DataFrame is sorted by time, and a new date column is added.
-        - The weight variation function is applied to the cleaned DataFrame.
+        - Chunks (row rules, filter_scale_rows): location data of the LAB provider is inverted back, rows with missing or zero
+          latitude/longitude values, weight values outside the specified interval, NaN values or dates before the specified
+          minimum date are removed, unnecessary columns are dropped. Kept rows are spilled to a staging file per scale.
+        - Scales: duplicates are removed, rows are sorted by time, a date column (datetime64) is added
+          and the weight variation function is applied, dtypes are compacted (compact_scale_dtypes).
     """
     # FUNCTION LOGIC
     task_instance = kwargs.get('task_instance')
-    combined_dict = task_instance.xcom_pull(task_ids = kwargs["task_ids"])
-
-    combined_df = convert_dict_df(combined_dict) # Reverse previous conversion to DataFrame (dict -> DataFrame due to XCom serialization)
-    basic_logger.info(f"Combined DataFrame: {combined_df.shape}")
-
-
-    # CLEAN LOGIC
-    # LOCATION (LAT / LON)
-    # Some providers invert LAT & LON
-    if (combined_df['const'] == 'LAB').any():
-        combined_df['lat'], combined_df['lon'] = combined_df['lon'], combined_df['lat']
-
-    # Remove missing lat/long values
-    combined_df = combined_df.dropna(subset=['lat', 'lon'])
-    combined_df = combined_df[(combined_df['lat'] != 0) & (combined_df['lon'] != 0)]
-
-    # WEIGHTS
-    # Remove bad weight values (not in the weight_interval)
-    combined_df = combined_df[(combined_df['poids'] > kwargs["weight_interval_min"]) & (combined_df['poids'] < kwargs["weight_interval_max"])]
-
-    # COLS
-    # Remove unnecessary columns (keep const for weight variation), drop NaN et duplicates
-    combined_df = combined_df.drop(columns=['name', 'ruche', 'qloc', 'activ'])
-    combined_df = combined_df.dropna()
-    combined_df.drop_duplicates(inplace=True)
-
-    # Dates before specified min date are not kept
-    combined_df = combined_df[combined_df['time'] > kwargs["min_date"]]
-    
-    # Sort by time col & reset index
-    combined_df = combined_df.sort_values(by=['time'])
-    combined_df.reset_index(drop=True, inplace=True)
-    # Add a date col containing the date extracted from the time col
-    combined_df['date'] = pd.to_datetime(combined_df['time']).dt.date
-    combined_df['date'] = combined_df['date'].astype(str)
-
+    source_path = task_instance.xcom_pull(task_ids = kwargs["task_ids"])["path"]
+    output_dir = os.path.join(get_handoff_dir(kwargs), task_instance.task_id)
+    staging_dir = f"{output_dir}_staging"
+    for directory in (output_dir, staging_dir):
+        shutil.rmtree(directory, ignore_errors = True)      # Previous try
+        os.makedirs(directory)
+
+
+    # CLEAN LOGIC (CHUNKS)
+    scales: dict = {}       # Scale: staging & output files index
+    source = pq.ParquetFile(source_path)
+    basic_logger.info(f"Combined data: {source.metadata.num_rows} rows")
+    for chunk_index, batch in enumerate(source.iter_batches(batch_size = kwargs.get("chunk_rows", CLEAN_SCALE_CHUNK_ROWS))):
+        chunk_df = filter_scale_rows(batch.to_pandas(), kwargs["weight_interval_min"], kwargs["weight_interval_max"], kwargs["min_date"])
+        for scale, scale_df in chunk_df.groupby("bal", sort = False):
+            scale_dir = os.path.join(staging_dir, str(scales.setdefault(scale, len(scales))))
+            os.makedirs(scale_dir, exist_ok = True)
+            scale_df.to_parquet(os.path.join(scale_dir, f"chunk-{chunk_index}.parquet"), index = False)
+
+
+    # CLEAN & WEIGHT VARIATION LOGIC (SCALES)
+    for scale, scale_index in scales.items():
+        scale_df = pd.read_parquet(os.path.join(staging_dir, str(scale_index)))
+        scale_df = scale_df.drop_duplicates().sort_values(by = ["time"], kind = "stable").reset_index(drop = True)
+        # Add a date col containing the date of the time col
+        scale_df["date"] = scale_df["time"].dt.normalize()
+
+        corrected_scale_df = compact_scale_dtypes(weight_variation_function(scale_df))
+        corrected_scale_df.to_parquet(os.path.join(output_dir, f"scale-{scale_index}.parquet"), index = False)
+
+    shutil.rmtree(staging_dir)
     # END OF CLEAN LOGIC
 
 
-    # WEIGHT VARIATION LOGIC
-    corrected_combined_df = weight_variation_function(combined_df)
-
-    # END OF WEIGHT VARIATION LOGIC
-
-
-
-    if corrected_combined_df.empty:
+    if not scales:
         basic_logger.warning("Cleaned combined DataFrame is empty, failing task...")
         raise ValueError("Cleaned combined DataFrame is empty")
-    
-    return corrected_combined_df
+
+    basic_logger.info(f"Cleaned data: {len(scales)} scales ({output_dir})")
+    return get_parquet_reference(output_dir)
@@ -9,6 +9,7 @@ import pandas as pd
 import pickle
 import piecewise_regression
 
+from utils.generic_functions import pull_dataframe
 from utils.logger import basic_logger
 
 
@@ -230,7 +231,7 @@ def df_segmentation_operation(**kwargs) -> pd.DataFrame:
     """
     # FUNCTION LOGIC
     task_instance = kwargs.get('task_instance')
-    df = task_instance.xcom_pull(task_ids = kwargs["task_ids"])
+    df = pull_dataframe(task_instance, kwargs["task_ids"])
 
 
     concatened_df_segments= pd.DataFrame()
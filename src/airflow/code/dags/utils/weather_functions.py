@@ -8,6 +8,7 @@ from openmeteo_requests.Client import OpenMeteoRequestsError
 import pandas as pd
 
 from utils.config import openmeteo, historical_forecast_url, params_daily_weather, openmeteo_models
+from utils.generic_functions import pull_dataframe
 from utils.logger import basic_logger
 
 
@@ -27,7 +28,7 @@ def get_start_end_date_by_location(**kwargs) -> pd.DataFrame:
         - pd.DataFrame: DataFrame with the first and last date for each location
     """
     task_instance = kwargs.get('task_instance')
-    df_to_fill = task_instance.xcom_pull(task_ids = kwargs["task_ids"])
+    df_to_fill = pull_dataframe(task_instance, kwargs["task_ids"], columns = ["lat", "lon", "date"])
 
     # Group by location and date to get the first and last date for each location
     weather_agg_df = df_to_fill.groupby(["lat", "lon", "date"]).size().reset_index(name = "count")
@@ -35,6 +36,9 @@ def get_start_end_date_by_location(**kwargs) -> pd.DataFrame:
     # Get the first and last date for each location and return it
 
     weather_agg_df = weather_agg_df.groupby(['lat', 'lon']).agg(date_min = ('date', 'min'), date_max = ('date', 'max')).reset_index()
+    # OpenMeteo dates (cleaned scale dates are datetime64)
+    weather_agg_df["date_min"] = pd.to_datetime(weather_agg_df["date_min"]).dt.strftime("%Y-%m-%d")
+    weather_agg_df["date_max"] = pd.to_datetime(weather_agg_df["date_max"]).dt.strftime("%Y-%m-%d")
     basic_logger.info(f"Len weather_agg_df: {len(weather_agg_df)}")
 
     return weather_agg_df
@@ -119,7 +123,7 @@ def fetch_weather_data(**kwargs) -> pd.DataFrame:
         - In case of an error fetching data for a location, the function logs the error and fills the data with NaNs for that location.
     """
     task_instance = kwargs.get('task_instance')
-    df_with_loc_and_date = task_instance.xcom_pull(task_ids = kwargs["task_ids"])
+    df_with_loc_and_date = pull_dataframe(task_instance, kwargs["task_ids"])
 
 
     no_data_loc_list : list = []
@@ -152,5 +156,6 @@ def fetch_weather_data(**kwargs) -> pd.DataFrame:
             results.append(pd.DataFrame(weather_data))
 
     output_df = pd.concat(results, ignore_index=True)
+    output_df["date"] = pd.to_datetime(output_df["date"])       # Joined with the cleaned scale dates (datetime64)
 
     return output_df
\ No newline at end of file
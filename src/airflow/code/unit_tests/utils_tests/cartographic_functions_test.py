@@ -0,0 +1,90 @@
+# airflow/unit_tests/utils_tests/cartographic_functions_test.py
+# export PYTHONPATH=$(pwd)/dags
+
+
+# Lib
+import numpy as np
+import pandas as pd
+import pytest
+from unittest.mock import MagicMock, patch
+
+from utils.cartographic_functions import get_landcover_features, fetch_cartographic_data
+
+
+
+SUMMARY = [
+    {"culture": "BTH", "legende": "cereales", "part": 0.30, "aire": 23.6, "aire_bio": 4.0},
+    {"culture": "CZH", "legende": "oleagineux", "part": 0.25, "aire": 19.6, "aire_bio": None},
+    {"culture": "ORH", "legende": "cereales", "part": 0.10, "aire": 7.8, "aire_bio": 1.9},
+]
+
+
+
+# get_landcover_features
+def test_landcover_features_empty_summary():
+    features = get_landcover_features([])
+    assert features["rpg_part"] == 0.0
+    assert np.isnan(features["bio"]) and pd.isna(features["culture"]) and pd.isna(features["legende"])
+    assert not [key for key in features if key.startswith("part_")]
+
+
+def test_landcover_features_dominant_legend():
+    features = get_landcover_features(SUMMARY)
+
+    # First culture of the summary (sorted by share), legend with the largest summed share
+    assert features["culture"] == "BTH"
+    assert features["legende"] == "cereales"
+    assert features["part_cereales"] == pytest.approx(0.40)
+    assert features["part_oleagineux"] == pytest.approx(0.25)
+    assert features["rpg_part"] == pytest.approx(0.65)
+
+
+def test_landcover_features_organic_share():
+    features = get_landcover_features(SUMMARY)
+    assert features["bio"] == pytest.approx((4.0 + 1.9) / (23.6 + 19.6 + 7.8))
+
+    no_area = get_landcover_features([{**SUMMARY[0], "aire": 0.0, "aire_bio": 0.0}])
+    assert np.isnan(no_area["bio"])
+
+
+
+# fetch_cartographic_data
+def summary_response(locations: list) -> MagicMock:
+    response = MagicMock()
+    response.json.return_value = {location["location_name"]: ({"rpg-2022": SUMMARY} if location["location_name"] == "0" else {"rpg-2022": []})
+                                  for location in locations}
+    return response
+
+
+def test_fetch_cartographic_data_unknown_summaries_keep_nan_shares():
+    locations = pd.DataFrame({"lat": [45.1, 45.2, 45.3, 45.4], "lon": [4.1, 4.2, 4.3, 4.4]})
+
+    def post(url, headers, json):
+        names = [location["location_name"] for location in json]
+        if names == ["2", "3"]:
+            raise ConnectionError("API down")
+        if names == ["0", "1"]:
+            return summary_response(json)
+
+    with patch("utils.cartographic_functions.pull_dataframe", return_value = locations), \
+         patch("utils.cartographic_functions.requests.post", side_effect = post):
+        features_df = fetch_cartographic_data(task_instance = None, task_ids = "task", url = "url", radius = 500, year = 2022, batch_size = 2)
+
+    # Known summaries: missing legends cover 0% of the buffer
+    assert features_df.loc[0, "part_oleagineux"] == pytest.approx(0.25)
+    assert features_df.loc[1, ["part_cereales", "part_oleagineux"]].tolist() == [0.0, 0.0]
+    # Failed request: unknown, not "no land cover"
+    assert features_df.loc[[2, 3], ["rpg_part", "part_cereales", "part_oleagineux"]].isna().all().all()
+
+
+def test_fetch_cartographic_data_summary_not_built():
+    locations = pd.DataFrame({"lat": [45.1, 45.2], "lon": [4.1, 4.2]})
+    response = MagicMock()
+    response.json.return_value = {"0": {"rpg-2022": SUMMARY}, "1": {}}          # Over the API builds budget
+
+    with patch("utils.cartographic_functions.pull_dataframe", return_value = locations), \
+         patch("utils.cartographic_functions.requests.post", return_value = response):
+        features_df = fetch_cartographic_data(task_instance = None, task_ids = "task", url = "url", radius = 500, year = 2022, batch_size = 2)
+
+    assert features_df.loc[0, "rpg_part"] == pytest.approx(0.65)
+    assert features_df.loc[1, ["rpg_part", "part_cereales"]].isna().all()
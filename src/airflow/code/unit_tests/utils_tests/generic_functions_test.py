@@ -0,0 +1,35 @@
+# airflow/unit_tests/utils_tests/generic_functions_test.py
+# export PYTHONPATH=$(pwd)/dags
+
+
+# Lib
+import pandas as pd
+
+from utils.generic_functions import merge_df_into_file
+
+
+
+def test_merge_into_file_with_string_dates(tmp_path):
+    # Final file written before the datetime64 dates & times
+    filepath = str(tmp_path / "cleaned_data.parquet")
+    pd.DataFrame({
+        "bal": ["a", "a", "b"],
+        "time": ["2024-05-01 10:00:00", "2024-05-01 11:00:00", "2024-05-01 10:00:00"],
+        "date": ["2024-05-01", "2024-05-01", "2024-05-01"],
+        "poids": [20000.0, 20100.0, 30000.0],
+    }).to_parquet(filepath, index = False)
+
+    new_df = pd.DataFrame({
+        "bal": pd.Categorical(["a", "a"]),
+        "time": pd.to_datetime(["2024-05-01 11:00:00", "2024-05-02 09:00:00"]),
+        "date": pd.to_datetime(["2024-05-01", "2024-05-02"]),
+        "poids": [20150.0, 20300.0],
+    })
+    merge_df_into_file(new_df, filepath, ["bal", "time"])
+
+    merged_df = pd.read_parquet(filepath).sort_values(["bal", "time"]).reset_index(drop = True)
+    assert pd.api.types.is_datetime64_any_dtype(merged_df["time"])
+    assert pd.api.types.is_datetime64_any_dtype(merged_df["date"])
+    # a 11:00 replaced, a 10:00 & b kept, a 09:00 (next day) added
+    assert merged_df[["bal", "poids"]].astype({"bal": str}).values.tolist() == [["a", 20000.0], ["a", 20150.0], ["a", 20300.0], ["b", 30000.0]]
+    assert merged_df["date"].dt.strftime("%Y-%m-%d").tolist() == ["2024-05-01", "2024-05-01", "2024-05-02", "2024-05-01"]
@@ -0,0 +1,154 @@
+# airflow/unit_tests/utils_tests/ingestion_functions_test.py
+# export PYTHONPATH=$(pwd)/dags
+
+
+# Lib
+import os
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from airflow.exceptions import AirflowSkipException
+
+from utils.ingestion_functions import claim_raw_files, archive_claimed_files, get_claim_dir, read_manifest, append_to_manifest
+
+
+
+DAG = SimpleNamespace(dag_id = "scale_etl_pipeline")
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    paths = {name: tmp_path / name for name in ("raw", "archives")}
+    for path in paths.values():
+        path.mkdir()
+    paths["claim"] = paths["raw"] / ".claimed"
+    paths["claim"].mkdir()
+    paths["manifest"] = paths["archives"] / "manifest.csv"
+    return paths
+
+
+def write_raw_file(directory, name: str, content: str, age: float = 60) -> None:
+    path = directory / name
+    path.write_text(content)
+    os.utime(path, (time.time() - age, time.time() - age))
+
+
+def claim(dirs, run_id: str, running: set = frozenset()) -> dict:
+    with patch("utils.ingestion_functions.get_running_run_dirnames", return_value = set(running)):
+        return claim_raw_files(raw_dir = str(dirs["raw"]), pattern = "*.txt", min_age = 10, claim_root = str(dirs["claim"]),
+                               archives_dir = str(dirs["archives"]), manifest_path = str(dirs["manifest"]), run_id = run_id, dag = DAG)
+
+
+def archive(dirs, run_id: str) -> None:
+    archive_claimed_files(archives_dir = str(dirs["archives"]), claim_root = str(dirs["claim"]), manifest_path = str(dirs["manifest"]), run_id = run_id)
+
+
+
+# TESTS
+def test_claim_moves_new_files(dirs):
+    write_raw_file(dirs["raw"], "scale_1.txt", "a")
+    write_raw_file(dirs["raw"], "scale_2.txt", "b")
+    write_raw_file(dirs["raw"], "notes.csv", "c")
+
+    result = claim(dirs, "manual__2024-01-01T00:00:00+00:00")
+
+    claim_dir = get_claim_dir("manual__2024-01-01T00:00:00+00:00", str(dirs["claim"]))
+    assert result == {"claim_dir": claim_dir, "files": 2}
+    assert sorted(os.listdir(claim_dir)) == ["scale_1.txt", "scale_2.txt"]
+    assert sorted(os.listdir(dirs["raw"])) == [".claimed", "notes.csv"]
+    assert os.path.exists(f"{claim_dir}.csv")
+
+
+def test_claim_skips_recent_files(dirs):
+    write_raw_file(dirs["raw"], "scale_1.txt", "a", age = 0)        # May still be written
+
+    with pytest.raises(AirflowSkipException):
+        claim(dirs, "run_1")
+
+    assert "scale_1.txt" in os.listdir(dirs["raw"])
+    assert os.listdir(dirs["claim"]) == []
+
+
+def test_claim_archives_duplicates(dirs):
+    write_raw_file(dirs["raw"], "scale_1.txt", "same content")
+    claim(dirs, "run_1")
+    archive(dirs, "run_1")
+
+    # Sent again (other name, same content), with a new file
+    write_raw_file(dirs["raw"], "scale_1_resent.txt", "same content")
+    write_raw_file(dirs["raw"], "scale_2.txt", "new content")
+    result = claim(dirs, "run_2")
+
+    assert result["files"] == 1
+    assert os.listdir(result["claim_dir"]) == ["scale_2.txt"]
+    assert os.listdir(dirs["archives"] / "duplicates" / "run_2") == ["scale_1_resent.txt"]
+
+
+def test_claim_nothing_new_skips_the_run(dirs):
+    write_raw_file(dirs["raw"], "scale_1.txt", "a")
+    claim(dirs, "run_1")
+    archive(dirs, "run_1")
+    write_raw_file(dirs["raw"], "scale_1.txt", "a")
+
+    with pytest.raises(AirflowSkipException):
+        claim(dirs, "run_2")
+    assert os.listdir(dirs["claim"]) == []
+
+
+def test_archive_records_manifest(dirs):
+    write_raw_file(dirs["raw"], "scale_1.txt", "a")
+    write_raw_file(dirs["raw"], "scale_2.txt", "b")
+    claim_dir = claim(dirs, "run_1")["claim_dir"]
+
+    archive(dirs, "run_1")
+
+    manifest = read_manifest(str(dirs["manifest"]))
+    assert sorted(manifest["path"]) == [str(dirs["raw"] / "scale_1.txt"), str(dirs["raw"] / "scale_2.txt")]
+    assert set(manifest["run_id"]) == {"run_1"}
+    assert all(os.path.exists(path) for path in manifest["archive_path"])
+    assert not os.path.exists(claim_dir) and not os.path.exists(f"{claim_dir}.csv")
+
+    # Appended by the next runs, header written once
+    write_raw_file(dirs["raw"], "scale_3.txt", "c")
+    claim(dirs, "run_2")
+    archive(dirs, "run_2")
+    assert len(read_manifest(str(dirs["manifest"]))) == 3
+
+
+def test_read_manifest_empty_file(dirs):
+    dirs["manifest"].write_text("")
+    assert read_manifest(str(dirs["manifest"])).empty
+    append_to_manifest(read_manifest(str(dirs["manifest"])), str(dirs["manifest"]))
+    assert read_manifest(str(dirs["manifest"])).empty
+
+
+def test_claim_adopts_files_of_failed_runs(dirs):
+    write_raw_file(dirs["raw"], "scale_1.txt", "a")
+    write_raw_file(dirs["raw"], "scale_2.txt", "b")
+    failed_claim_dir = claim(dirs, "run_failed")["claim_dir"]        # Failed before Archive.Raw.Files
+
+    # Same file name sent again before the next run
+    write_raw_file(dirs["raw"], "scale_1.txt", "a, updated")
+    result = claim(dirs, "run_2")
+
+    # Both scale_1.txt are kept (the new one is renamed)
+    assert result["files"] == 3
+    assert sorted(os.listdir(result["claim_dir"])) == ["1_scale_1.txt", "scale_1.txt", "scale_2.txt"]
+    assert {open(os.path.join(result["claim_dir"], file)).read() for file in ("1_scale_1.txt", "scale_1.txt")} == {"a", "a, updated"}
+    assert not os.path.exists(failed_claim_dir) and not os.path.exists(f"{failed_claim_dir}.csv")
+
+    archive(dirs, "run_2")
+    assert len(read_manifest(str(dirs["manifest"]))) == 3
+
+
+def test_claim_leaves_files_of_running_runs(dirs):
+    write_raw_file(dirs["raw"], "scale_1.txt", "a")
+    running_claim_dir = claim(dirs, "run_1")["claim_dir"]
+    write_raw_file(dirs["raw"], "scale_2.txt", "b")
+
+    result = claim(dirs, "run_2", running = {"run_1"})
+
+    assert os.listdir(result["claim_dir"]) == ["scale_2.txt"]
+    assert os.listdir(running_claim_dir) == ["scale_1.txt"]
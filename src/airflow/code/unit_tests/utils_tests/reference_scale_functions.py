@@ -0,0 +1,32 @@
+# airflow/unit_tests/utils_tests/reference_scale_functions.py
+# export PYTHONPATH=$(pwd)/dags
+
+"""
+Reference implementations of the scale cleaning functions, not shipped with the DAGs
+- Used by the parity tests (scale_functions_test.py) and benchmarks (benchmarks/corr_zscore_benchmark.py)
+"""
+
+
+# Lib
+import numpy as np
+from scipy.stats import zscore
+
+
+
+def corr_zscore_loop(x, quant_corr = 0.995):
+    """
+    Previous implementation of corr_zscore (rewrites the tail on each jump, O(n²), modifies x)
+    """
+    
+    diff = np.append(np.array(0), np.diff(x))
+    zscore_x = zscore(diff)
+
+    z_treshold = np.quantile(zscore_x, quant_corr)
+    
+    corr = x
+    
+    for idx in range(len(x)):
+        if (abs(zscore_x[idx]) > z_treshold):
+            corr[idx:] = (x[idx:] - diff[idx])
+            
+    return(corr)
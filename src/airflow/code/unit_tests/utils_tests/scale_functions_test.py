@@ -0,0 +1,73 @@
+# airflow/unit_tests/utils_tests/scale_functions_test.py
+# export PYTHONPATH=$(pwd)/dags
+
+
+# Lib
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.scale_functions import corr_zscore, correct_weight_variations
+from reference_scale_functions import corr_zscore_loop
+
+
+
+def weight_series(size:int, jumps:int, seed:int = 0) -> np.ndarray:
+    """
+    Scale weights (random walk) with harvests & hive additions (large jumps)
+    """
+    rng = np.random.default_rng(seed)
+    weights = 20000 + rng.normal(0, 20, size).cumsum()
+    for index in rng.integers(1, size, jumps):
+        weights[index:] += rng.choice([-1, 1]) * rng.uniform(2000, 8000)
+    return weights
+
+
+
+# TESTS
+@pytest.mark.parametrize("size, jumps, seed", [(10, 1, 0), (500, 3, 1), (5000, 10, 2), (20000, 0, 3), (20000, 40, 4)])
+def test_corr_zscore_matches_loop(size, jumps, seed):
+    weights = weight_series(size, jumps, seed)
+    expected = corr_zscore_loop(weights.copy())
+    assert np.allclose(corr_zscore(weights), expected, rtol = 0, atol = 1e-6)
+
+
+@pytest.mark.parametrize("quant_corr", [0.5, 0.9, 0.995, 1.0])
+def test_corr_zscore_matches_loop_quantiles(quant_corr):
+    weights = weight_series(2000, 5, 5)
+    assert np.allclose(corr_zscore(weights, quant_corr), corr_zscore_loop(weights.copy(), quant_corr), rtol = 0, atol = 1e-6)
+
+
+def test_corr_zscore_matches_loop_integers():
+    weights = weight_series(1000, 4, 6).astype(np.int64)
+    expected = corr_zscore_loop(weights.copy())
+    result = corr_zscore(weights)
+    assert result.dtype == expected.dtype
+    assert np.array_equal(result, expected)
+
+
+@pytest.mark.parametrize("weights", [np.array([]), np.array([20000.0]), np.full(100, 20000.0)])
+def test_corr_zscore_edge_cases(weights):
+    assert np.array_equal(corr_zscore(weights), corr_zscore_loop(weights.copy()))
+
+
+def test_corr_zscore_removes_jump():
+    weights = np.concatenate([np.full(500, 20000.0), np.full(500, 25000.0)]) + np.tile([0.0, 1.0], 500)
+    corrected = corr_zscore(weights)
+    assert np.abs(corrected - corrected[0]).max() <= 2.0
+
+
+def test_corr_zscore_does_not_modify_input():
+    weights = weight_series(1000, 5, 7)
+    original = weights.copy()
+    corr_zscore(weights)
+    assert np.array_equal(weights, original)
+
+
+def test_correct_weight_variations_per_scale():
+    df = pd.DataFrame({"bal": ["a"] * 1000 + ["b"] * 1000,
+                       "poids": np.concatenate([weight_series(1000, 3, 8), weight_series(1000, 3, 9)])})
+    corrected = correct_weight_variations(df.copy())
+    for scale in ("a", "b"):
+        weights = df.loc[df["bal"] == scale, "poids"].to_numpy()
+        assert np.allclose(corrected.loc[df["bal"] == scale, "corrected_weight"], corr_zscore_loop(weights.copy()))
@@ -0,0 +1,104 @@
+# api/benchmarks/serialization_benchmark.py
+# export PYTHONPATH=$(pwd)
+# python benchmarks/serialization_benchmark.py [--locations 10] [--features 500] [--hours 2208] [--repeat 20]
+
+"""
+Payload encoding benchmark for /carto and /weather
+- baseline: what FastAPI did before (jsonable_encoder + stdlib json, Starlette JSONResponse)
+- fast: carto through the response_model (pydantic-core) + FastJSONResponse, weather numpy arrays + FastJSONResponse
+"""
+
+
+# Lib
+import argparse
+import json
+import random
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from models.cartographic_base_models import CartoResponse
+from utils.config import params_daily_weather, params_hourly_weather
+from utils.responses import FastJSONResponse
+
+
+
+def build_carto_payload(locations:int, features:int) -> dict:
+    """
+    Nested carto dict with WKT polygons, same shape as get_carto_from_database
+    """
+    polygon = "POLYGON ((" + ", ".join(f"{2.35 + random.random() / 100} {48.85 + random.random() / 100}" for _ in range(40)) + "))"
+    feature = {"culture": "Colza d'hiver", "bio": 0, "legende": "Colza", "couleur": "#ffd700",
+               "source": "RPG 2022", "emplacement": "location", "aire": 1.2345, "geometry": polygon}
+    return {
+        f"location_{i}": {
+            "rpg-2022": {"rpg-2022": [dict(feature) for _ in range(features)]},
+            "clc-2018": {"clc-2018": [dict(feature, culture = None, bio = None) for _ in range(features // 5)]},
+        }
+        for i in range(locations)
+    }
+
+
+def build_weather_payloads(hours:int) -> tuple:
+    """
+    Weather response before (python lists of floats & Timestamps) and after (numpy arrays & ISO strings)
+    """
+    days = hours // 24
+    hourly_dates = pd.date_range("2024-01-01", periods = hours, freq = "h", tz = "UTC")
+    daily_dates = pd.date_range("2024-01-01", periods = days, freq = "D", tz = "UTC")
+    hourly_values = {elt: np.random.rand(hours).astype(np.float32) for elt in params_hourly_weather}
+    daily_values = {elt: np.random.rand(days).astype(np.float32) for elt in params_daily_weather}
+
+    baseline = (
+        {"date": daily_dates.tolist(), **{k: v.tolist() for k, v in daily_values.items()}},
+        {"date": list(hourly_dates), **{k: [float(x) for x in v] for k, v in hourly_values.items()}},
+    )
+    fast = (
+        {"date": daily_dates.strftime("%Y-%m-%dT%H:%M:%S+00:00").tolist(), **daily_values},
+        {"date": hourly_dates.strftime("%Y-%m-%dT%H:%M:%S+00:00").tolist(), **hourly_values},
+    )
+    return baseline, fast
+
+
+def baseline_encode(content) -> bytes:
+    return json.dumps(jsonable_encoder(content), ensure_ascii = False, allow_nan = False,
+                      indent = None, separators = (",", ":")).encode("utf-8")
+
+
+def measure(func, repeat:int) -> tuple:
+    timings = []
+    for _ in range(repeat):
+        before_time = time.perf_counter()
+        body = func()
+        timings.append(time.perf_counter() - before_time)
+    return statistics.median(timings), len(body)
+
+
+def report(name:str, baseline:tuple, fast:tuple) -> None:
+    print(f"{name:<8} baseline {baseline[0] * 1000:9.2f} ms ({baseline[1]:>10} bytes) | "
+          f"fast {fast[0] * 1000:9.2f} ms ({fast[1]:>10} bytes) | x{baseline[0] / fast[0]:.1f}")
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmark /carto and /weather payload encoding")
+    parser.add_argument("--locations", type = int, default = 10)
+    parser.add_argument("--features", type = int, default = 500)
+    parser.add_argument("--hours", type = int, default = 92 * 24)
+    parser.add_argument("--repeat", type = int, default = 20)
+    args = parser.parse_args()
+
+    carto_payload = build_carto_payload(args.locations, args.features)
+    carto_adapter = TypeAdapter(CartoResponse)
+    report("carto",
+           measure(lambda: baseline_encode(carto_payload), args.repeat),
+           measure(lambda: FastJSONResponse(carto_adapter.dump_python(carto_adapter.validate_python(carto_payload), mode = "json")).body, args.repeat))
+
+    weather_baseline, weather_fast = build_weather_payloads(args.hours)
+    report("weather",
+           measure(lambda: baseline_encode(weather_baseline), args.repeat),
+           measure(lambda: FastJSONResponse(weather_fast).body, args.repeat))
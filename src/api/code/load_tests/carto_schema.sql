@@ -0,0 +1,79 @@
+-- api/load_tests/carto_schema.sql
+-- Synthetic carto database for the load tests: same tables & columns as the ones queried by the API
+-- (utils/postgres_requests/cartographic_requests.py), a grid of 60m x 60m parcels around each scenario location
+
+
+CREATE EXTENSION IF NOT EXISTS postgis;
+
+
+CREATE TABLE IF NOT EXISTS rpg_typologie_apicole (
+  code_apicole INTEGER PRIMARY KEY,
+  libelle_apicole VARCHAR(100) NOT NULL,
+  couleur VARCHAR(7) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS rpg_code_culture (
+  code_culture VARCHAR(5) PRIMARY KEY,
+  libelle_culture VARCHAR(255) NOT NULL,
+  code_apicole INTEGER NOT NULL REFERENCES rpg_typologie_apicole(code_apicole)
+);
+
+CREATE TABLE IF NOT EXISTS registre_parcellaire_graphique (
+  id SERIAL PRIMARY KEY,
+  code_culture VARCHAR(5) NOT NULL REFERENCES rpg_code_culture(code_culture),
+  bio2 INTEGER,
+  annee_rpg INTEGER NOT NULL,
+  geometry geometry(Polygon, 4326) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS libelle_clc (
+  code_18 VARCHAR(3) PRIMARY KEY,
+  libelle_clc VARCHAR(255) NOT NULL,
+  couleur VARCHAR(7) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS corine_land_cover (
+  id SERIAL PRIMARY KEY,
+  code_18 VARCHAR(3) NOT NULL REFERENCES libelle_clc(code_18),
+  annee_clc INTEGER NOT NULL,
+  geometry geometry(Polygon, 4326) NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS registre_parcellaire_graphique_geometry_idx ON registre_parcellaire_graphique USING GIST (geometry);
+CREATE INDEX IF NOT EXISTS corine_land_cover_geometry_idx ON corine_land_cover USING GIST (geometry);
+
+
+TRUNCATE registre_parcellaire_graphique, corine_land_cover, rpg_code_culture, rpg_typologie_apicole, libelle_clc;
+
+INSERT INTO rpg_typologie_apicole (code_apicole, libelle_apicole, couleur) VALUES
+  (1, 'Très mellifère', '#ffd700'), (2, 'Mellifère', '#ffa500'), (3, 'Peu mellifère', '#d2b48c'), (4, 'Non mellifère', '#a9a9a9');
+
+INSERT INTO rpg_code_culture (code_culture, libelle_culture, code_apicole) VALUES
+  ('CZH', 'Colza d''hiver', 1), ('TRN', 'Tournesol', 1), ('LUZ', 'Luzerne', 2), ('PPH', 'Prairie permanente', 3), ('BTH', 'Blé tendre d''hiver', 4);
+
+INSERT INTO libelle_clc (code_18, libelle_clc, couleur) VALUES
+  ('112', 'Tissu urbain discontinu', '#ff0000'), ('211', 'Terres arables', '#ffffa8'), ('231', 'Prairies', '#e6e64d'), ('311', 'Forêts de feuillus', '#80ff00');
+
+
+-- Scenario locations (load_tests/scenarios.py): Paris, Lyon, Toulouse
+WITH centers (longitude, latitude) AS (VALUES (2.3522, 48.8566), (4.8357, 45.7640), (1.4442, 43.6047)),
+     cells AS (
+       SELECT c.longitude + x * 0.0008 AS longitude, c.latitude + y * 0.00055 AS latitude, x, y
+       FROM centers c, generate_series(-40, 40) x, generate_series(-40, 40) y
+     )
+INSERT INTO registre_parcellaire_graphique (code_culture, bio2, annee_rpg, geometry)
+SELECT (ARRAY['CZH', 'TRN', 'LUZ', 'PPH', 'BTH'])[1 + abs(x + y) % 5], abs(x * y) % 2, annee,
+       ST_MakeEnvelope(longitude, latitude, longitude + 0.0008, latitude + 0.00055, 4326)
+FROM cells, generate_series(2021, 2023) annee;
+
+WITH centers (longitude, latitude) AS (VALUES (2.3522, 48.8566), (4.8357, 45.7640), (1.4442, 43.6047)),
+     cells AS (
+       SELECT c.longitude + x * 0.004 AS longitude, c.latitude + y * 0.00275 AS latitude, x, y
+       FROM centers c, generate_series(-8, 8) x, generate_series(-8, 8) y
+     )
+INSERT INTO corine_land_cover (code_18, annee_clc, geometry)
+SELECT (ARRAY['112', '211', '231', '311'])[1 + abs(x - y) % 4], annee,
+       ST_MakeEnvelope(longitude, latitude, longitude + 0.004, latitude + 0.00275, 4326)
+FROM cells, generate_series(2021, 2023) annee;
+
+ANALYZE;
@@ -0,0 +1,167 @@
+# api/load_tests/fake_openmeteo.py
+# export PYTHONPATH=$(pwd)
+# python load_tests/fake_openmeteo.py [--port 8090] [--latency-ms 80] [--recordings load_tests/recordings]
+
+"""
+OpenMeteo fake
+- Serves the flatbuffers responses recorded by record_openmeteo.py (recordings/forecast.fb, recordings/archive.fb)
+- Without recording, a synthetic response with the requested variables and time range is built (same layout as the API)
+- Optional latency to emulate the real API round trip
+"""
+
+
+# Lib
+import argparse
+import asyncio
+import logging
+import os
+from datetime import date, datetime, timedelta, timezone
+
+import flatbuffers
+import numpy as np
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+
+RECORDINGS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recordings")
+logger = logging.getLogger("fake_openmeteo")
+
+
+
+"""
+Synthetic responses (openmeteo_sdk flatbuffers schema)
+- WeatherApiResponse: latitude (0), longitude (1), elevation (2), utc_offset_seconds (6), current (9), daily (10), hourly (11)
+- VariablesWithTime: time (0), time_end (1), interval (2), variables (3)
+- VariableWithValues: variable (0), unit (1), value (2), values (3)
+"""
+def build_variables_with_time(builder: flatbuffers.Builder, start: int, end: int, interval: int, variables: list) -> int:
+    """
+    variables: list of float (current values) or numpy float32 arrays (daily / hourly values)
+    """
+    offsets = []
+    for index, values in enumerate(variables):
+        values_offset = builder.CreateNumpyVector(values) if isinstance(values, np.ndarray) else None
+        builder.StartObject(4)
+        builder.PrependUint8Slot(0, index + 1, 0)
+        if values_offset is None:
+            builder.PrependFloat32Slot(2, float(values), 0.0)
+        else:
+            builder.PrependUOffsetTRelativeSlot(3, values_offset, 0)
+        offsets.append(builder.EndObject())
+
+    builder.StartVector(4, len(offsets), 4)
+    for offset in reversed(offsets):
+        builder.PrependUOffsetTRelative(offset)
+    variables_offset = builder.EndVector()
+
+    builder.StartObject(4)
+    builder.PrependInt64Slot(0, start, 0)
+    builder.PrependInt64Slot(1, end, 0)
+    builder.PrependInt32Slot(2, interval, 0)
+    builder.PrependUOffsetTRelativeSlot(3, variables_offset, 0)
+    return builder.EndObject()
+
+
+
+def build_weather_response(latitude: float, longitude: float, start_day: date, days: int,
+                           daily: list, hourly: list, current: list = None, seed: int = 0) -> bytes:
+    """
+    Build a size prefixed WeatherApiResponse, as returned by the API with format=flatbuffers
+    """
+    generator = np.random.default_rng(seed)
+    start = int(datetime(start_day.year, start_day.month, start_day.day, tzinfo = timezone.utc).timestamp())
+    end = start + days * 86400
+
+    builder = flatbuffers.Builder(4096)
+    current_offset = None
+    if current:
+        current_offset = build_variables_with_time(builder, end, end + 900, 900,
+                                                   [float(value) for value in generator.uniform(0, 30, len(current))])
+    daily_offset = build_variables_with_time(builder, start, end, 86400,
+                                             [generator.uniform(0, 30, days).astype(np.float32) for _ in daily])
+    hourly_offset = build_variables_with_time(builder, start, end, 3600,
+                                              [generator.uniform(0, 30, days * 24).astype(np.float32) for _ in hourly])
+
+    builder.StartObject(12)
+    builder.PrependFloat32Slot(0, latitude, 0.0)
+    builder.PrependFloat32Slot(1, longitude, 0.0)
+    builder.PrependFloat32Slot(2, 35.0, 0.0)
+    builder.PrependInt32Slot(6, 0, 0)
+    if current_offset is not None:
+        builder.PrependUOffsetTRelativeSlot(9, current_offset, 0)
+    builder.PrependUOffsetTRelativeSlot(10, daily_offset, 0)
+    builder.PrependUOffsetTRelativeSlot(11, hourly_offset, 0)
+    builder.FinishSizePrefixed(builder.EndObject())
+    return bytes(builder.Output())
+
+
+
+def build_response_from_params(params: dict, historical: bool) -> bytes:
+    """
+    Synthetic response matching the query parameters sent by services/openmeteo.py
+    """
+    latitude, longitude = float(params.get("latitude", 0)), float(params.get("longitude", 0))
+    daily = params.getlist("daily") if hasattr(params, "getlist") else params.get("daily", [])
+    hourly = params.getlist("hourly") if hasattr(params, "getlist") else params.get("hourly", [])
+
+    if historical:
+        start_day = date.fromisoformat(params["start_date"])
+        days = (date.fromisoformat(params["end_date"]) - start_day).days + 1
+        current = None
+    else:
+        past_days, forecast_days = int(params.get("past_days", 0)), int(params.get("forecast_days", 7))
+        start_day = datetime.now(timezone.utc).date() - timedelta(days = past_days)
+        days = max(past_days + forecast_days, 1)
+        current = params.getlist("current") if hasattr(params, "getlist") else params.get("current", [])
+
+    return build_weather_response(latitude, longitude, start_day, days, daily, hourly, current)
+
+
+
+"""
+Server
+"""
+def create_app(recordings_directory: str = RECORDINGS_DIRECTORY, latency: float = 0.0) -> Starlette:
+    recordings: dict = {}
+    for request_type in ("forecast", "archive"):
+        path = os.path.join(recordings_directory, f"{request_type}.fb")
+        if os.path.exists(path):
+            with open(path, "rb") as file:
+                recordings[request_type] = file.read()
+            logger.info(f"Serving recorded {request_type} response ({path})")
+        else:
+            logger.info(f"No recorded {request_type} response, synthetic responses are served")
+
+
+    async def weather(request: Request, historical: bool) -> Response:
+        if latency:
+            await asyncio.sleep(latency)
+        body = recordings.get("archive" if historical else "forecast") or build_response_from_params(request.query_params, historical)
+        return Response(body, media_type = "application/octet-stream")
+
+
+    async def forecast(request: Request) -> Response:
+        return await weather(request, historical = False)
+
+
+    async def historical_forecast(request: Request) -> Response:
+        return await weather(request, historical = True)
+
+
+    return Starlette(routes = [Route("/v1/forecast", forecast), Route("/historical/v1/forecast", historical_forecast)])
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "OpenMeteo fake serving recorded flatbuffers responses")
+    parser.add_argument("--host", default = "127.0.0.1")
+    parser.add_argument("--port", type = int, default = 8090)
+    parser.add_argument("--latency-ms", type = float, default = 0.0)
+    parser.add_argument("--recordings", default = RECORDINGS_DIRECTORY)
+    args = parser.parse_args()
+
+    logging.basicConfig(level = logging.INFO)
+    uvicorn.run(create_app(args.recordings, args.latency_ms / 1000), host = args.host, port = args.port, log_level = "warning")
@@ -0,0 +1,49 @@
+# api/load_tests/record_openmeteo.py
+# export PYTHONPATH=$(pwd)
+# python load_tests/record_openmeteo.py [--synthetic] [--recordings load_tests/recordings]
+
+"""
+Record the OpenMeteo responses served by fake_openmeteo.py
+- Same URLs & parameters as the API (services/openmeteo.py build_openmeteo_params) for the load test weather requests
+- --synthetic writes generated responses instead (offline)
+"""
+
+
+# Lib
+import argparse
+import os
+
+import requests
+
+from load_tests.fake_openmeteo import RECORDINGS_DIRECTORY, build_response_from_params
+from load_tests.scenarios import LOCATIONS, WEATHER_REQUESTS
+from models.weather_base_models import WeatherRequest
+from services.openmeteo import build_openmeteo_params
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Record OpenMeteo flatbuffers responses for the load tests")
+    parser.add_argument("--recordings", default = RECORDINGS_DIRECTORY)
+    parser.add_argument("--synthetic", action = "store_true")
+    args = parser.parse_args()
+
+    os.makedirs(args.recordings, exist_ok = True)
+    location = LOCATIONS[0]
+
+    for request_type, request in WEATHER_REQUESTS.items():
+        url, params = build_openmeteo_params(WeatherRequest(latitude = location["latitude"], longitude = location["longitude"], **request))
+
+        if args.synthetic:
+            body = build_response_from_params(params, historical = request_type == "archive")
+        else:
+            if url.startswith(("http://localhost", "http://127.0.0.1")):
+                raise SystemExit(f"{url} is a local URL, unset OPENMETEO_FORECAST_URL / OPENMETEO_HISTORICAL_FORECAST_URL to record")
+            response = requests.get(url, params = {**params, "format": "flatbuffers"}, timeout = 30)
+            response.raise_for_status()
+            body = response.content
+
+        path = os.path.join(args.recordings, f"{request_type}.fb")
+        with open(path, "wb") as file:
+            file.write(body)
+        print(f"{request_type:<8} {len(body):>8} bytes -> {path}")
@@ -0,0 +1,179 @@
+# api/load_tests/run_load_test.py
+# export PYTHONPATH=$(pwd)
+# python load_tests/run_load_test.py [--base-url http://localhost:8000] [--users 20] [--duration 60] [--scenarios login,carto,weather,hives]
+#                                    [--baseline load_tests/baseline.json] [--save-baseline] [--tolerance 0.15]
+
+"""
+Load test runner
+- Virtual users (asyncio tasks, one HTTP client each) log in, then loop on weighted scenarios (scenarios.py) until the end
+- Samples of the warm-up period are dropped, the report gives per route RPS, p50 / p95 / p99 latency and error count
+- The report is compared to the baseline file (RPS drop or p95 increase above the tolerance is a regression, exit code 1),
+  --save-baseline stores the report as the new baseline
+"""
+
+
+# Lib
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import time
+from datetime import datetime
+
+import httpx
+
+from load_tests.scenarios import SCENARIO_WEIGHTS, SCENARIOS, USERNAME_TEMPLATE, RouteRecorder, login
+
+
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+
+async def virtual_user(index: int, args: argparse.Namespace, recorder: RouteRecorder, deadline: float) -> None:
+    username = USERNAME_TEMPLATE.format(index = index % args.accounts)
+    scenarios = [scenario for scenario in args.scenarios if scenario in SCENARIOS]
+    weights = [SCENARIO_WEIGHTS[scenario] for scenario in scenarios]
+
+    async with httpx.AsyncClient(base_url = args.base_url, timeout = args.timeout) as client:
+        token = await login(client, recorder, username)
+        if token is None:
+            print(f"{username}: login failed, virtual user stopped (run seed.py first)")
+            return
+        client.headers["Authorization"] = f"Bearer {token}"
+
+        while time.perf_counter() < deadline:
+            await SCENARIOS[random.choices(scenarios, weights)[0]](client, recorder, username)
+
+
+
+def percentile(sorted_values: list, rank: float) -> float:
+    # Nearest rank percentile
+    index = max(0, min(len(sorted_values) - 1, int(round(rank / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+
+def build_report(samples: dict, duration: float) -> dict:
+    report = {}
+    for route, route_samples in sorted(samples.items()):
+        latencies = sorted(latency * 1000 for latency, _ in route_samples)
+        errors = sum(1 for _, status_code in route_samples if status_code == 0 or status_code >= 400)
+        report[route] = {
+            "requests": len(route_samples),
+            "errors": errors,
+            "rps": round(len(route_samples) / duration, 2),
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "max_ms": round(latencies[-1], 2),
+        }
+    return report
+
+
+
+def print_report(report: dict) -> None:
+    print(f"\n{'route':<32} {'requests':>9} {'errors':>7} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for route, stats in report.items():
+        print(f"{route:<32} {stats['requests']:>9} {stats['errors']:>7} {stats['rps']:>9.2f} "
+              f"{stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f} {stats['max_ms']:>9.2f}")
+
+
+
+def compare_to_baseline(report: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Return the regressions (route, metric, baseline value, current value)
+    """
+    regressions = []
+    for route, stats in report.items():
+        reference = baseline.get(route)
+        if reference is None:
+            continue
+        if stats["rps"] < reference["rps"] * (1 - tolerance):
+            regressions.append((route, "rps", reference["rps"], stats["rps"]))
+        if stats["p95_ms"] > reference["p95_ms"] * (1 + tolerance):
+            regressions.append((route, "p95_ms", reference["p95_ms"], stats["p95_ms"]))
+        if stats["errors"] > reference["errors"]:
+            regressions.append((route, "errors", reference["errors"], stats["errors"]))
+    return regressions
+
+
+
+def get_git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output = True, text = True, check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+
+async def main(args: argparse.Namespace) -> int:
+    recorder = RouteRecorder()
+    start = time.perf_counter()
+    deadline = start + args.warmup + args.duration
+
+    # Virtual users are started progressively (ramp up during the warm-up)
+    tasks = []
+    for index in range(args.users):
+        tasks.append(asyncio.create_task(virtual_user(index, args, recorder, deadline)))
+        await asyncio.sleep(args.warmup / max(args.users, 1) / 2)
+    await asyncio.gather(*tasks)
+
+    # Drop warm-up samples
+    measure_start = start + args.warmup
+    samples = {route: [(latency, status_code) for latency, status_code, sent_at in route_samples if sent_at >= measure_start]
+               for route, route_samples in recorder.samples.items()}
+    samples = {route: route_samples for route, route_samples in samples.items() if route_samples}
+    report = build_report(samples, args.duration)
+    print_report(report)
+
+    result = {
+        "date": datetime.now().isoformat(timespec = "seconds"),
+        "commit": get_git_commit(),
+        "settings": {"base_url": args.base_url, "users": args.users, "duration": args.duration, "scenarios": args.scenarios},
+        "routes": report,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(result, file, indent = 2)
+
+    exit_code = 0
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(result, file, indent = 2)
+        print(f"\nBaseline saved: {args.baseline}")
+
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare_to_baseline(report, baseline["routes"], args.tolerance)
+        print(f"\nCompared to {args.baseline} ({baseline['date']}, commit {baseline['commit']}), tolerance {args.tolerance:.0%}")
+        for route, metric, reference, current in regressions:
+            print(f"REGRESSION {route:<32} {metric:<7} {reference} -> {current}")
+        if not regressions:
+            print("No regression")
+        exit_code = 1 if regressions else 0
+
+    return exit_code
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "API load test (per route RPS and latency percentiles)")
+    parser.add_argument("--base-url", default = "http://localhost:8000")
+    parser.add_argument("--users", type = int, default = 20, help = "Concurrent virtual users")
+    parser.add_argument("--accounts", type = int, default = 50, help = "Seeded accounts (seed.py --users)")
+    parser.add_argument("--duration", type = float, default = 60, help = "Measured duration (seconds)")
+    parser.add_argument("--warmup", type = float, default = 10, help = "Warm-up duration, not measured (seconds)")
+    parser.add_argument("--timeout", type = float, default = 30)
+    parser.add_argument("--scenarios", type = lambda value: value.split(","), default = list(SCENARIOS))
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--output", help = "Write the report to this JSON file")
+    parser.add_argument("--baseline", default = DEFAULT_BASELINE_PATH)
+    parser.add_argument("--save-baseline", action = "store_true")
+    parser.add_argument("--tolerance", type = float, default = 0.15)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    raise SystemExit(asyncio.run(main(args)))
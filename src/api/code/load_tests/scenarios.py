@@ -0,0 +1,122 @@
+# api/load_tests/scenarios.py
+
+
+"""
+Load test scenarios
+- Each virtual user logs in once with its own account (seeded by seed.py), then loops on scenarios picked by weight
+- Every request is recorded under its route template ("POST /v0/carto"), whatever its parameters
+- Requests use the same payloads as the seed data (carto grid) and the OpenMeteo fake recordings
+"""
+
+
+# Lib
+import random
+import time
+import uuid
+
+import httpx
+
+
+API_VERSION = "v0"
+USERNAME_TEMPLATE = "loadtest_{index:04d}"
+PASSWORD = "LoadTest1!"
+
+# Same centers as the synthetic carto grid (carto_schema.sql)
+LOCATIONS = [
+    {"location_name": "paris", "latitude": 48.8566, "longitude": 2.3522},
+    {"location_name": "lyon", "latitude": 45.7640, "longitude": 4.8357},
+    {"location_name": "toulouse", "latitude": 43.6047, "longitude": 1.4442},
+]
+CARTO_YEARS = [2021, 2022, 2023]
+
+# Recorded by record_openmeteo.py (same requests)
+WEATHER_REQUESTS = {
+    "forecast": {"request_type": "forecast", "past_days": 7, "forecast_days": 7},
+    "archive": {"request_type": "archive", "start_date": "2024-04-01", "end_date": "2024-06-30"},
+}
+
+SCENARIO_WEIGHTS = {"login": 1, "carto": 3, "weather": 3, "hives": 3}
+
+
+
+class RouteRecorder:
+    """
+    Store the latency (seconds), status code (0 on connection error) and send time of every request, by route template
+    """
+    def __init__(self) -> None:
+        self.samples: dict = {}
+
+
+    async def request(self, client: httpx.AsyncClient, route: str, method: str, url: str, **kwargs) -> httpx.Response:
+        before_time = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            status_code = response.status_code
+        except httpx.HTTPError:
+            response, status_code = None, 0
+        self.samples.setdefault(f"{method} {route}", []).append((time.perf_counter() - before_time, status_code, before_time))
+        return response
+
+
+
+def weather_payload(request_type: str) -> dict:
+    location = random.choice(LOCATIONS)
+    return {"latitude": location["latitude"], "longitude": location["longitude"], **WEATHER_REQUESTS[request_type]}
+
+
+
+async def login(client: httpx.AsyncClient, recorder: RouteRecorder, username: str) -> str:
+    response = await recorder.request(client, "/login", "POST", "/login", data = {"username": username, "password": PASSWORD})
+    if response is None or response.status_code != 200:
+        return None
+    return response.json()["access_token"]
+
+
+
+async def scenario_login(client: httpx.AsyncClient, recorder: RouteRecorder, username: str) -> None:
+    await login(client, recorder, username)
+
+
+
+async def scenario_carto(client: httpx.AsyncClient, recorder: RouteRecorder, username: str) -> None:
+    location = random.choice(LOCATIONS)
+    payload = [{**location, "data_type": ["rpg", "clc"], "years": random.sample(CARTO_YEARS, k = random.randint(1, 3)),
+                "radius": random.choice([250, 500, 1000])}]
+    await recorder.request(client, f"/{API_VERSION}/carto", "POST", f"/{API_VERSION}/carto", json = payload)
+
+
+
+async def scenario_weather(client: httpx.AsyncClient, recorder: RouteRecorder, username: str) -> None:
+    payload = weather_payload(random.choice(list(WEATHER_REQUESTS)))
+    await recorder.request(client, f"/{API_VERSION}/weather/", "POST", f"/{API_VERSION}/weather/", json = payload)
+
+
+
+async def scenario_hives(client: httpx.AsyncClient, recorder: RouteRecorder, username: str) -> None:
+    """
+    Hives CRUD: create, list, update, list (revalidated with the ETag), delete
+    """
+    route = f"/{API_VERSION}/users/hives/"
+    name = f"loadtest_hive_{uuid.uuid4().hex[:12]}"
+
+    await recorder.request(client, route, "POST", route, json = {"name": name, "location_name": "paris"})
+    response = await recorder.request(client, route, "GET", route)
+    await recorder.request(client, route, "PUT", route, json = {"name": name, "location_name": "lyon"})
+
+    headers = {"If-None-Match": response.headers["etag"]} if response is not None and "etag" in response.headers else {}
+    response = await recorder.request(client, route, "GET", route, headers = headers)
+    if response is None or response.status_code != 200:
+        return
+
+    hive_ids = [hive["_id"] for hive in (response.json() or []) if hive["name"] == name]
+    if hive_ids:
+        await recorder.request(client, route, "DELETE", route, params = {"hive_id": hive_ids[0]})
+
+
+
+SCENARIOS = {
+    "login": scenario_login,
+    "carto": scenario_carto,
+    "weather": scenario_weather,
+    "hives": scenario_hives,
+}
@@ -0,0 +1,110 @@
+# api/load_tests/seed.py
+# export PYTHONPATH=$(pwd)
+# set -a; source load_tests/load_test.env; set +a
+# python load_tests/seed.py [--users 50]
+
+"""
+Seed the local stand-ins (docker-compose.yaml) before a load test run
+- Postgres: users database (same schema as src/postgres/conf), synthetic carto database (carto_schema.sql) prepared by maintenance/prepare_carto.py
+- Load test accounts registered & verified through the API services (same hashing as production)
+- MongoDB: hives left by a previous run are removed
+"""
+
+
+# Lib
+import argparse
+import asyncio
+import os
+
+from load_tests.scenarios import PASSWORD, USERNAME_TEMPLATE
+from maintenance import prepare_carto
+from models.users_base_models import Password, User
+from services.mongodb_connectors import get_collection
+from services.postgres_connectors import force_verified_user_to_true, get_postgres_client, register_user_in_database
+from utils.config import CARTO_DATABASE, MONGODB_HIVE_COLLECTION_NAME, USER_DATABASE
+
+
+LOAD_TESTS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+USERS_SCHEMA_PATH = os.path.join(LOAD_TESTS_DIRECTORY, "..", "..", "..", "postgres", "conf", "11_create_users_db.sql")
+CARTO_SCHEMA_PATH = os.path.join(LOAD_TESTS_DIRECTORY, "carto_schema.sql")
+
+
+
+async def create_database(database: str) -> bool:
+    """
+    Create the database if needed, return True if it was created
+    """
+    client = await get_postgres_client(database = "postgres")
+    try:
+        if await client.fetchval("SELECT 1 FROM pg_database WHERE datname = $1", database):
+            return False
+        await client.execute(f'CREATE DATABASE "{database}"')
+        return True
+    finally:
+        await client.close()
+
+
+
+async def seed_users_database() -> None:
+    if await create_database(USER_DATABASE):
+        with open(USERS_SCHEMA_PATH) as file:
+            # The database is created above, psql commands are skipped
+            schema = "\n".join(line for line in file.read().splitlines() if not line.startswith(("CREATE DATABASE", "\\c")))
+        client = await get_postgres_client(database = USER_DATABASE)
+        try:
+            await client.execute(schema)
+        finally:
+            await client.close()
+
+
+
+async def seed_carto_database() -> None:
+    await create_database(CARTO_DATABASE)
+    with open(CARTO_SCHEMA_PATH) as file:
+        schema = file.read()
+    client = await get_postgres_client(database = CARTO_DATABASE)
+    try:
+        await client.execute(schema)
+    finally:
+        await client.close()
+    # Prepared geometries queried by the API
+    await prepare_carto.main(list(prepare_carto.prepared_datasets), None)
+
+
+
+async def seed_users(users: int) -> None:
+    client = await get_postgres_client(database = USER_DATABASE)
+    try:
+        existing = {record["username"] for record in await client.fetch("SELECT username FROM users WHERE username LIKE 'loadtest_%'")}
+    finally:
+        await client.close()
+
+    for index in range(users):
+        username = USERNAME_TEMPLATE.format(index = index)
+        if username not in existing:
+            await register_user_in_database(User(username = username, password = Password(password = PASSWORD), email = f"{username}@example.com"))
+            await force_verified_user_to_true(username)
+
+
+
+async def clean_hives() -> None:
+    collection = await get_collection(MONGODB_HIVE_COLLECTION_NAME)
+    result = await collection.delete_many({"name": {"$regex": "^loadtest_hive_"}})
+    print(f"{result.deleted_count} hives removed")
+
+
+
+async def main(users: int) -> None:
+    await seed_users_database()
+    await seed_carto_database()
+    await seed_users(users)
+    await clean_hives()
+    print(f"{users} load test users ready ({USERNAME_TEMPLATE.format(index = 0)} ...), carto grid loaded")
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Seed the load test stand-ins")
+    parser.add_argument("--users", type = int, default = 50)
+    args = parser.parse_args()
+    asyncio.run(main(args.users))
@@ -5,7 +5,7 @@
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 from slowapi.errors import RateLimitExceeded
-from utils.monitoring import PrometheusMiddleware, metrics, setting_otlp
+from utils.monitoring import EventLoopMonitor, PrometheusMiddleware, instrument_app, mark_worker_metrics_dead, metrics, setting_otlp
 
 import uvicorn
 import logging
@@ -13,6 +13,7 @@ import os
 import random
 import time
 import httpx
+from contextlib import asynccontextmanager
 from typing import Optional
 from opentelemetry.propagate import inject
 
@@ -22,16 +23,56 @@ from routers.information import information
 from routers.users import users_router
 from routers.tester import tester
 from routers.weather import weather
-
-from utils.config import DEBUG, LOGGER, CURRENT_VERSION
+from services.mongodb_connectors import init_mongodb_client, close_mongodb_client
+from services.openmeteo import init_openmeteo_client
+from services.postgres_connectors import init_postgres_pools, close_postgres_pools
+from services.redis_connectors import close_object_version_client
+from services.user_cache import start_user_invalidation_listener, stop_user_invalidation_listener
+
+from utils.compression import CompressionMiddleware
+from utils.config import DEBUG, LOGGER, CURRENT_VERSION, EVENT_LOOP_MONITOR_INTERVAL, SLOW_CALLBACK_THRESHOLD
 from utils.exceptions import CustomException
 from utils.limiter import limiter
-from utils.logger import SanitizeLoggingMiddleware
+from utils.logger import SanitizeLoggingMiddleware, start_log_listener, stop_log_listener
+from utils.responses import FastJSONResponse
 
 APP_NAME = os.environ.get("APP_NAME", "app")
 EXPOSE_PORT = os.environ.get("EXPOSE_PORT", 8000)
 OTLP_GRPC_ENDPOINT = os.environ.get("OTLP_GRPC_ENDPOINT", "http://tempo:4317")
 
+"""
+Lifespan
+- Runs in each worker process (server.py starts several): per worker resources are created here, never at import
+- Start the OTLP exporter, connection pools, users cache invalidation listener, background monitors and the log writer thread when the worker starts
+- On shutdown (SIGTERM, after in-flight requests are drained), close them and remove the worker live metrics
+"""
+event_loop_monitor = EventLoopMonitor(app_name = APP_NAME,
+                                      interval = EVENT_LOOP_MONITOR_INTERVAL,
+                                      slow_callback_threshold = SLOW_CALLBACK_THRESHOLD)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Spans are flushed by the tracer provider exit handler
+    setting_otlp(APP_NAME, OTLP_GRPC_ENDPOINT)
+    await init_postgres_pools()
+    await init_mongodb_client()
+    await init_openmeteo_client()
+    user_invalidation_listener = start_user_invalidation_listener()
+    event_loop_monitor.start()
+    if LOGGER == "True":
+        start_log_listener()
+    yield
+    await event_loop_monitor.stop()
+    await stop_user_invalidation_listener(user_invalidation_listener)
+    await close_postgres_pools()
+    close_mongodb_client()
+    await close_object_version_client()
+    if LOGGER == "True":
+        stop_log_listener()
+    mark_worker_metrics_dead()
+
+
+
 """
 API Declaration
 - Disable debug mode in production
@@ -66,7 +107,9 @@ app = FastAPI(
         "description": "Weather routes, used to get weather data"
     }
     ],
-    debug = DEBUG
+    debug = DEBUG,
+    default_response_class = FastJSONResponse,
+    lifespan = lifespan
     )
 
 
@@ -83,10 +126,13 @@ if LOGGER == "True":
 
 # Setting metrics middleware
 app.add_middleware(PrometheusMiddleware, app_name=APP_NAME)
+
+# Setting compression middleware (br, zstd, gzip negotiated with Accept-Encoding)
+app.add_middleware(CompressionMiddleware)
 app.add_route("/metrics", metrics)
 
-# Setting OpenTelemetry exporter
-setting_otlp(app, APP_NAME, OTLP_GRPC_ENDPOINT)
+# Setting OpenTelemetry instrumentation (the exporter is started per worker in the lifespan)
+instrument_app(app)
 
 
 class EndpointFilter(logging.Filter):
@@ -151,11 +197,8 @@ app.include_router(weather)
 
 """
 Start uvicorn server
+- Single process (development), production uses server.py (multiple workers)
 """
 if __name__ == "__main__":
-    # update uvicorn access logger format
-    log_config = uvicorn.config.LOGGING_CONFIG
-    log_config["formatters"]["access"][
-        "fmt"
-    ] = "%(asctime)s %(levelname)s [%(name)s] [%(filename)s:%(lineno)d] [trace_id=%(otelTraceID)s span_id=%(otelSpanID)s resource.service.name=%(otelServiceName)s] - %(message)s"
-    uvicorn.run(app, host="0.0.0.0", port=EXPOSE_PORT, log_config=log_config)
+    from server import get_log_config
+    uvicorn.run(app, host="0.0.0.0", port=int(EXPOSE_PORT), log_config=get_log_config())
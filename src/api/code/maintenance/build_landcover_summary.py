@@ -0,0 +1,63 @@
+# api/maintenance/build_landcover_summary.py
+# export PYTHONPATH=$(pwd)
+# python maintenance/build_landcover_summary.py [--datasets rpg clc] [--years 2022] [--radius 500] [--batch-size 1000]
+
+"""
+Build the land cover summaries of the hives locations (MongoDB locations collection), to run after maintenance/prepare_carto.py
+- Incremental: only the (location, radius, dataset, year) not built yet are computed, new locations are picked up by each run
+- Batched: the missing locations of a year are grouped by projection, one statement per batch & projection
+- The carto summary route builds the missing summaries on demand, this script keeps them ready for the ETL & the first requests
+"""
+
+
+# Lib
+import argparse
+import asyncio
+import time
+
+from services.mongodb_connectors import get_collection
+from services.postgres_connectors import build_landcover_summaries, get_postgres_client, run_statement
+from utils.config import CARTO_DATABASE, CARTO_SUMMARY_PRECISION, MONGODB_LOCATION_COLLECTION_NAME
+from utils.postgres_requests.carto_preparation_requests import prepared_datasets, query_get_source_years
+
+
+
+async def get_hive_locations() -> list:
+    """
+    Distinct coordinates of the users locations, rounded as the summaries keys
+    """
+    collection = await get_collection(MONGODB_LOCATION_COLLECTION_NAME)
+    documents = await collection.find({}, {"_id": 0, "latitude": 1, "longitude": 1}).to_list(length = None)
+    return sorted({(round(document["latitude"], CARTO_SUMMARY_PRECISION), round(document["longitude"], CARTO_SUMMARY_PRECISION)) for document in documents})
+
+
+
+async def main(datasets: list, years: list, radius: float, batch_size: int = 1000) -> None:
+    locations = await get_hive_locations()
+    client = await get_postgres_client(database = CARTO_DATABASE)
+    try:
+        before_time = time.perf_counter()
+        built = 0
+        for dataset in datasets:
+            dataset_years = years or [record["year"] for record in await client.fetch(query_get_source_years(dataset))]
+            for year in dataset_years:
+                built_locations = {(record["latitude"], record["longitude"]) for record in await run_statement(client, "fetch", "query_get_built_locations", radius, dataset, year)}
+                missing = [location for location in locations if location not in built_locations]
+                for start in range(0, len(missing), batch_size):
+                    latitudes, longitudes = zip(*missing[start:start + batch_size])
+                    await build_landcover_summaries(client, list(latitudes), list(longitudes), radius, dataset, year)
+                built += len(missing)
+        print(f"{len(locations)} locations: {built} summaries built ({time.perf_counter() - before_time:.1f} s)")
+    finally:
+        await client.close()
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Build the land cover summaries of the hives locations")
+    parser.add_argument("--datasets", nargs = "+", choices = list(prepared_datasets), default = list(prepared_datasets))
+    parser.add_argument("--years", nargs = "+", type = int, help = "Years to build (default: all the years of the source tables)")
+    parser.add_argument("--radius", type = float, default = 500, help = "In meters, radius of the summaries (same as the ETL requests)")
+    parser.add_argument("--batch-size", type = int, default = 1000, help = "Locations per statement (split by projection)")
+    args = parser.parse_args()
+    asyncio.run(main(args.datasets, args.years, args.radius, args.batch_size))
@@ -0,0 +1,111 @@
+# api/maintenance/prepare_carto.py
+# export PYTHONPATH=$(pwd)
+# python maintenance/prepare_carto.py [--datasets rpg clc] [--years 2022 2023] [--lock-timeout 5]
+
+"""
+Carto data preparation, to run after each load of RPG / CLC data (then bump CARTO_DATA_VERSION)
+- Prepared tables: geometries made valid and projected into the SRID of their territory (same as get_projection)
+- Partitioned by year then srid, used by the carto queries (utils/postgres_requests/cartographic_requests.py)
+- A year is built & indexed in a staging table while the API keeps reading the attached partitions, then swapped in a short transaction:
+  a new year is only attached (the carto queries are not blocked), a reloaded year is detached first (brief exclusive lock,
+  bounded by --lock-timeout: the swap fails instead of queuing the carto queries behind a long running one)
+- The land cover summaries of a swapped year are removed (built again on demand or by maintenance/build_landcover_summary.py)
+"""
+
+
+# Lib
+import argparse
+import asyncio
+import time
+
+from services.postgres_connectors import get_postgres_client
+from utils.config import CARTO_DATABASE
+from utils.postgres_requests.carto_preparation_requests import prepared_datasets, carto_srids, get_partition_name, query_create_carto_srid_function, query_create_rpg_prepared_table, query_create_clc_prepared_table
+from utils.postgres_requests.carto_preparation_requests import query_get_relation_kind, query_create_prepared_index, query_drop_table, query_rename_table, query_get_source_years
+from utils.postgres_requests.carto_preparation_requests import query_create_staging_year, query_create_staging_srid_partition, query_insert_prepared_year, query_create_staging_index, query_add_staging_year_check
+from utils.postgres_requests.carto_preparation_requests import query_detach_year, query_attach_year, query_drop_year_check
+from utils.postgres_requests.carto_preparation_requests import query_create_landcover_summary_table, query_create_landcover_summary_builds_table, query_delete_landcover_summary_year
+
+
+
+async def create_prepared_schema(client) -> None:
+    await client.execute(query_create_carto_srid_function)
+    for dataset, query in (("rpg", query_create_rpg_prepared_table), ("clc", query_create_clc_prepared_table)):
+        # Prepared table created before partitioning: derived data, rebuilt below
+        if await client.fetchval(query_get_relation_kind, prepared_datasets[dataset]["prepared"]) == "r":
+            await client.execute(query_drop_table(prepared_datasets[dataset]["prepared"]))
+        await client.execute(query)
+        await client.execute(query_create_prepared_index(dataset))
+    await client.execute(query_create_landcover_summary_table)
+    await client.execute(query_create_landcover_summary_builds_table)
+
+
+
+async def build_staging_year(client, dataset: str, year: int) -> str:
+    """
+    Build the staging table of a year (not visible to the API), return the INSERT status
+    """
+    await client.execute(query_drop_table(get_partition_name(dataset, year, "_staging")))
+    await client.execute(query_create_staging_year(dataset, year))
+    for srid in carto_srids:
+        await client.execute(query_create_staging_srid_partition(dataset, year, srid))
+    status = await client.execute(query_insert_prepared_year(dataset, year), year)
+    await client.execute(query_create_staging_index(dataset, year))
+    await client.execute(query_add_staging_year_check(dataset, year))
+    return status
+
+
+
+async def swap_year(client, dataset: str, year: int, lock_timeout: float) -> None:
+    """
+    Attach the staging table of a year in place of the current partition (if any)
+    """
+    partition, staging, old = (get_partition_name(dataset, year, suffix) for suffix in ("", "_staging", "_old"))
+    async with client.transaction():
+        await client.execute(f"SET LOCAL lock_timeout = '{int(lock_timeout * 1000)}ms';")
+        await client.execute(query_drop_table(old))
+        if await client.fetchval(query_get_relation_kind, partition) is not None:
+            await client.execute(query_detach_year(dataset, year))
+            await client.execute(query_rename_table(partition, old))
+            for srid in carto_srids:
+                await client.execute(query_rename_table(f"{partition}_{srid}", f"{old}_{srid}"))
+        await client.execute(query_rename_table(staging, partition))
+        for srid in carto_srids:
+            await client.execute(query_rename_table(f"{staging}_{srid}", f"{partition}_{srid}"))
+        await client.execute(query_attach_year(dataset, year))
+        await client.execute(query_drop_year_check(dataset, year))
+        # Built from the previous version of the year
+        await client.execute(query_delete_landcover_summary_year, dataset, year)
+    await client.execute(query_drop_table(old))
+
+
+
+async def prepare_year(client, dataset: str, year: int, lock_timeout: float) -> None:
+    before_time = time.perf_counter()
+    status = await build_staging_year(client, dataset, year)
+    await client.execute(f"ANALYZE {get_partition_name(dataset, year, '_staging')};")
+    await swap_year(client, dataset, year, lock_timeout)
+    print(f"{dataset} {year}: {status.split()[-1]} geometries ({time.perf_counter() - before_time:.1f} s)")
+
+
+
+async def main(datasets: list, years: list, lock_timeout: float = 5) -> None:
+    client = await get_postgres_client(database = CARTO_DATABASE)
+    try:
+        await create_prepared_schema(client)
+        for dataset in datasets:
+            dataset_years = years or [record["year"] for record in await client.fetch(query_get_source_years(dataset))]
+            for year in dataset_years:
+                await prepare_year(client, dataset, year, lock_timeout)
+    finally:
+        await client.close()
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Prepare the carto geometries (valid, projected, partitioned by year & srid)")
+    parser.add_argument("--datasets", nargs = "+", choices = list(prepared_datasets), default = list(prepared_datasets))
+    parser.add_argument("--years", nargs = "+", type = int, help = "Years to prepare (default: all the years of the source tables)")
+    parser.add_argument("--lock-timeout", type = float, default = 5, help = "In seconds, longest wait for the lock swapping a reloaded year")
+    args = parser.parse_args()
+    asyncio.run(main(args.datasets, args.years, args.lock_timeout))
@@ -0,0 +1,34 @@
+# api/maintenance/sync_location_positions.py
+# export PYTHONPATH=$(pwd)
+# python maintenance/sync_location_positions.py
+
+"""
+Backfill the GeoJSON position of the locations written before the geo search (nearby routes), then create its indexes
+- The API keeps the position in sync with latitude & longitude on each POST / PUT, this script is only needed once
+- Idempotent: the locations already having a position are skipped
+"""
+
+
+# Lib
+import asyncio
+import time
+
+from services.mongodb_connectors import ensure_geo_indexes, get_collection
+from utils.config import MONGODB_LOCATION_COLLECTION_NAME
+
+
+
+async def main() -> None:
+    before_time = time.perf_counter()
+    collection = await get_collection(MONGODB_LOCATION_COLLECTION_NAME)
+    result = await collection.update_many(
+        {"position": {"$exists": False}, "latitude": {"$type": "number"}, "longitude": {"$type": "number"}},
+        [{"$set": {"position": {"type": "Point", "coordinates": ["$longitude", "$latitude"]}}}],
+    )
+    await ensure_geo_indexes()
+    print(f"{result.modified_count} locations positions written ({time.perf_counter() - before_time:.1f} s)")
+
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,53 @@
+#models/cartographic_base_models.py
+
+
+# Lib
+from typing import Optional, Union
+from pydantic import BaseModel, ConfigDict
+
+
+
+
+# BASE MODELS
+class CartoFeature(BaseModel):
+    """
+    RPG / CLC polygon returned by the carto route (geometry as WKT)
+    """
+    model_config = ConfigDict(extra = "allow")
+
+    culture: Optional[str] = None
+    bio: Optional[Union[int, str]] = None
+    legende: Optional[str] = None
+    couleur: Optional[str] = None
+    source: Optional[str] = None
+    emplacement: Optional[str] = None
+    aire: Optional[float] = None
+    geometry: Optional[str] = None
+
+
+
+# {location_name: {"rpg-2022": {"rpg-2022": [CartoFeature, ...]}, ...}}
+CartoResponse = dict[str, dict[str, dict[str, list[CartoFeature]]]]
+
+
+
+class LandcoverShare(BaseModel):
+    """
+    Area (ha) & share of the buffer of one RPG culture / CLC class, returned by the carto summary route
+    """
+    model_config = ConfigDict(extra = "allow")
+
+    annee: int
+    code_culture: Optional[str] = None
+    code_18: Optional[str] = None
+    culture: Optional[str] = None
+    legende: Optional[str] = None
+    couleur: Optional[str] = None
+    aire: float
+    aire_bio: Optional[float] = None
+    part: float
+
+
+
+# {location_name: {"rpg-2022": [LandcoverShare, ...], ...}}
+CartoSummaryResponse = dict[str, dict[str, list[LandcoverShare]]]
@@ -7,6 +7,7 @@ from pydantic import BaseModel, Field, EmailStr, PrivateAttr, field_validator
 from typing import Optional, List
 from uuid import uuid4, UUID
 
+from utils.config import GEO_SEARCH_MAX_DISTANCE, GEO_SEARCH_PAGE_SIZE, GEO_SEARCH_MAX_PAGE_SIZE
 from utils.exceptions import CustomException
 
 
@@ -29,4 +30,16 @@ class Hives(BaseModel):
     name: str
     # Default values set by the system
     owner: Optional[UUID] = None
-    location_name: Optional[str] = None  # Ajout d'un champ pour le nom de la location
\ No newline at end of file
+    location_name: Optional[str] = None  # Ajout d'un champ pour le nom de la location
+
+
+
+class GeoSearch(BaseModel):
+    """
+    Query params of the locations & hives geo search (max_distance in meters, nearest first)
+    """
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+    max_distance: float = Field(3000, gt=0, le=GEO_SEARCH_MAX_DISTANCE)
+    skip: int = Field(0, ge=0)
+    limit: int = Field(GEO_SEARCH_PAGE_SIZE, ge=1, le=GEO_SEARCH_MAX_PAGE_SIZE)
@@ -4,13 +4,22 @@
 
 
 # Lib
-from fastapi import APIRouter, Depends, Request
+import hashlib
+import orjson
+from datetime import datetime
+from fastapi import APIRouter, Depends, Request, Response
+from pydantic import TypeAdapter
 
+from models.cartographic_base_models import CartoResponse, CartoSummaryResponse
 from models.params_emplacements_base_model import ParamsLocation
 from services.auth import get_current_user
-from services.postgres_connectors import get_carto_from_database
-from utils.config import CURRENT_VERSION, CARTO_LIMIT
+from services.postgres_connectors import get_carto_from_database, get_landcover_summary_from_database
+from utils.compression import CompressedResponseCache, negotiate_encoding
+from utils.config import CURRENT_VERSION, CARTO_LIMIT, CARTO_CACHE_MAX_BYTES, CARTO_CACHE_TTL, CARTO_DATA_VERSION, CARTO_SUMMARY_MAX_LOCATIONS, CARTO_SUMMARY_MAX_BUILDS
+from utils.etags import content_etag, encoded_etag, etag_matches, make_etag, not_modified_response
+from utils.exceptions import CustomException
 from utils.limiter import limiter
+from utils.responses import FastJSONResponse
 
 
 """
@@ -19,19 +28,87 @@ Router Declaration
 cartographic = APIRouter()
 
 
+"""
+Carto responses cache
+- Rendered bodies are stored with their compressed variants, hits are served without querying nor recompressing
+"""
+carto_response_cache = CompressedResponseCache(max_bytes = CARTO_CACHE_MAX_BYTES, ttl = CARTO_CACHE_TTL)
+carto_response_adapter = TypeAdapter(CartoResponse)
+
+
+
+def is_immutable_request(locations: list[ParamsLocation]) -> bool:
+    """
+    Past years layers never change until geodata is reloaded (CARTO_DATA_VERSION)
+    """
+    current_year = datetime.now().year
+    return all(location.years and max(location.years) < current_year for location in locations)
+
+
 
 
 """
 Routes Declaration
 """
-@cartographic.post(f"/{CURRENT_VERSION}/carto", tags = ["cartographic"])
-async def get_carto(locations: list[ParamsLocation]):
+@cartographic.post(f"/{CURRENT_VERSION}/carto", tags = ["cartographic"], response_model = CartoResponse)
+async def get_carto(locations: list[ParamsLocation], request: Request):
     """
     Get the carto data depending on the locations
     """
-    data:dict = {}
+    cache_key = hashlib.sha256(orjson.dumps([location.model_dump() for location in locations], option = orjson.OPT_SORT_KEYS)).hexdigest()
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    if_none_match = request.headers.get("if-none-match")
+
+    # Version ETag for past years (known without querying), content hash ETag otherwise (known once rendered)
+    # Compared & sent with the encoding appended: each encoded variant is a distinct representation
+    immutable = is_immutable_request(locations)
+    etag = make_etag(CARTO_DATA_VERSION, cache_key[:32]) if immutable else carto_response_cache.get_etag(cache_key)
+    if etag_matches(if_none_match, encoded_etag(etag, encoding)):
+        return not_modified_response(encoded_etag(etag, encoding))
 
+    body = await carto_response_cache.get(cache_key, encoding)
+    if body is None:
+        data:dict = {}
+
+        for location in locations:
+            data[location.location_name] = await get_carto_from_database(location)
+
+        # Same validation & serialization as the response_model, rendered once to be cached
+        body = FastJSONResponse(carto_response_adapter.dump_python(carto_response_adapter.validate_python(data), mode = "json")).body
+        if not immutable:
+            etag = content_etag(body)
+        carto_response_cache.set(cache_key, body, etag)
+        if etag_matches(if_none_match, encoded_etag(etag, encoding)):
+            return not_modified_response(encoded_etag(etag, encoding))
+
+        cached_body = await carto_response_cache.get(cache_key, encoding)
+        if cached_body is None:
+            # Not cacheable (too big), compressed on the fly by the middleware (which appends the encoding to the ETag)
+            return Response(content = body, media_type = "application/json", headers = {"ETag": etag})
+        body = cached_body
+
+    headers = {"Vary": "Accept-Encoding", "ETag": encoded_etag(etag, encoding)}
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content = body, media_type = "application/json", headers = headers)
+
+
+
+@cartographic.post(f"/{CURRENT_VERSION}/carto/summary", tags = ["cartographic"], response_model = CartoSummaryResponse)
+async def get_carto_summary(locations: list[ParamsLocation]):
+    """
+    Get the land cover summary around each location: area & share of the buffer per RPG culture / CLC class and year, without geometries
+    """
+    if len(locations) > CARTO_SUMMARY_MAX_LOCATIONS:
+        raise CustomException(name = "Carto summary error",
+                              error_code = 413,
+                              message = f"Too many locations ({len(locations)}), the maximum is {CARTO_SUMMARY_MAX_LOCATIONS}")
+
+    # On demand builds are bounded per request (heavy intersections), the missing summaries are left out of the response
+    data:dict = {}
+    builds_left = CARTO_SUMMARY_MAX_BUILDS
     for location in locations:
-        data[location.location_name] = await get_carto_from_database(location)
+        data[location.location_name], built = await get_landcover_summary_from_database(location, max_builds = builds_left)
+        builds_left -= built
 
-    return data
\ No newline at end of file
+    return data
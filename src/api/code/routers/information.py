@@ -2,9 +2,10 @@
 
 
 # Lib
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, Request, Response
 
 from services.auth import get_current_user
+from services.health import get_deep_health
 from services.mongodb_connectors import get_mongodb_client
 from services.postgres_connectors import get_postgres_client
 from services.redis_connectors import get_redis_client
@@ -13,6 +14,7 @@ from utils.config import DATABASE_CHECK_LIMIT
 from utils.decorators import require_role
 from utils.exceptions import CustomException
 from utils.limiter import limiter
+from utils.monitoring import track_operation
 
 
 
@@ -53,6 +55,19 @@ def get_api_status(request: Request):
 
 
 
+@information.get(f"/{CURRENT_VERSION}/health/deep", tags = ["info"])
+async def get_deep_health_status(request: Request, response: Response):
+    """
+    Get the status of the API dependencies (Postgres, MongoDB, Redis), 503 if one of them is down
+    Probes run concurrently with a timeout, the result is cached for HEALTH_CACHE_TTL seconds (safe for healthchecks & blackbox probes)
+    """
+    health = await get_deep_health()
+    if health["status"] != "up":
+        response.status_code = 503
+    return health
+
+
+
 @information.get(f"/{CURRENT_VERSION}/postgres/check", tags = ["info"])
 @limiter.limit(DATABASE_CHECK_LIMIT)
 @require_role(role = "admin")
@@ -62,6 +77,7 @@ async def check_postgres_availability(request: Request, JWT_TOKEN: dict = Depend
     """
     try:
         client = await get_postgres_client(database = "postgres")
+        await client.close()
         return {"status": "PostgreSQL is available", "host": POSTGRES_HOST, "port": POSTGRES_PORT}
 
     except Exception as e:
@@ -81,7 +97,8 @@ async def check_mongodb_availability(request: Request, JWT_TOKEN: dict = Depends
     """
     try:
         client = await get_mongodb_client()
-        await client.admin.command('ping')
+        with track_operation("mongodb", "ping"):
+            await client.admin.command('ping')
         return {"status": "MongoDB is available", "host": MONGODB_HOST, "port": MONGODB_PORT}
 
     except Exception as e:
@@ -106,9 +123,11 @@ async def check_redis_availability(request: Request, JWT_TOKEN:dict = Depends(ge
 
     try:
         client = await get_redis_client()
-        client.json().set("test", "$", json_test_data)
+        with track_operation("redis", "json_set_test"):
+            client.json().set("test", "$", json_test_data)
         
-        redis_read_data = client.json().get("test", "$", json_test_data)
+        with track_operation("redis", "json_get_test"):
+            redis_read_data = client.json().get("test", "$", json_test_data)
         return {"From Redis:": redis_read_data}
 
     except Exception as e:
@@ -2,18 +2,24 @@
 
 
 # Lib
-from fastapi import APIRouter, Depends, Request
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Query, Request, Response
 
 from models.user_objects_base_models import Locations
 from models.user_objects_base_models import Hives
-from models.users_base_models import UserInfos, Password
+from models.user_objects_base_models import GeoSearch
+from models.users_base_models import User, UserInfos, Password
 from services.auth import verify_credentials
 from services.mongodb_connectors import request_user_locations
 from services.mongodb_connectors import request_user_hives
-from services.postgres_connectors import force_verified_user_to_true, get_user_info_data, update_user_info_data, update_user_password
+from services.mongodb_connectors import search_user_locations, search_user_hives
+from services.redis_connectors import get_object_version
+from services.postgres_connectors import force_verified_user_to_true, get_user_info_data, import_users_in_database, update_user_info_data, update_user_password
 from utils.common_functions import get_current_user
-from utils.config import CURRENT_VERSION, INSERT_INFOS_LIMIT, UPDATE_INFOS_LIMIT, PASSWORD_UPDATE_LIMIT, USER_LOCATIONS_LIMIT, USER_HIVES_LIMIT
+from utils.config import CURRENT_VERSION, INSERT_INFOS_LIMIT, UPDATE_INFOS_LIMIT, PASSWORD_UPDATE_LIMIT, USER_LOCATIONS_LIMIT, USER_HIVES_LIMIT, USERS_IMPORT_MAX_SIZE
 from utils.decorators import require_role
+from utils.etags import etag_matches, make_etag, not_modified_response
 from utils.exceptions import CustomException
 from utils.limiter import limiter
 
@@ -27,6 +33,15 @@ users_router = APIRouter()
 
 
 
+async def get_objects_etag(kind:str, owner:str) -> str:
+    """
+    Weak ETag of the owner's objects (locations, hives), None if their version is unavailable
+    """
+    version = await get_object_version(kind, owner)
+    return make_etag(kind, version, weak = True) if version is not None else None
+
+
+
 """
 Routes Declaration
 """
@@ -101,12 +116,44 @@ async def force_verified_to_true(request: Request, username_to_verify: str, JWT_
     
 
 
+@users_router.post(f"/{CURRENT_VERSION}/users/import/", tags = ["users"])
+@require_role(role = "admin")
+async def import_users(request: Request, new_users: list[User], verified: bool = False, JWT_TOKEN: dict = Depends(get_current_user)):
+    """
+    Bulk import users, eg: beekeepers of a partner federation (requires admin rights)
+    - All users are imported or none (duplicated or existing username)
+
+    Args:
+        - new_users (list[User]): The users to import (at most USERS_IMPORT_MAX_SIZE)
+        - verified (bool): Import the accounts as verified
+        - JWT_TOKEN (dict): The user data (from JWT token)
+
+    Returns:
+        - dict: A message with the number of imported users
+    """
+    if len(new_users) > USERS_IMPORT_MAX_SIZE:
+        raise CustomException(name = "Import error",
+                              error_code = 413,
+                              message = f"Too many users in the import ({len(new_users)}), the maximum is {USERS_IMPORT_MAX_SIZE}")
+
+    imported_users = await import_users_in_database(new_users, verified = verified)
+    return {"message": f"{imported_users} users have been imported by {JWT_TOKEN["username"]}", "imported": imported_users}
+
+
+
 @users_router.get(f"/{CURRENT_VERSION}/users/locations/", tags = ["users"])
 @limiter.limit(USER_LOCATIONS_LIMIT)
-async def get_user_locations(request: Request, JWT_TOKEN: dict = Depends(get_current_user)):
+async def get_user_locations(request: Request, response: Response, JWT_TOKEN: dict = Depends(get_current_user)):
     """
     Retrieve user locations from the MongoDB database
     """
+    # Version read before querying MongoDB: a concurrent write leaves the ETag older than the data, never newer
+    etag = await get_objects_etag("locations", JWT_TOKEN["id"])
+    if etag is not None:
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return not_modified_response(etag)
+        response.headers["ETag"] = etag
+
     return await request_user_locations(user_id = JWT_TOKEN["id"], method = "GET")
 
 
@@ -155,12 +202,32 @@ async def delete_user_locations(location_id: str, request: Request, JWT_TOKEN: d
 
 
 
+@users_router.get(f"/{CURRENT_VERSION}/users/locations/nearby/", tags = ["users"])
+@limiter.limit(USER_LOCATIONS_LIMIT)
+async def get_nearby_user_locations(request: Request, search: Annotated[GeoSearch, Query()], JWT_TOKEN: dict = Depends(get_current_user)):
+    """
+    Retrieve the user locations within max_distance meters of a point, nearest first (distance in meters)
+    """
+    return await search_user_locations(
+        user_id = JWT_TOKEN["id"], latitude = search.latitude, longitude = search.longitude,
+        max_distance = search.max_distance, skip = search.skip, limit = search.limit
+    )
+
+
+
 @users_router.get(f"/{CURRENT_VERSION}/users/hives/", tags = ["users"])
 @limiter.limit(USER_HIVES_LIMIT)
-async def get_user_hives(request: Request, JWT_TOKEN: dict = Depends(get_current_user)):
+async def get_user_hives(request: Request, response: Response, JWT_TOKEN: dict = Depends(get_current_user)):
     """
     Retrieve user hives from the MongoDB database
     """
+    # Version read before querying MongoDB: a concurrent write leaves the ETag older than the data, never newer
+    etag = await get_objects_etag("hives", JWT_TOKEN["id"])
+    if etag is not None:
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return not_modified_response(etag)
+        response.headers["ETag"] = etag
+
     return await request_user_hives(user_id = JWT_TOKEN["id"], method = "GET")
 
 
@@ -199,4 +266,17 @@ async def delete_user_hives(hive_id: str, request: Request, JWT_TOKEN: dict = De
     if hive_id in [hive["_id"] for hive in user_hives]:
         hive_dict = user_hives[[hive["_id"] for hive in user_hives].index(hive_id)]
         hive = Hives(**hive_dict)
-        return await request_user_hives(method="DELETE", hive=hive)
\ No newline at end of file
+        return await request_user_hives(method="DELETE", hive=hive)
+
+
+
+@users_router.get(f"/{CURRENT_VERSION}/users/hives/nearby/", tags = ["users"])
+@limiter.limit(USER_HIVES_LIMIT)
+async def get_nearby_user_hives(request: Request, search: Annotated[GeoSearch, Query()], JWT_TOKEN: dict = Depends(get_current_user)):
+    """
+    Retrieve the user hives whose location is within max_distance meters of a point, nearest first (with their location coordinates & distance)
+    """
+    return await search_user_hives(
+        user_id = JWT_TOKEN["id"], latitude = search.latitude, longitude = search.longitude,
+        max_distance = search.max_distance, skip = search.skip, limit = search.limit
+    )
@@ -11,6 +11,7 @@ from utils.config import CURRENT_VERSION, TEST_LIMIT
 from utils.decorators import require_role
 from utils.exceptions import CustomException 
 from utils.limiter import limiter
+from utils.responses import FastJSONResponse
 
 
 """
@@ -41,7 +42,8 @@ async def get_weather(user_params:WeatherRequest, request: Request, JWT_TOKEN: d
 
     """
     if user_params.request_type in ["forecast", "archive"]:
-        return transform_and_return_openmeteoapi_response(user_params)
+        # Returned as a response to skip jsonable_encoder, numpy arrays are serialized by orjson
+        return FastJSONResponse(content = transform_and_return_openmeteoapi_response(user_params))
     else:
         raise CustomException(name = "invalid_request",
                               error_code = 400,
@@ -0,0 +1,71 @@
+# api/server.py
+# python3 server.py
+
+
+"""
+Production server
+- API_WORKERS uvicorn worker processes sharing the port, each one importing main:app and running its own lifespan
+  (connection pools, OTLP exporter, monitors are created per worker, see main.py)
+- uvloop event loop & httptools HTTP parser, keep-alive timeout and listen backlog from the .env file
+- SIGTERM (docker stop): workers stop accepting connections, drain in-flight requests for at most
+  API_GRACEFUL_SHUTDOWN_TIMEOUT seconds, then run the lifespan shutdown
+- Prometheus multiprocess mode (several workers, or PROMETHEUS_MULTIPROC_DIR set): workers write their metrics in
+  PROMETHEUS_MULTIPROC_DIR, created and emptied at start, /metrics aggregates them
+"""
+
+
+# Lib
+import copy
+import os
+import shutil
+
+import uvicorn
+
+from utils.config import API_WORKERS, API_LOOP, API_HTTP, API_BACKLOG, API_KEEP_ALIVE, API_GRACEFUL_SHUTDOWN_TIMEOUT, PROMETHEUS_MULTIPROC_DIR
+
+EXPOSE_PORT = os.environ.get("EXPOSE_PORT", 8000)
+ACCESS_LOG_FORMAT = "%(asctime)s %(levelname)s [%(name)s] [%(filename)s:%(lineno)d] [trace_id=%(otelTraceID)s span_id=%(otelSpanID)s resource.service.name=%(otelServiceName)s] - %(message)s"
+
+
+
+def get_log_config() -> dict:
+    """
+    Uvicorn logging config with the access log format correlated to traces
+    """
+    log_config = copy.deepcopy(uvicorn.config.LOGGING_CONFIG)
+    log_config["formatters"]["access"]["fmt"] = ACCESS_LOG_FORMAT
+    return log_config
+
+
+
+def prepare_prometheus_multiproc_dir(path: str) -> None:
+    """
+    Empty the metrics directory before workers start (files of a previous run would be aggregated),
+    the environment variable is inherited by the workers
+    """
+    shutil.rmtree(path, ignore_errors = True)
+    os.makedirs(path, exist_ok = True)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+
+
+
+def run_server() -> None:
+    # Multiprocess metrics as soon as the variable is set, even with one worker: prometheus_client then writes in the directory
+    if API_WORKERS > 1 or "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        prepare_prometheus_multiproc_dir(PROMETHEUS_MULTIPROC_DIR)
+
+    uvicorn.run("main:app",
+                host = "0.0.0.0",
+                port = int(EXPOSE_PORT),
+                workers = API_WORKERS,
+                loop = API_LOOP,
+                http = API_HTTP,
+                backlog = API_BACKLOG,
+                timeout_keep_alive = API_KEEP_ALIVE,
+                timeout_graceful_shutdown = API_GRACEFUL_SHUTDOWN_TIMEOUT,
+                log_config = get_log_config())
+
+
+
+if __name__ == "__main__":
+    run_server()
@@ -3,15 +3,15 @@
 
 # Lib
 from datetime import datetime, timedelta
-from fastapi import Depends
 import jwt # PyJWT library
 
 
-from services.postgres_connectors import get_postgres_client
-from utils.common_functions import oauth2_scheme
+from services.postgres_connectors import get_postgres_client, run_statement
+from services.user_cache import user_cache
+from utils.common_functions import oauth2_scheme, get_current_user
 from utils.config import ACCESS_TOKEN_EXPIRATION_IN_MINUTES, JWT_SECRET_KEY, ENCODING_ALGORITHM, USER_DATABASE, PWD_CONTEXT
 from utils.exceptions import CustomException 
-from utils.postgres_requests.user_requests import query_get_user_credentials_in_database
+from utils.monitoring import track_operation
 
 
 
@@ -45,21 +45,26 @@ async def verify_credentials(given_username:str, given_password:str) -> None:
         - CustomException if the account is not verified
         - CustomException if the password is incorrect
     """
-    # Search for user in the database
-    client = await get_postgres_client(database = USER_DATABASE)
-    user_credentials_in_database = await client.fetchrow(query_get_user_credentials_in_database, given_username)
+    # Search for user in the users cache, then in the database
+    user_credentials_in_database = user_cache.get("credentials", given_username)
+    if user_credentials_in_database is None:
+        generation = user_cache.generation
+        client = await get_postgres_client(database = USER_DATABASE)
+        try:
+            with track_operation("postgres", "query_get_user_credentials_in_database"):
+                user_credentials_in_database = await run_statement(client, "fetchrow", "query_get_user_credentials_in_database", given_username)
+        finally:
+            await client.close()
+        user_cache.set("credentials", given_username, user_credentials_in_database, generation = generation)
+
     # Controls (username, password matching, verified account)
     if user_credentials_in_database is None:
         raise CustomException(name='Auth_username_error', error_code=401, message="Username not found in the database")
     elif user_credentials_in_database["verified"] != True:
         raise CustomException(name='Auth_verification_error', error_code=401, message="Account not verified")
     else:
-        try:
+        with track_operation("passlib", "verify_password"):
             verify_password(given_password, user_credentials_in_database["password"])
-        except CustomException as e:
-            raise e
-        finally:
-            await client.close()
 
 
 
@@ -86,24 +91,3 @@ def encode_jwt(**data_to_encode) -> str:
 
     # Return encoded JWT
     return jwt.encode(payload = data_to_encode, key = JWT_SECRET_KEY, algorithm = ENCODING_ALGORITHM)
-
-
-
-def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
-    """
-    - Decode the JWT token and return the token
-
-    Args:
-        - token (str): The JWT token
-
-    Raises:
-        - CustomException if the token is invalid
-
-    Returns:
-        - The decoded token
-    """
-    try:
-        decoded_token = jwt.decode(token, JWT_SECRET_KEY, algorithms=ENCODING_ALGORITHM)
-    except Exception as e:
-        raise CustomException(name='Auth_token_error', error_code=500, message="Invalid token") from e
-    return decoded_token
\ No newline at end of file
@@ -0,0 +1,122 @@
+# api/services/health.py
+
+
+# Lib
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from services import mongodb_connectors
+from services.mongodb_connectors import get_mongodb_client
+from services.postgres_connectors import get_postgres_client
+from services.redis_connectors import get_object_version_client
+from utils.config import USER_DATABASE, CARTO_DATABASE, HEALTH_PROBE_TIMEOUT, HEALTH_CACHE_TTL
+from utils.monitoring import track_operation
+
+logger = logging.getLogger(__name__)
+
+
+
+"""
+Deep health check
+- All dependencies are probed concurrently through the worker shared clients (Postgres pools, MongoDB client, Redis client),
+  each probe with its own timeout
+- The result is cached per worker for HEALTH_CACHE_TTL seconds, concurrent requests wait for the running probes (one run at a time)
+"""
+health_cache: dict = {"result": None, "expires_at": 0.0}
+health_lock: Optional[asyncio.Lock] = None
+
+
+
+async def probe_postgres(database:str) -> None:
+    client = await get_postgres_client(database = database)
+    try:
+        with track_operation("postgres", "health_probe"):
+            await client.fetchval("SELECT 1")
+    finally:
+        await client.close()
+
+
+
+async def probe_mongodb() -> None:
+    client = await get_mongodb_client()
+    try:
+        with track_operation("mongodb", "health_probe"):
+            await client.admin.command("ping")
+    finally:
+        # Client created for the probe (no worker shared client)
+        if client is not mongodb_connectors.mongodb_client:
+            client.close()
+
+
+
+async def probe_redis() -> None:
+    client = get_object_version_client()
+    with track_operation("redis", "health_probe"):
+        await client.ping()
+
+
+
+HEALTH_PROBES = {
+    "postgres_users": lambda: probe_postgres(USER_DATABASE),
+    "postgres_carto": lambda: probe_postgres(CARTO_DATABASE),
+    "mongodb": probe_mongodb,
+    "redis": probe_redis,
+}
+
+
+
+async def run_probe(name:str, probe, timeout:float) -> dict:
+    """
+    Run a probe with a timeout, never raises
+
+    Returns:
+        - A dictionary containing the probe status ("up" or "down"), latency (ms) and error if any
+    """
+    before_time = time.perf_counter()
+    try:
+        await asyncio.wait_for(probe(), timeout = timeout)
+        result = {"status": "up"}
+    except asyncio.TimeoutError:
+        result = {"status": "down", "error": f"Timeout after {timeout} s"}
+    except Exception as e:
+        logger.warning(f"Health probe {name} failed: {e}")
+        result = {"status": "down", "error": type(e).__name__}
+    result["latency_ms"] = round((time.perf_counter() - before_time) * 1000, 2)
+    return result
+
+
+
+async def check_dependencies(probes:dict = None, timeout:float = HEALTH_PROBE_TIMEOUT) -> dict:
+    """
+    Probe all dependencies concurrently
+
+    Returns:
+        - A dictionary containing the global status ("up" if all dependencies are up, else "down") and each dependency result
+    """
+    probes = probes or HEALTH_PROBES
+    results = await asyncio.gather(*(run_probe(name, probe, timeout) for name, probe in probes.items()))
+    dependencies = dict(zip(probes, results))
+    status = "up" if all(result["status"] == "up" for result in results) else "down"
+    return {"status": status, "checked_at": time.time(), "dependencies": dependencies}
+
+
+
+async def get_deep_health(ttl:float = HEALTH_CACHE_TTL) -> dict:
+    """
+    Return the cached dependencies health, probed again when older than ttl seconds
+    """
+    global health_lock
+    if health_cache["result"] is not None and time.monotonic() < health_cache["expires_at"]:
+        return health_cache["result"]
+
+    if health_lock is None:
+        health_lock = asyncio.Lock()
+    async with health_lock:
+        # Probed by a concurrent request while waiting for the lock
+        if health_cache["result"] is None or time.monotonic() >= health_cache["expires_at"]:
+            health_cache["result"] = await check_dependencies()
+            health_cache["expires_at"] = time.monotonic() + ttl
+
+    return health_cache["result"]
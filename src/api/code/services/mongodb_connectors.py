@@ -2,19 +2,55 @@
 
 
 # Lib
+import logging
+from typing import Optional
+
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, GEOSPHERE
 
 from models.user_objects_base_models import Locations
 from models.user_objects_base_models import Hives
-from utils.config import MONGODB_HOST, MONGODB_PORT, MONGODB_API_USER, MONGODB_API_PASSWORD, MONGODB_DATABASE, MONGODB_LOCATION_COLLECTION_NAME, MONGODB_HIVE_COLLECTION_NAME
+from services.redis_connectors import bump_object_version
+from utils.config import MONGODB_HOST, MONGODB_PORT, MONGODB_API_USER, MONGODB_API_PASSWORD, MONGODB_DATABASE, MONGODB_LOCATION_COLLECTION_NAME, MONGODB_HIVE_COLLECTION_NAME, GEO_SEARCH_PAGE_SIZE
 from utils.exceptions import CustomException
+from utils.monitoring import track_operation
+
+
+
+"""
+Shared client
+- One client (and its connection pool) per worker process, created by the lifespan hook and closed on shutdown
+- Without shared client (scripts, tests), get_mongodb_client creates a new one
+"""
+mongodb_client: Optional[AsyncIOMotorClient] = None
+logger = logging.getLogger(__name__)
+
+
+
+async def init_mongodb_client() -> None:
+    """
+    Create the shared client of the current worker, a failure is logged and requests create their own client
+    """
+    global mongodb_client
+    if mongodb_client is None:
+        try:
+            mongodb_client = await get_mongodb_client()
+        except CustomException as e:
+            logger.error(f"MongoDB shared client not created: {e.message}")
+
 
 
+def close_mongodb_client() -> None:
+    global mongodb_client
+    if mongodb_client is not None:
+        mongodb_client.close()
+        mongodb_client = None
+
 
 
 async def get_mongodb_client() -> AsyncIOMotorClient:
     """
-    Get a connection to the MongoDB database.
+    Get a connection to the MongoDB database (the worker shared client if it exists).
 
     Returns:
         - A connection to the MongoDB database (client)
@@ -22,6 +58,9 @@ async def get_mongodb_client() -> AsyncIOMotorClient:
     Raises:
         - CustomException if the connection fails
     """
+    if mongodb_client is not None:
+        return mongodb_client
+
     try:
         client = AsyncIOMotorClient(
             f"mongodb://{MONGODB_API_USER}:{MONGODB_API_PASSWORD}@{MONGODB_HOST}:{MONGODB_PORT}/admin"
@@ -94,23 +133,31 @@ async def request_user_locations(user_id: str = None, method: str = "GET", locat
     
     else:
         if method == "GET":
-            cursor = collection.find({"owner": user_id})
-            document = await cursor.to_list(length=None)
+            with track_operation("mongodb", "find_locations") as tracker:
+                cursor = collection.find({"owner": user_id})
+                document = await cursor.to_list(length=None)
+                tracker.set_rows(len(document))
             if document:
                 for doc in document:
                     doc['_id'] = str(doc['_id'])
             return document if document else {}
 
         elif method == "POST":
-            await collection.insert_one(location.dict())
+            with track_operation("mongodb", "insert_location"):
+                await collection.insert_one(get_location_document(location))
+            await bump_object_version("locations", location.owner)
             return {"status": "success", "message": "Location added", "location": location.dict()}
 
         elif method == "PUT":
-            await collection.update_one({"owner": location.owner, "name": location.name}, {"$set": location.dict()})
+            with track_operation("mongodb", "update_location"):
+                await collection.update_one({"owner": location.owner, "name": location.name}, {"$set": get_location_document(location)})
+            await bump_object_version("locations", location.owner)
             return {"status": "success", "message": "Location updated"}
 
         elif method == "DELETE":
-            await collection.delete_one({"name": location.name, "latitude": location.latitude, "longitude": location.longitude})
+            with track_operation("mongodb", "delete_location"):
+                await collection.delete_one({"name": location.name, "latitude": location.latitude, "longitude": location.longitude})
+            await bump_object_version("locations", location.owner)
             return {"status": "success", "message": "Location deleted"}
 
         else:
@@ -148,23 +195,31 @@ async def request_user_hives(user_id: str = None, method: str = "GET", hive: Hiv
     
     else:
         if method == "GET":
-            cursor = collection.find({"owner": user_id})
-            document = await cursor.to_list(length=None)
+            with track_operation("mongodb", "find_hives") as tracker:
+                cursor = collection.find({"owner": user_id})
+                document = await cursor.to_list(length=None)
+                tracker.set_rows(len(document))
             if document:
                 for doc in document:
                     doc['_id'] = str(doc['_id'])
             return document if document else {}
 
         elif method == "POST":
-            await collection.insert_one(hive.dict())
+            with track_operation("mongodb", "insert_hive"):
+                await collection.insert_one(hive.dict())
+            await bump_object_version("hives", hive.owner)
             return {"status": "success", "message": "Hive added", "hive": hive.dict()}
 
         elif method == "PUT":
-            await collection.update_one({"owner": hive.owner, "name": hive.name}, {"$set": hive.dict()})
+            with track_operation("mongodb", "update_hive"):
+                await collection.update_one({"owner": hive.owner, "name": hive.name}, {"$set": hive.dict()})
+            await bump_object_version("hives", hive.owner)
             return {"status": "success", "message": "Hive updated"}
 
         elif method == "DELETE":
-            await collection.delete_one({"name": hive.name})
+            with track_operation("mongodb", "delete_hive"):
+                await collection.delete_one({"name": hive.name})
+            await bump_object_version("hives", hive.owner)
             return {"status": "success", "message": "Hive deleted"}
 
         else:
@@ -172,4 +227,138 @@ async def request_user_hives(user_id: str = None, method: str = "GET", hive: Hiv
             name = "Error: Wrong Method",
             error_code = 400,
             message = f"Wrong method used: {method}. Method must be GET, POST, PUT or DELETE"
-        )
\ No newline at end of file
+        )
+
+
+
+"""
+Geo search
+- Locations store a GeoJSON Point (position), written with latitude & longitude on each insert / update (get_location_document)
+- 2dsphere index on the position (and owner), hives indexed by owner & location name: created by the first search of each worker
+  (not on startup: an unavailable MongoDB would delay it), maintenance/sync_location_positions.py backfills the locations written before
+- Searches are scoped to the owner, sorted by distance (meters) and paged ($geoNear, spherical)
+"""
+geo_indexes_created = False
+
+def get_location_position(latitude: float, longitude: float) -> dict:
+    return {"type": "Point", "coordinates": [longitude, latitude]}
+
+
+
+def get_location_document(location: Locations) -> dict:
+    """
+    Location document as stored: the model fields and their GeoJSON position
+    """
+    return {**location.dict(), "position": get_location_position(location.latitude, location.longitude)}
+
+
+
+async def ensure_geo_indexes() -> None:
+    """
+    Create the geo search indexes if needed, once per worker (first search), a failure is logged and retried by the next search
+    """
+    global geo_indexes_created
+    if geo_indexes_created:
+        return
+    try:
+        locations = await get_collection(MONGODB_LOCATION_COLLECTION_NAME)
+        await locations.create_index([("position", GEOSPHERE), ("owner", ASCENDING)], name = "position_owner")
+        hives = await get_collection(MONGODB_HIVE_COLLECTION_NAME)
+        await hives.create_index([("owner", ASCENDING), ("location_name", ASCENDING)], name = "owner_location_name")
+        geo_indexes_created = True
+    except Exception as e:
+        logger.error(f"MongoDB geo search indexes not created: {e}")
+
+
+
+def get_geo_near_stage(user_id: str, latitude: float, longitude: float, max_distance: float) -> dict:
+    return {
+        "$geoNear": {
+            "near": get_location_position(latitude, longitude),
+            "key": "position",
+            "distanceField": "distance",
+            "maxDistance": max_distance,
+            "query": {"owner": user_id},
+            "spherical": True,
+        }
+    }
+
+
+
+async def search_user_locations(user_id: str, latitude: float, longitude: float, max_distance: float, skip: int = 0, limit: int = GEO_SEARCH_PAGE_SIZE) -> list:
+    """
+    Search the user's locations within max_distance meters of a point, nearest first.
+
+    Args:
+        - user_id (str): The user's ID
+        - latitude, longitude (float): The point
+        - max_distance (float): In meters
+        - skip, limit (int): Paging
+
+    Returns:
+        - A list of locations with their distance (meters)
+
+    Raises:
+        - CustomException if the search fails
+    """
+    pipeline = [get_geo_near_stage(user_id, latitude, longitude, max_distance), {"$skip": skip}, {"$limit": limit}]
+    await ensure_geo_indexes()
+    try:
+        collection = await get_collection(MONGODB_LOCATION_COLLECTION_NAME)
+        with track_operation("mongodb", "search_locations") as tracker:
+            documents = await collection.aggregate(pipeline).to_list(length = None)
+            tracker.set_rows(len(documents))
+    except CustomException:
+        raise
+    except Exception as e:
+        raise CustomException(name = "Error: MongoDB geo search",
+                              error_code = 500,
+                              message = f"Failed to search the locations: {e}")
+
+    for document in documents:
+        document["_id"] = str(document["_id"])
+    return documents
+
+
+
+async def search_user_hives(user_id: str, latitude: float, longitude: float, max_distance: float, skip: int = 0, limit: int = GEO_SEARCH_PAGE_SIZE) -> list:
+    """
+    Search the user's hives whose location is within max_distance meters of a point, nearest first.
+
+    Args:
+        - user_id (str): The user's ID
+        - latitude, longitude (float): The point
+        - max_distance (float): In meters
+        - skip, limit (int): Paging (on hives)
+
+    Returns:
+        - A list of hives with the latitude, longitude and distance (meters) of their location
+
+    Raises:
+        - CustomException if the search fails
+    """
+    pipeline = [
+        get_geo_near_stage(user_id, latitude, longitude, max_distance),
+        {"$lookup": {"from": MONGODB_HIVE_COLLECTION_NAME, "localField": "name", "foreignField": "location_name",
+                     "pipeline": [{"$match": {"owner": user_id}}], "as": "hives"}},
+        {"$unwind": "$hives"},
+        {"$replaceRoot": {"newRoot": {"$mergeObjects": ["$hives", {"latitude": "$latitude", "longitude": "$longitude", "distance": "$distance"}]}}},
+        {"$skip": skip},
+        {"$limit": limit},
+    ]
+    await ensure_geo_indexes()
+    try:
+        collection = await get_collection(MONGODB_LOCATION_COLLECTION_NAME)
+        with track_operation("mongodb", "search_hives") as tracker:
+            documents = await collection.aggregate(pipeline).to_list(length = None)
+            tracker.set_rows(len(documents))
+    except CustomException:
+        raise
+    except Exception as e:
+        raise CustomException(name = "Error: MongoDB geo search",
+                              error_code = 500,
+                              message = f"Failed to search the hives: {e}")
+
+    for document in documents:
+        document["_id"] = str(document["_id"])
+    return documents
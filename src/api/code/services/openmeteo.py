@@ -2,23 +2,29 @@
 
 
 # Lib
-import asyncio
-import numpy as np
-import openmeteo_requests
-import pandas as pd
-import requests_cache
-from retry_requests import retry
-
+# pandas, openmeteo_requests, requests_cache & retry_requests are imported when first used (weather route only, API startup time)
 from models.weather_base_models import WeatherRequest
 from services.redis_connectors import get_redis_client
 from utils.config import forecast_url, historical_forecast_url, openmeteo_models, params_current_weather, params_daily_weather, params_hourly_weather
 from utils.exceptions import CustomException
+from utils.monitoring import track_operation
+
+
+"""
+OpenMeteo client
+- Created per worker process by the lifespan hook (init_openmeteo_client), never at import
+- Responses are cached in Redis (shared by the workers) for 10 minutes
+"""
+openmeteo = None
+
 
 
 """
 FUNCTIONS
 """
-async def setup_cache_session() -> requests_cache.CachedSession:
+async def setup_cache_session() -> "requests_cache.CachedSession":
+    import requests_cache
+
     redis_client = await get_redis_client()
     cache_session = requests_cache.CachedSession(
         backend = "redis",
@@ -28,14 +34,20 @@ async def setup_cache_session() -> requests_cache.CachedSession:
     return cache_session
 
 
-cache_session = asyncio.run(setup_cache_session())
-retry_session = retry(cache_session, retries = 5, backoff_factor = 0.5)
-openmeteo = openmeteo_requests.Client(session = retry_session)
+async def init_openmeteo_client() -> None:
+    global openmeteo
+    if openmeteo is None:
+        import openmeteo_requests
+        from retry_requests import retry
 
+        cache_session = await setup_cache_session()
+        retry_session = retry(cache_session, retries = 5, backoff_factor = 0.5)
+        openmeteo = openmeteo_requests.Client(session = retry_session)
 
-def request_openmeteo_api(user_params:WeatherRequest) -> dict:
+
+def build_openmeteo_params(user_params:WeatherRequest) -> tuple:
     """
-    
+    Return the OpenMeteo URL and query parameters of a weather request (also used to record load test responses)
     """
     params = {
         "latitude": user_params.latitude,
@@ -59,9 +71,25 @@ def request_openmeteo_api(user_params:WeatherRequest) -> dict:
 
         url = historical_forecast_url
 
+    return url, params
 
-    responses = openmeteo.weather_api(url, params = params)
-    response = responses[0]
+
+
+def request_openmeteo_api(user_params:WeatherRequest) -> dict:
+    """
+    Request the OpenMeteo API (flatbuffers response, cached in Redis)
+    """
+    url, params = build_openmeteo_params(user_params)
+
+    if openmeteo is None:
+        raise CustomException(name = "Error: OpenMeteo client",
+                              error_code = 503,
+                              message = "OpenMeteo client is not initialized")
+
+    with track_operation("openmeteo", f"weather_api_{user_params.request_type}") as tracker:
+        responses = openmeteo.weather_api(url, params = params)
+        response = responses[0]
+        tracker.set_payload_bytes(len(response._tab.Bytes))
 
     return response
 
@@ -73,51 +101,51 @@ def transform_and_return_openmeteoapi_response(user_params:WeatherRequest) -> di
     """
     response = request_openmeteo_api(user_params)
 
-    # Transform daily
-    daily = response.Daily()
+    with track_operation("pandas", "transform_openmeteo_response") as tracker:
+        transformed_response = transform_openmeteoapi_response(response, user_params)
+        tracker.set_rows(len(transformed_response[-1]["date"]))
+
+    return transformed_response
 
-    daily_data = {"date": pd.date_range(
-        start = pd.to_datetime(daily.Time(), unit = "s", utc = True),
-        end = pd.to_datetime(daily.TimeEnd(), unit = "s", utc = True),
-        freq = pd.Timedelta(seconds = daily.Interval()),
+
+
+def get_response_dates(variables) -> list[str]:
+    """
+    Return the ISO 8601 dates (UTC) of an OpenMeteo daily / hourly block.
+    """
+    import pandas as pd
+
+    dates = pd.date_range(
+        start = pd.to_datetime(variables.Time(), unit = "s", utc = True),
+        end = pd.to_datetime(variables.TimeEnd(), unit = "s", utc = True),
+        freq = pd.Timedelta(seconds = variables.Interval()),
         inclusive = "left"
-    )}
+    )
+    return dates.strftime("%Y-%m-%dT%H:%M:%S+00:00").tolist()
 
 
-    for index, elt in enumerate(params_daily_weather):
-        daily_data[elt] = daily.Variables(index).ValuesAsNumpy()
 
+def transform_openmeteoapi_response(response, user_params:WeatherRequest) -> tuple:
+    """
+    Transform an OpenMeteo API response (flatbuffer) to dicts.
+    - Values are kept as numpy arrays, serialized by the orjson response class (NaN -> null)
+    """
+    # Transform daily
+    daily = response.Daily()
+
+    daily_data = {"date": get_response_dates(daily)}
 
-    for key, value in daily_data.items():
-        if isinstance(value, list) or isinstance(value, int):
-            pass
-        else:
-            daily_data[key] = value.tolist()
+    for index, elt in enumerate(params_daily_weather):
+        daily_data[elt] = daily.Variables(index).ValuesAsNumpy()
 
 
     # Transform hourly
     hourly = response.Hourly()
 
-    hourly_data = {"date": pd.date_range(
-        start = pd.to_datetime(hourly.Time(), unit = "s", utc = True),
-        end = pd.to_datetime(hourly.TimeEnd(), unit = "s", utc = True),
-        freq = pd.Timedelta(seconds = hourly.Interval()),
-        inclusive = "left"
-    )}
-
+    hourly_data = {"date": get_response_dates(hourly)}
 
     for index, elt in enumerate(params_hourly_weather):
-        values = hourly.Variables(index).ValuesAsNumpy()
-        hourly_data[elt] = [None if np.isnan(v) else v for v in values]
-
-
-    for key, value in hourly_data.items():
-        if isinstance(value, int) or isinstance(value, list):
-            pass
-        else:
-            hourly_data[key] = value.tolist()
-            
-        hourly_data[key] = [float(v) if isinstance(v, np.float32) else v for v in value]
+        hourly_data[elt] = hourly.Variables(index).ValuesAsNumpy()
 
 
 
@@ -2,18 +2,24 @@
 
 
 # Lib
+import asyncio
 import asyncpg
+import logging
+import re
 
+from collections import Counter
 from uuid import UUID
-import shapely.wkb
 
 
 
 from models.params_emplacements_base_model import ParamsLocation
 from models.users_base_models import User, Password
-from utils.config import POSTGRES_API_USER, POSTGRES_API_PASSWORD, POSTGRES_HOST, POSTGRES_PORT, USER_DATABASE, CARTO_DATABASE
+from utils.config import POSTGRES_API_USER, POSTGRES_API_PASSWORD, POSTGRES_HOST, POSTGRES_PORT, USER_DATABASE, CARTO_DATABASE, POSTGRES_POOL_MIN_SIZE, POSTGRES_POOL_MAX_SIZE, CARTO_SUMMARY_PRECISION
 from utils.exceptions import CustomException
-from utils.common_functions import hash_string, get_projection
+from utils.common_functions import hash_string, get_projection, group_by_projection
+from utils.monitoring import track_operation, POSTGRES_STATEMENT_EXECUTIONS
+from services.user_cache import user_cache, invalidate_user
+from utils.postgres_requests.statements import statements, user_statements, carto_statements
 
 
 # SELECT queries
@@ -21,18 +27,157 @@ from utils.postgres_requests.user_requests import query_get_username, query_get_
 from utils.postgres_requests.cartographic_requests import query_get_rpg_location, query_get_clc_location
 # from utils.postgres_requests.cartographic_requests import query_get_foretV2_location
 # INSERT queries
-from utils.postgres_requests.user_requests import query_insert_new_user, query_insert_user_log, query_insert_user_info
+from utils.postgres_requests.user_requests import query_insert_new_user, query_insert_user_log, query_insert_user_info, users_import_columns
 # UPDATE queries
-from utils.postgres_requests.user_requests import query_update_user_password, query_update_user_last_login, query_force_user_verified_true, query_update_user_info_data
+from utils.postgres_requests.user_requests import query_update_user_password, query_update_user_last_login, query_force_user_verified_true, query_update_user_info_data, user_info_fields
 
 
 
 
 
+"""
+Connection pools
+- One pool per database and per worker process, created by the lifespan hook (init_postgres_pools) and closed on shutdown
+- Without pool (scripts, tests, pool creation failure), get_postgres_client opens a dedicated connection
+- The registered statements of the database (utils/postgres_requests/statements.py) are prepared into the statement cache
+  of each new pooled connection
+"""
+postgres_pools: dict = {}
+logger = logging.getLogger(__name__)
+
+
+
+class StatementConnection(asyncpg.Connection):
+    """
+    Pooled connection holding the names of the statements warmed in its statement cache
+    """
+    __slots__ = ("warmed_statements",)
+
+
+
+class StatementWarmupRollback(Exception):
+    """
+    Rolls back the transaction of a statement warmup
+    """
+
+
+
+def get_params_count(query:str) -> int:
+    return max((int(number) for number in re.findall(r"\$(\d+)", query)), default = 0)
+
+
+
+def get_statements_preparer(database_statements:dict):
+    """
+    Return the pool init callback preparing the database statements into the statement cache of a new connection
+    - asyncpg statement cache: keyed by query text, kept across releases to the pool (unlike the statements returned by
+      Connection.prepare()), filled when a query text is executed, before its execution
+    - Each statement is executed once with NULL params in a rolled back transaction: NULL never matches a row and the rows
+      written are rolled back, a NULL rejected by a constraint (statement already prepared) is expected
+    - A statement failing to prepare (missing table, ...) is logged and prepared on its first execution
+    """
+    async def prepare_statements(connection: StatementConnection) -> None:
+        connection.warmed_statements = set()
+        for name, query in database_statements.items():
+            try:
+                async with connection.transaction():
+                    await connection.execute(query, *[None] * get_params_count(query))
+                    raise StatementWarmupRollback()
+            except (StatementWarmupRollback, asyncpg.IntegrityConstraintViolationError):
+                connection.warmed_statements.add(name)
+            except asyncpg.PostgresError as e:
+                logger.warning(f"Statement {name} not prepared: {e}")
+
+    return prepare_statements
+
+
+
+async def run_statement(client, method:str, name:str, *args):
+    """
+    Execute a registered statement by its query text: pooled connections serve it from their statement cache
+
+    Args:
+        - client: The connection (get_postgres_client)
+        - method (str): fetch, fetchrow, fetchval or execute
+        - name (str): The statement name (utils/postgres_requests/statements.py)
+        - args: The statement params
+    """
+    # warmed: prepared by the pool init callback, otherwise prepared by this execution (or a previous one on the connection)
+    warmed_statements = getattr(client, "warmed_statements", None)
+    warmed = isinstance(warmed_statements, set) and name in warmed_statements
+    POSTGRES_STATEMENT_EXECUTIONS.labels(statement = name, warmed = str(warmed).lower()).inc()
+
+    return await getattr(client, method)(statements[name], *args)
+
+
+
+class PooledConnection:
+    """
+    Connection acquired from a pool, used as a dedicated connection: close() releases it to the pool
+    """
+    def __init__(self, pool: asyncpg.Pool, connection: asyncpg.Connection) -> None:
+        self.pool = pool
+        self.connection = connection
+
+    def __getattr__(self, name: str):
+        return getattr(self.connection, name)
+
+    async def close(self) -> None:
+        if self.connection is not None:
+            connection, self.connection = self.connection, None
+            await self.pool.release(connection)
+
+
+
+def get_server_settings(database:str) -> dict:
+    """
+    Session settings of the database connections
+    - Carto: prepared statements are planned with their params (year & srid), so the planner prunes the year & srid
+      partitions of the prepared tables at planning and only reads the GiST index of one leaf
+    """
+    if database == CARTO_DATABASE:
+        return {"plan_cache_mode": "force_custom_plan"}
+    return None
+
+
+
+async def init_postgres_pools(databases:list = None) -> None:
+    """
+    Create the connection pools of the current worker, a failing database is logged and served without pool
+    """
+    database_statements = {USER_DATABASE: user_statements, CARTO_DATABASE: carto_statements}
+
+    for database in databases or [USER_DATABASE, CARTO_DATABASE]:
+        if database is None or database in postgres_pools:
+            continue
+        try:
+            postgres_pools[database] = await asyncpg.create_pool(user = POSTGRES_API_USER,
+                                                                 password = POSTGRES_API_PASSWORD,
+                                                                 database = database,
+                                                                 host = POSTGRES_HOST,
+                                                                 port = POSTGRES_PORT,
+                                                                 min_size = POSTGRES_POOL_MIN_SIZE,
+                                                                 max_size = POSTGRES_POOL_MAX_SIZE,
+                                                                 connection_class = StatementConnection,
+                                                                 init = get_statements_preparer(database_statements.get(database, {})),
+                                                                 server_settings = get_server_settings(database))
+        except Exception as e:
+            logger.error(f"Postgres pool not created for {database}, dedicated connections will be used: {e}")
+
+
+
+async def close_postgres_pools() -> None:
+    while postgres_pools:
+        _, pool = postgres_pools.popitem()
+        await pool.close()
+
+
+
 # Functions
 async def get_postgres_client(database:str) -> asyncpg.Connection:
     """
-    Get a connection to the Postgres database.
+    Get a connection to the Postgres database (from the worker pool if it exists).
+    The connection must be closed by the caller (released to the pool for pooled connections).
 
     Args:
         - database (str): The name of the database to connect to
@@ -43,11 +188,16 @@ async def get_postgres_client(database:str) -> asyncpg.Connection:
         - CustomException if the connection fails
     """
     try:
+        pool = postgres_pools.get(database)
+        if pool is not None:
+            return PooledConnection(pool, await pool.acquire())
+
         client = await asyncpg.connect(user = POSTGRES_API_USER,
                                        password = POSTGRES_API_PASSWORD,
                                        database = database,
                                        host = POSTGRES_HOST,
-                                       port = POSTGRES_PORT
+                                       port = POSTGRES_PORT,
+                                       server_settings = get_server_settings(database)
                                       )
     
     except Exception as e:
@@ -70,7 +220,13 @@ async def get_user_data_from_database(username:str) -> dict:
     
     Returns:
         - A dictionary containing the user data (username, role, role_name, created_at, updated_at, last_login)
+        - Served from the users cache when possible (last_login may then be the one of a login less than USER_CACHE_TTL ago)
     """
+    cached_user_data = user_cache.get("secure_data", username)
+    if cached_user_data is not None:
+        return dict(cached_user_data)
+    generation = user_cache.generation
+
     try:
         client = await get_postgres_client(database = USER_DATABASE)
     except Exception as e:
@@ -78,10 +234,14 @@ async def get_user_data_from_database(username:str) -> dict:
                               error_code = 500,
                               message = f"Failed to connect to the Postgres database: {e}")
     else:
-        user_data = await client.fetchrow(query_get_user_secure_data, username)
+        try:
+            with track_operation("postgres", "query_get_user_secure_data"):
+                user_data = await run_statement(client, "fetchrow", "query_get_user_secure_data", username)
+        finally:
+            await client.close()
         # Convert UUIDs to strings
         user_data = {k: str(v) if isinstance(v, UUID) else v for k, v in user_data.items()}
-        await client.close()
+        user_cache.set("secure_data", username, dict(user_data), generation = generation)
 
     return user_data
 
@@ -95,8 +255,13 @@ async def get_user_info_data(username:str) -> dict:
         - username (str): The username of the user
 
     Returns:
-        - A dictionary containing the user info data (username)
+        - A dictionary containing the user info data (username), served from the users cache when possible
     """
+    cached_user_info = user_cache.get("info_data", username)
+    if cached_user_info is not None:
+        return cached_user_info
+    generation = user_cache.generation
+
     try:
         client = await get_postgres_client(database = USER_DATABASE)
     except Exception as e:
@@ -104,8 +269,12 @@ async def get_user_info_data(username:str) -> dict:
                               error_code = 500,
                               message = f"Failed to connect to the Postgres database: {e}")
     else:
-        user_info = await client.fetchrow(query_get_user_info_data, username)
-        await client.close()
+        try:
+            with track_operation("postgres", "query_get_user_info_data"):
+                user_info = await run_statement(client, "fetchrow", "query_get_user_info_data", username)
+        finally:
+            await client.close()
+        user_cache.set("info_data", username, user_info, generation = generation)
         
     return user_info
 
@@ -117,11 +286,19 @@ async def update_user_info_data(user_id_to_update:str, info_to_update:dict) -> N
 
     Args:
         - user_id_to_update (str): The user id to update
-        - info_to_update (dict): The informations to update
+        - info_to_update (dict): The informations to update (user_info_fields), missing fields keep their value
 
     Raises:
+        - CustomException: If an information is not updatable
         - CustomException: If the update fails
     """
+    unknown_fields = set(info_to_update) - set(user_info_fields)
+    if unknown_fields:
+        raise CustomException(name = "Update error",
+                              error_code = 422,
+                              message = f"Informations not updatable: {', '.join(sorted(unknown_fields))}")
+    query_args:tuple = (user_id_to_update, *(info_to_update.get(field) for field in user_info_fields))
+
     try:
         client = await get_postgres_client(database = USER_DATABASE)
     except Exception as e:
@@ -129,8 +306,14 @@ async def update_user_info_data(user_id_to_update:str, info_to_update:dict) -> N
                               error_code = 500,
                               message = f"Failed to connect to the Postgres database: {e}")
     else:
-        await client.fetchrow(query_update_user_info_data(user_id_to_update, info_to_update))
-        await client.close()
+        try:
+            with track_operation("postgres", "query_update_user_info_data"):
+                updated_username = await run_statement(client, "fetchval", "query_update_user_info_data", *query_args)
+        finally:
+            await client.close()
+
+        if updated_username is not None:
+            await invalidate_user(updated_username)
 
 
 
@@ -146,7 +329,8 @@ async def check_if_user_exists_in_database(username:str) -> None:
     """
     client = await get_postgres_client(database=USER_DATABASE)
     try:
-        user_data = await client.fetchrow(query_get_username, username)
+        with track_operation("postgres", "query_get_username"):
+            user_data = await run_statement(client, "fetchrow", "query_get_username", username)
         if user_data is not None:
             raise CustomException(name="Register error",
                                   error_code=409,
@@ -170,7 +354,8 @@ async def force_verified_user_to_true(username_to_verify:str) -> None:
     client = await get_postgres_client(database = USER_DATABASE)
 
     try:
-        await client.execute(query_force_user_verified_true, username_to_verify)
+        with track_operation("postgres", "query_force_user_verified_true"):
+            await run_statement(client, "execute", "query_force_user_verified_true", username_to_verify)
     except Exception as e:
         raise CustomException(name = "Force verified error", 
                               error_code = 500,
@@ -178,47 +363,46 @@ async def force_verified_user_to_true(username_to_verify:str) -> None:
     finally:
         await client.close()
 
+    await invalidate_user(username_to_verify)
+
 
 
 async def register_user_in_database(new_user:User) -> None:
     """
-    Register a new user in the database.
+    Register a new user in the database (users, user_infos & user_logs rows in one atomic statement).
 
     Args:
         - new_user (User): The new user to register
-    
+
+    Raises:
+        - CustomException: If the username is already registered
+        - CustomException: If the registration fails (no row inserted)
     """
     hashed_password = hash_string(str(new_user.password.password))
     
     client = await get_postgres_client(database = USER_DATABASE)
 
-    values_to_insert:dict = {
-        "user": (new_user._id,
-                    new_user.username,
-                    hashed_password,
-                    new_user._role,
-                    new_user._verified,
-                ),
-        "info": (new_user._id,
-                    None,
-                    None,
-                    None,
-                    None,
-                    None,
-                    new_user.email,
-                ),
-        "log": (new_user._id,
-                    new_user._created_at,
-                    new_user._updated_at,
-                    new_user._last_login,
-                ),
-        }
+    query_args:tuple = (new_user._id,
+                        new_user.username,
+                        hashed_password,
+                        new_user._role,
+                        new_user._verified,
+                        new_user.email,
+                        new_user._created_at,
+                        new_user._updated_at,
+                        new_user._last_login,
+                       )
 
     try:
-        await client.execute(query_insert_new_user, *values_to_insert["user"])
-        await client.execute(query_insert_user_info, *values_to_insert["info"])
-        await client.execute(query_insert_user_log, *values_to_insert["log"])
-    
+        with track_operation("postgres", "query_register_user"):
+            await run_statement(client, "execute", "query_register_user", *query_args)
+
+    except asyncpg.UniqueViolationError as e:
+        # Registered by a concurrent request since check_if_user_exists_in_database
+        raise CustomException(name = "Register error",
+                              error_code = 409,
+                              message = "User already exists") from e
+
     except Exception as e:
         raise CustomException(name = "Register error",
                               error_code = 500,
@@ -230,6 +414,69 @@ async def register_user_in_database(new_user:User) -> None:
 
 
 
+async def import_users_in_database(new_users:list[User], verified:bool = False) -> int:
+    """
+    Bulk import users (partner federations onboarding): one transaction, rows sent with COPY.
+    Passwords are hashed in threads (the hash releases the GIL), it is the longest part of the import.
+
+    Args:
+        - new_users (list[User]): The users to import
+        - verified (bool): Import the accounts as verified
+
+    Returns:
+        - The number of imported users
+
+    Raises:
+        - CustomException: If a username is duplicated in the import or already registered (nothing is imported)
+        - CustomException: If the import fails (nothing is imported)
+    """
+    usernames = [new_user.username for new_user in new_users]
+    duplicated_usernames = sorted(username for username, count in Counter(usernames).items() if count > 1)
+    if duplicated_usernames:
+        raise CustomException(name = "Import error",
+                              error_code = 422,
+                              message = f"Duplicated usernames in the import: {', '.join(duplicated_usernames)}")
+
+    with track_operation("passlib", "hash_imported_passwords"):
+        hashed_passwords = await asyncio.gather(*(asyncio.to_thread(hash_string, str(new_user.password.password)) for new_user in new_users))
+
+    records:dict = {"users": [], "user_infos": [], "user_logs": []}
+    for new_user, hashed_password in zip(new_users, hashed_passwords):
+        records["users"].append((new_user._id, new_user.username, hashed_password, new_user._role, verified))
+        records["user_infos"].append((new_user._id, new_user.email))
+        records["user_logs"].append((new_user._id, new_user._created_at, new_user._updated_at, new_user._last_login))
+
+    client = await get_postgres_client(database = USER_DATABASE)
+
+    try:
+        async with client.transaction():
+            with track_operation("postgres", "query_get_existing_usernames"):
+                existing_usernames = await run_statement(client, "fetch", "query_get_existing_usernames", usernames)
+            if existing_usernames:
+                raise CustomException(name = "Import error",
+                                      error_code = 409,
+                                      message = f"Users already exist: {', '.join(record['username'] for record in existing_usernames)}")
+
+            for table, columns in users_import_columns.items():
+                with track_operation("postgres", f"copy_{table}") as tracker:
+                    await client.copy_records_to_table(table, records = records[table], columns = columns)
+                    tracker.set_rows(len(records[table]))
+
+    except CustomException:
+        raise
+
+    except Exception as e:
+        raise CustomException(name = "Import error",
+                              error_code = 500,
+                              message = f"Failed to import the users: {e}")
+
+    finally:
+        await client.close()
+
+    return len(new_users)
+
+
+
 async def update_user_password(user_who_updates:str, new_password:Password) -> None:
     """
     Update the user password in the database.
@@ -248,7 +495,8 @@ async def update_user_password(user_who_updates:str, new_password:Password) -> N
     client = await get_postgres_client(database = USER_DATABASE)
 
     try:
-        await client.execute(query_update_user_password, *query_args)
+        with track_operation("postgres", "query_update_user_password"):
+            await run_statement(client, "execute", "query_update_user_password", *query_args)
     except Exception as e:
         raise CustomException(name = "Password update error", 
                               error_code = 500,
@@ -256,6 +504,8 @@ async def update_user_password(user_who_updates:str, new_password:Password) -> N
     finally:
         await client.close()
 
+    await invalidate_user(user_who_updates)
+
 
 
 async def update_user_last_login(username:str) -> None:
@@ -268,7 +518,8 @@ async def update_user_last_login(username:str) -> None:
     client = await get_postgres_client(database = USER_DATABASE)
 
     try:
-        await client.execute(query_update_user_last_login, username)
+        with track_operation("postgres", "query_update_user_last_login"):
+            await run_statement(client, "execute", "query_update_user_last_login", username)
     except Exception as e:
         raise CustomException(name = "User last login error", 
                               error_code = 500,
@@ -302,70 +553,178 @@ async def get_carto_from_database(params_location:ParamsLocation) -> dict:
 
 
     else:
-        data_type_to_request = params_location.data_type
+        # Imported on first carto request (API startup time)
+        import shapely.wkb
 
-        data_to_return = {}
+        try:
+            data_type_to_request = params_location.data_type
 
+            data_to_return = {}
 
-        projection = get_projection(params_location.latitude, params_location.longitude)
-        location_name = params_location.location_name.replace("'", "''")
 
+            projection = get_projection(params_location.latitude, params_location.longitude)
+            location_name = params_location.location_name.replace("'", "''")
 
-        if "rpg" in data_type_to_request:
-            for year in params_location.years:
-                params = (params_location.latitude, params_location.longitude, params_location.radius, year, projection, location_name)
-                
-                response_data = await client.fetch(query_get_rpg_location, *params)
+
+            if "rpg" in data_type_to_request:
+                for year in params_location.years:
+                    params = (params_location.latitude, params_location.longitude, params_location.radius, year, projection, location_name)
                 
-                data_to_return[f"rpg-{year}"] = {
-                    f"rpg-{year}": [
-                        {
-                            **dict(record),  # Conversion en dictionnaire
-                            "geometry": str(shapely.wkb.loads(record["geometry"]))#.__geo_interface__  # Conversion en format GeoJSON
-                        } 
-                        for record in response_data
-                    ]
-                }
-
-        if "clc" in data_type_to_request:
-            for year in params_location.years:
-                params = (params_location.latitude, params_location.longitude, params_location.radius, year, projection, location_name)
-
-                response_data = await client.fetch(query_get_clc_location, *params)
-
-                data_to_return[f"clc-{year}"] = {
-                    f"clc-{year}": [
-                        {
-                            **dict(record),  # Conversion en dictionnaire
-                            "geometry": str(shapely.wkb.loads(record["geometry"]))  # Conversion en format GeoJSON
+                    with track_operation("postgres", "query_get_rpg_location") as tracker:
+                        response_data = await run_statement(client, "fetch", "query_get_rpg_location", *params)
+                        tracker.set_rows(len(response_data))
+                        tracker.set_payload_bytes(sum(len(record["geometry"]) for record in response_data))
+
+                    with track_operation("shapely", "decode_rpg_geometry") as tracker:
+                        data_to_return[f"rpg-{year}"] = {
+                            f"rpg-{year}": [
+                                {
+                                    **dict(record),  # Conversion en dictionnaire
+                                    "geometry": str(shapely.wkb.loads(record["geometry"]))#.__geo_interface__  # Conversion en format GeoJSON
+                                } 
+                                for record in response_data
+                            ]
+                        }
+                        tracker.set_rows(len(response_data))
+
+            if "clc" in data_type_to_request:
+                for year in params_location.years:
+                    params = (params_location.latitude, params_location.longitude, params_location.radius, year, projection, location_name)
+
+                    with track_operation("postgres", "query_get_clc_location") as tracker:
+                        response_data = await run_statement(client, "fetch", "query_get_clc_location", *params)
+                        tracker.set_rows(len(response_data))
+                        tracker.set_payload_bytes(sum(len(record["geometry"]) for record in response_data))
+
+                    with track_operation("shapely", "decode_clc_geometry") as tracker:
+                        data_to_return[f"clc-{year}"] = {
+                            f"clc-{year}": [
+                                {
+                                    **dict(record),  # Conversion en dictionnaire
+                                    "geometry": str(shapely.wkb.loads(record["geometry"]))  # Conversion en format GeoJSON
+                                }
+                                for record in response_data
+                            ]
                         }
-                        for record in response_data
-                    ]
-                }
-
-        if "foret_v2" in data_type_to_request:
-            # Voir instructions plus haut
-            pass
-
-            # for year in params_location.years:
-            #     params = (params_location.latitude, params_location.longitude, params_location.radius, year, projection, location_name)
-
-            #     response_data = await client.fetch(query_get_foretV2_location, *params)
-
-            #     data_to_return[f"foret_v2-{year}"] = {
-            #         f"foret_v2-{year}": [
-            #             {
-            #                 **dict(record),  # Conversion en dictionnaire
-            #                 "geometry": str(shapely.wkb.loads(record["geometry"]))  # Conversion en format GeoJSON
-            #             }
-            #             for record in response_data
-            #         ]
-            #     }
+                        tracker.set_rows(len(response_data))
+
+            if "foret_v2" in data_type_to_request:
+                # Voir instructions plus haut
+                pass
+
+                # for year in params_location.years:
+                #     params = (params_location.latitude, params_location.longitude, params_location.radius, year, projection, location_name)
+
+                #     response_data = await client.fetch(query_get_foretV2_location, *params)
+
+                #     data_to_return[f"foret_v2-{year}"] = {
+                #         f"foret_v2-{year}": [
+                #             {
+                #                 **dict(record),  # Conversion en dictionnaire
+                #                 "geometry": str(shapely.wkb.loads(record["geometry"]))  # Conversion en format GeoJSON
+                #             }
+                #             for record in response_data
+                #         ]
+                #     }
         
-        if "c1l" in data_type_to_request:
+            if "c1l" in data_type_to_request:
 
-            # Voir instructions plus haut
-            pass
+                # Voir instructions plus haut
+                pass
 
 
-        return data_to_return
\ No newline at end of file
+            return data_to_return
+        finally:
+            await client.close()
+
+
+
+async def build_missing_landcover_summaries(client, location:tuple, data_types:list, years:list, max_builds:int = None) -> tuple:
+    """
+    Build the land cover summaries not built yet for the location (one statement per data type & year)
+
+    args:
+        - client: The carto database connection (get_postgres_client)
+        - location (tuple): latitude & longitude (rounded to CARTO_SUMMARY_PRECISION decimals), radius
+        - data_types (list): rpg and / or clc
+        - years (list): The years to build
+        - max_builds (int): At most max_builds summaries are built (None: all), the others are left to maintenance/build_landcover_summary.py
+
+    returns:
+        - The number of summaries built, the (data type, year) summaries still missing
+    """
+    with track_operation("postgres", "query_get_built_summaries"):
+        built = {(record["dataset"], record["year"]) for record in await run_statement(client, "fetch", "query_get_built_summaries", *location)}
+
+    projection = get_projection(location[0], location[1])
+    missing = [(data_type, year) for data_type in data_types for year in years if (data_type, year) not in built]
+    to_build = missing if max_builds is None else missing[:max(max_builds, 0)]
+    for data_type, year in to_build:
+        with track_operation("postgres", f"query_build_{data_type}_summary"):
+            await run_statement(client, "execute", f"query_build_{data_type}_summary", [location[0]], [location[1]], location[2], year, projection)
+
+    return len(to_build), missing[len(to_build):]
+
+
+
+async def build_landcover_summaries(client, latitudes:list, longitudes:list, radius:float, data_type:str, year:int) -> None:
+    """
+    Build the land cover summaries of a batch of distinct locations, one statement per projection
+
+    args:
+        - client: The carto database connection (get_postgres_client)
+        - latitudes, longitudes (list): The locations, rounded to CARTO_SUMMARY_PRECISION decimals
+        - radius (float), data_type (str): rpg or clc, year (int)
+    """
+    for projection, indices in group_by_projection(latitudes, longitudes).items():
+        with track_operation("postgres", f"query_build_{data_type}_summary") as tracker:
+            await run_statement(client, "execute", f"query_build_{data_type}_summary",
+                                [latitudes[index] for index in indices], [longitudes[index] for index in indices], radius, year, projection)
+            tracker.set_rows(len(indices))
+
+
+
+async def get_landcover_summary_from_database(params_location:ParamsLocation, max_builds:int = None) -> tuple:
+    """
+    Return the land cover summary around the location (area & share of the buffer per RPG culture / CLC class), without geometries.
+    Summaries not built yet for the location, radius & year are built first (hive_landcover_summary), at most max_builds of them:
+    the summaries still missing are left out of the returned dictionary (not built is not the same as no land cover)
+
+    args:
+        - params_location (ParamsLocation): The location parameters (coordinates rounded to CARTO_SUMMARY_PRECISION decimals)
+        - max_builds (int): Summaries built on demand at most (None: all)
+
+    raises:
+        - CustomException: If the connection to the database or a query fails
+
+    returns:
+        - A dictionary containing the summary rows by data type & year ({"rpg-2022": [...], ...}), sorted by share
+        - The number of summaries built
+    """
+    client = await get_postgres_client(database = CARTO_DATABASE)
+
+    try:
+        location = (round(params_location.latitude, CARTO_SUMMARY_PRECISION), round(params_location.longitude, CARTO_SUMMARY_PRECISION), params_location.radius)
+        years = params_location.years or []
+        data_types = [data_type for data_type in ("rpg", "clc") if data_type in params_location.data_type]
+
+        built, not_built = await build_missing_landcover_summaries(client, location, data_types, years, max_builds)
+        data_to_return = {}
+
+        for data_type in data_types:
+            with track_operation("postgres", f"query_get_{data_type}_summary") as tracker:
+                response_data = await run_statement(client, "fetch", f"query_get_{data_type}_summary", *location, years)
+                tracker.set_rows(len(response_data))
+
+            for year in years:
+                if (data_type, year) not in not_built:
+                    data_to_return[f"{data_type}-{year}"] = [dict(record) for record in response_data if record["annee"] == year]
+
+        return data_to_return, built
+
+    except Exception as e:
+        raise CustomException(name = "Carto summary error",
+                              error_code = 500,
+                              message = f"Failed to get the land cover summary from the database: {e}")
+    finally:
+        await client.close()
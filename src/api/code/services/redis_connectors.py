@@ -2,11 +2,29 @@
 
 
 # Lib
+import logging
+import time
+from typing import Optional
+
 import redis
+import redis.asyncio
 
 
-from utils.config import REDIS_HOST, REDIS_PORT
+from utils.config import REDIS_HOST, REDIS_PORT, OBJECT_VERSION_TIMEOUT
 from utils.exceptions import CustomException
+from utils.monitoring import track_operation
+
+logger = logging.getLogger(__name__)
+
+
+
+"""
+Objects versions (per owner, per kind: locations, hives)
+- Stored in Redis to be shared by all workers, read before querying MongoDB and incremented after each write
+- A missing version is initialized from the clock, never restarting from a value clients may already hold
+"""
+OBJECT_VERSION_KEY = "object_version:{kind}:{owner}"
+object_version_client: Optional[redis.asyncio.Redis] = None
 
 
 
@@ -36,4 +54,83 @@ async def get_redis_client() -> redis.Redis:
         )
 
     else:
-        return client
\ No newline at end of file
+        return client
+
+
+
+def get_object_version_client() -> redis.asyncio.Redis:
+    """
+    Shared asyncio Redis client (with its own connection pool) for objects versions, one per worker process
+    """
+    global object_version_client
+    if object_version_client is None:
+        object_version_client = redis.asyncio.Redis(host = REDIS_HOST,
+                                                    port = REDIS_PORT,
+                                                    socket_timeout = OBJECT_VERSION_TIMEOUT,
+                                                    socket_connect_timeout = OBJECT_VERSION_TIMEOUT)
+    return object_version_client
+
+
+
+async def get_object_version(kind:str, owner) -> Optional[str]:
+    """
+    Return the current version of the owner's objects, None if Redis is unavailable (no ETag is sent)
+
+    Args:
+        - kind (str): The objects kind (locations, hives)
+        - owner (str | UUID): The owner's ID
+    """
+    key = OBJECT_VERSION_KEY.format(kind = kind, owner = owner)
+    try:
+        client = get_object_version_client()
+        with track_operation("redis", "get_object_version"):
+            version = await client.get(key)
+            if version is None:
+                await client.set(key, time.time_ns(), nx = True)
+                version = await client.get(key)
+    except Exception as e:
+        logger.warning(f"Object version unavailable ({key}): {e}")
+        return None
+    return version.decode() if version is not None else None
+
+
+
+async def bump_object_version(kind:str, owner) -> None:
+    """
+    Increment the version of the owner's objects, must be called after each write
+    If the increment fails, the version is deleted (re-seeded from the clock by the next read, newer than any sent ETag)
+    If it cannot be deleted either, the stored version would validate stale ETags: the error is raised to the write route
+
+    Args:
+        - kind (str): The objects kind (locations, hives)
+        - owner (str | UUID): The owner's ID
+
+    Raises:
+        - CustomException if the version can neither be incremented nor deleted
+    """
+    key = OBJECT_VERSION_KEY.format(kind = kind, owner = owner)
+    client = get_object_version_client()
+    try:
+        with track_operation("redis", "bump_object_version"):
+            if not await client.exists(key):
+                await client.set(key, time.time_ns(), nx = True)
+            await client.incr(key)
+    except Exception as e:
+        logger.error(f"Object version not incremented ({key}): {e}")
+        try:
+            with track_operation("redis", "delete_object_version"):
+                await client.delete(key)
+        except Exception as e:
+            raise CustomException(
+                name = "Error: Object version",
+                error_code = 500,
+                message = f"The {kind} were written but their version could not be updated, cached copies may be stale: {e}"
+            )
+
+
+
+async def close_object_version_client() -> None:
+    global object_version_client
+    if object_version_client is not None:
+        await object_version_client.aclose()
+        object_version_client = None
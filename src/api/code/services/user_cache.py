@@ -0,0 +1,168 @@
+# api/services/user_cache.py
+
+
+# Lib
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Optional
+
+import redis.asyncio
+
+from services.redis_connectors import get_object_version_client
+from utils.config import REDIS_HOST, REDIS_PORT, USER_CACHE_SIZE, USER_CACHE_TTL, USER_CACHE_REDIS_INVALIDATION
+from utils.monitoring import USER_CACHE_REQUESTS, USER_CACHE_HIT_RATIO
+
+logger = logging.getLogger(__name__)
+
+
+
+"""
+Users cache
+- Bounded LRU with TTL of the users data read on each login / profile request, keyed by kind & username:
+  secure_data (JWT claims), info_data (profile), credentials (hashed password & verified flag)
+- Invalidated by the functions updating a user (services/postgres_connectors.py), missing users are never cached
+- Per worker: with USER_CACHE_REDIS_INVALIDATION, invalidations are broadcast to the other workers & replicas (Redis pub/sub),
+  otherwise another worker may serve the previous data for at most USER_CACHE_TTL seconds
+- Credentials are only cached with USER_CACHE_REDIS_INVALIDATION: an old password or verified flag must never be accepted
+  by another worker after an update, the logins then read the database
+"""
+USER_CACHE_INVALIDATION_CHANNEL = "user_cache_invalidation"
+USER_CACHE_KINDS = ("secure_data", "info_data", "credentials")
+WORKER_ID = uuid.uuid4().hex        # Sender of the published invalidations (unique across workers & replicas)
+
+
+
+class UserCache:
+    def __init__(self, max_size: int, ttl: float, kinds: tuple = USER_CACHE_KINDS) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.kinds = kinds          # Cached kinds, the others are always read from the database
+        self.entries: OrderedDict = OrderedDict()
+        # Incremented by each invalidation: a value read from the database before an invalidation is not cached
+        self.generation = 0
+        self.hits: dict = {kind: 0 for kind in USER_CACHE_KINDS}
+        self.misses: dict = {kind: 0 for kind in USER_CACHE_KINDS}
+
+
+    def get(self, kind: str, username: str) -> Optional[Any]:
+        """
+        Return the cached value, None if it is not cached or expired
+        """
+        if kind not in self.kinds:
+            return None
+        key = (kind, username)
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] < time.monotonic():
+            del self.entries[key]
+            entry = None
+
+        if entry is None:
+            self.record(kind, hit = False)
+            return None
+
+        self.entries.move_to_end(key)
+        self.record(kind, hit = True)
+        return entry[1]
+
+
+    def set(self, kind: str, username: str, value: Any, generation: Optional[int] = None) -> None:
+        """
+        Cache a value read from the database, generation: self.generation before the read
+        """
+        if value is None or self.max_size <= 0 or kind not in self.kinds or (generation is not None and generation != self.generation):
+            return
+        key = (kind, username)
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last = False)
+
+
+    def invalidate(self, username: str) -> None:
+        self.generation += 1
+        for kind in USER_CACHE_KINDS:
+            self.entries.pop((kind, username), None)
+
+
+    def clear(self) -> None:
+        self.generation += 1
+        self.entries.clear()
+
+
+    def record(self, kind: str, hit: bool) -> None:
+        if hit:
+            self.hits[kind] += 1
+        else:
+            self.misses[kind] += 1
+        USER_CACHE_REQUESTS.labels(kind = kind, result = "hit" if hit else "miss").inc()
+        USER_CACHE_HIT_RATIO.labels(kind = kind).set(self.hits[kind] / (self.hits[kind] + self.misses[kind]))
+
+
+
+user_cache = UserCache(max_size = USER_CACHE_SIZE,
+                       ttl = USER_CACHE_TTL,
+                       kinds = USER_CACHE_KINDS if USER_CACHE_REDIS_INVALIDATION else ("secure_data", "info_data"))
+
+
+
+"""
+Invalidation
+- The local entries are removed first, then the username is published to the other workers (best effort, Redis errors are logged)
+- Each worker listens to the channel in a background task started by the lifespan hook
+"""
+async def invalidate_user(username: str) -> None:
+    user_cache.invalidate(username)
+    if not USER_CACHE_REDIS_INVALIDATION:
+        return
+    try:
+        await get_object_version_client().publish(USER_CACHE_INVALIDATION_CHANNEL, f"{WORKER_ID}:{username}")
+    except Exception as e:
+        logger.error(f"User cache invalidation not broadcast ({username}): {e}")
+
+
+
+async def listen_user_invalidations(retry_delay: float = 1.0) -> None:
+    """
+    Apply the invalidations published by the other workers, reconnect on Redis errors
+    """
+    while True:
+        client = redis.asyncio.Redis(host = REDIS_HOST, port = REDIS_PORT)
+        try:
+            async with client.pubsub() as pubsub:
+                await pubsub.subscribe(USER_CACHE_INVALIDATION_CHANNEL)
+                # Updates missed while disconnected
+                user_cache.clear()
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    sender, _, username = message["data"].decode().partition(":")
+                    if sender != WORKER_ID:
+                        user_cache.invalidate(username)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"User cache invalidation listener disconnected, retry in {retry_delay} s: {e}")
+            await asyncio.sleep(retry_delay)
+        finally:
+            await client.aclose()
+
+
+
+def start_user_invalidation_listener() -> Optional[asyncio.Task]:
+    if not USER_CACHE_REDIS_INVALIDATION:
+        return None
+    return asyncio.create_task(listen_user_invalidations())
+
+
+
+async def stop_user_invalidation_listener(task: Optional[asyncio.Task]) -> None:
+    if task is None:
+        return
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
@@ -0,0 +1,61 @@
+# api/unit_tests/main_test.py
+# export PYTHONPATH=$(pwd)
+# IMPORT_TIME_BUDGET_MS=2000 pytest unit_tests/main_test.py -s    (prints the import time report)
+
+# Suppress DeprecationWarnings from passlib and crypt (python 1.13)
+import warnings
+warnings.filterwarnings("ignore", category=DeprecationWarning, module='passlib')
+warnings.filterwarnings("ignore", category=DeprecationWarning, module='crypt')
+
+
+# Lib
+import os
+import subprocess
+import sys
+import tempfile
+
+
+
+"""
+Startup budget
+- main is imported in a fresh interpreter with -X importtime, cumulative import times are reported (slowest first)
+- Route-specific heavy dependencies must not be imported at startup, they are imported when first used
+"""
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", 2500))
+LAZY_MODULES = ["pandas", "numpy", "shapely", "openmeteo_requests", "requests_cache", "retry_requests",
+                "opentelemetry.exporter.otlp.proto.grpc.trace_exporter", "opentelemetry.sdk.trace"]
+API_CODE_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+
+def import_main() -> tuple:
+    """
+    Import main in a subprocess, return the import time report {module: cumulative ms} and the imported modules
+    """
+    env = {**os.environ, "PYTHONPATH": API_CODE_DIRECTORY}
+    env.setdefault("LIMITER_TYPE", "ip")
+    env.setdefault("DEFAULT_LIMITS_FOR_LIMITER", "60/minute")
+    env.setdefault("LOG_FILE_PATH", os.path.join(tempfile.gettempdir(), "api_import_time_test.log"))
+
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", "import sys, main; print(','.join(sys.modules))"],
+                             cwd = API_CODE_DIRECTORY, env = env, capture_output = True, text = True, timeout = 120)
+    assert process.returncode == 0, process.stderr[-2000:]
+
+    report: dict = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        report[module.strip()] = int(cumulative) / 1000
+    return report, set(process.stdout.strip().splitlines()[-1].split(","))
+
+
+
+def test_main_import_time_budget():
+    report, modules = import_main()
+    slowest = "\n".join(f"{ms:9.1f} ms  {module}" for module, ms in sorted(report.items(), key = lambda item: -item[1])[:15])
+    print(f"\nmain import: {report['main']:.1f} ms (budget {IMPORT_TIME_BUDGET_MS:.0f} ms)\n{slowest}")
+
+    eagerly_imported = [module for module in LAZY_MODULES if module in modules]
+    assert not eagerly_imported, f"imported at startup: {eagerly_imported}"
+    assert report["main"] <= IMPORT_TIME_BUDGET_MS, f"main import took {report['main']:.1f} ms\n{slowest}"
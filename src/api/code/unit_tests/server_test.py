@@ -0,0 +1,53 @@
+# api/unit_tests/server_test.py
+# export PYTHONPATH=$(pwd)
+
+
+# Lib
+import os
+import subprocess
+import sys
+import tempfile
+
+
+
+"""
+Production server
+- The Prometheus multiprocess directory is created & emptied by server.py whenever metrics are written in it,
+  checked in a fresh interpreter (prometheus_client reads PROMETHEUS_MULTIPROC_DIR when it is imported)
+"""
+API_CODE_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIRST_REQUEST_SCRIPT = """
+import server
+server.uvicorn.run = lambda *args, **kwargs: None
+server.run_server()
+
+from fastapi.testclient import TestClient
+from main import app
+client = TestClient(app)
+client.get("/")
+response = client.get("/metrics")
+assert response.status_code == 200, response.text
+print(sorted(os.listdir(os.environ["PROMETHEUS_MULTIPROC_DIR"])))
+"""
+
+
+
+def test_single_worker_with_prometheus_multiproc_dir():
+    with tempfile.TemporaryDirectory() as directory:
+        multiproc_dir = os.path.join(directory, "prometheus_multiproc")
+        os.makedirs(multiproc_dir)
+        with open(os.path.join(multiproc_dir, "counter_12345.db"), "wb") as file:     # Previous container
+            file.write(b"stale")
+
+        env = {**os.environ, "PYTHONPATH": API_CODE_DIRECTORY, "API_WORKERS": "1", "PROMETHEUS_MULTIPROC_DIR": multiproc_dir}
+        env.setdefault("LIMITER_TYPE", "ip")
+        env.setdefault("DEFAULT_LIMITS_FOR_LIMITER", "60/minute")
+        env.setdefault("LOG_FILE_PATH", os.path.join(directory, "api.log"))
+
+        process = subprocess.run([sys.executable, "-c", "import os\n" + FIRST_REQUEST_SCRIPT],
+                                 cwd = API_CODE_DIRECTORY, env = env, capture_output = True, text = True, timeout = 120)
+
+        assert process.returncode == 0, process.stderr[-2000:]
+        metrics_files = process.stdout.strip().splitlines()[-1]
+        assert "counter_12345.db" not in metrics_files
+        assert ".db" in metrics_files     # Metrics of the first request
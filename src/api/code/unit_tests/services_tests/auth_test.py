@@ -20,6 +20,16 @@ from utils.postgres_requests.user_requests import query_get_user_credentials_in_
 
 # Functions to test
 from services.auth import encode_jwt, verify_password, verify_credentials
+from services.user_cache import user_cache
+
+
+@pytest.fixture(autouse = True)
+def clear_user_cache():
+    # Users data are cached by username between calls
+    user_cache.clear()
+    yield
+    user_cache.clear()
+
 
 
 
@@ -85,6 +95,21 @@ async def test_verify_credentials_success(mock_get_postgres_client):
     mock_client.fetchrow.assert_called_once_with(query_get_user_credentials_in_database, given_username)
     mock_client.close.assert_called_once()
 
+@pytest.mark.asyncio
+@patch('services.auth.get_postgres_client')
+async def test_verify_credentials_not_cached(mock_get_postgres_client):
+    # USER_CACHE_REDIS_INVALIDATION is off: each login reads the database (password changes apply on every worker at once)
+    mock_client = AsyncMock()
+    mock_client.fetchrow.return_value = {"username": "test_user", "password": PWD_CONTEXT.hash("test_password"), "verified": True}
+    mock_get_postgres_client.return_value = mock_client
+
+    await verify_credentials("test_user", "test_password")
+    mock_client.fetchrow.return_value = {"username": "test_user", "password": PWD_CONTEXT.hash("new_password"), "verified": True}
+    with pytest.raises(CustomException):
+        await verify_credentials("test_user", "test_password")
+
+    assert mock_client.fetchrow.await_count == 2
+
 @pytest.mark.asyncio
 @patch('services.auth.get_postgres_client')
 async def test_verify_credentials_username_not_found(mock_get_postgres_client):
@@ -0,0 +1,77 @@
+# api/unit_tests/health_test.py
+# export PYTHONPATH=$(pwd)
+
+
+# Lib
+import asyncio
+import pytest
+from unittest.mock import patch, AsyncMock
+
+
+
+# Functions to test
+from services import health
+from services.health import check_dependencies, get_deep_health
+
+
+
+@pytest.fixture(autouse = True)
+def reset_health_cache():
+    health.health_cache.update({"result": None, "expires_at": 0.0})
+    health.health_lock = None
+    yield
+
+
+
+@pytest.mark.asyncio
+async def test_check_dependencies_all_up():
+    result = await check_dependencies({"a": AsyncMock(), "b": AsyncMock()}, timeout = 1)
+
+    assert result["status"] == "up"
+    assert {name: dependency["status"] for name, dependency in result["dependencies"].items()} == {"a": "up", "b": "up"}
+
+@pytest.mark.asyncio
+async def test_check_dependencies_failure_and_timeout():
+    async def slow_probe():
+        await asyncio.sleep(1)
+
+    probes = {"ok": AsyncMock(), "failing": AsyncMock(side_effect = ConnectionError("refused")), "slow": slow_probe}
+    result = await check_dependencies(probes, timeout = 0.05)
+
+    assert result["status"] == "down"
+    assert result["dependencies"]["ok"]["status"] == "up"
+    assert result["dependencies"]["failing"] == {"status": "down", "error": "ConnectionError",
+                                                 "latency_ms": result["dependencies"]["failing"]["latency_ms"]}
+    assert result["dependencies"]["slow"]["status"] == "down"
+    assert result["dependencies"]["slow"]["latency_ms"] < 500
+
+@pytest.mark.asyncio
+async def test_check_dependencies_concurrent():
+    # Probes run concurrently: total time close to the slowest probe
+    async def probe():
+        await asyncio.sleep(0.1)
+
+    loop = asyncio.get_running_loop()
+    before_time = loop.time()
+    await check_dependencies({name: probe for name in "abcd"}, timeout = 1)
+    assert loop.time() - before_time < 0.3
+
+
+@pytest.mark.asyncio
+async def test_get_deep_health_cached():
+    probe = AsyncMock()
+    with patch.dict(health.HEALTH_PROBES, {"postgres_users": probe}, clear = True):
+        results = await asyncio.gather(*(get_deep_health(ttl = 60) for _ in range(10)))
+        await get_deep_health(ttl = 60)
+
+    assert probe.await_count == 1
+    assert all(result is results[0] for result in results)
+
+@pytest.mark.asyncio
+async def test_get_deep_health_expired():
+    probe = AsyncMock()
+    with patch.dict(health.HEALTH_PROBES, {"redis": probe}, clear = True):
+        await get_deep_health(ttl = 0)
+        await get_deep_health(ttl = 0)
+
+    assert probe.await_count == 2
@@ -4,11 +4,12 @@
 # Lib
 import pytest
 import pytest_asyncio
-from unittest.mock import patch, AsyncMock
+from unittest.mock import patch, AsyncMock, MagicMock
 from uuid import uuid4
 
 from services.mongodb_connectors import get_mongodb_client, get_collection, request_user_locations, request_user_hives
-from models.user_objects_base_models import Locations
+from services.mongodb_connectors import search_user_locations, search_user_hives
+from models.user_objects_base_models import Locations, Hives
 from utils.exceptions import CustomException
 
 
@@ -30,6 +31,13 @@ async def mock_get_collection():
         yield mock_collection
 
 
+# Objects versions are tested with Redis in redis_connectors_test
+@pytest_asyncio.fixture(autouse=True)
+async def mock_bump_object_version():
+    with patch('services.mongodb_connectors.bump_object_version', new_callable=AsyncMock) as mock_bump:
+        yield mock_bump
+
+
 @pytest.mark.filterwarnings("ignore::RuntimeWarning")
 @pytest.mark.asyncio
 async def test_get_mongodb_client_success(mock_mongodb_client):
@@ -71,9 +79,84 @@ async def test_request_user_locations_put(mock_get_collection):
     assert result == {"status": "success", "message": "Location updated"}
 
 
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+@pytest.mark.asyncio
+async def test_request_user_locations_writes_position(mock_get_collection):
+    collection = mock_get_collection.return_value
+    location = Locations(owner=str(uuid4()), name="location1", latitude=45.5, longitude=4.25)
+    await request_user_locations(user_id=str(uuid4()), method="POST", location=location)
+    await request_user_locations(user_id=str(uuid4()), method="PUT", location=location)
+    position = {"type": "Point", "coordinates": [4.25, 45.5]}
+    assert collection.insert_one.call_args.args[0]["position"] == position
+    assert collection.update_one.call_args.args[1]["$set"]["position"] == position
+
+
 @pytest.mark.filterwarnings("ignore::RuntimeWarning")
 @pytest.mark.asyncio
 async def test_request_user_locations_delete(mock_get_collection):
     location = Locations(owner=str(uuid4()), name="location1", latitude=0.0, longitude=0.0)
     result = await request_user_locations(user_id=str(uuid4()), method="DELETE", location=location)
-    assert result == {"status": "success", "message": "Location deleted"}
\ No newline at end of file
+    assert result == {"status": "success", "message": "Location deleted"}
+
+
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+@pytest.mark.asyncio
+async def test_request_user_hives_version_not_updated(mock_get_collection, mock_bump_object_version):
+    mock_bump_object_version.side_effect = CustomException(name="Error: Object version", error_code=500, message="Connection refused")
+    hive = Hives(owner=uuid4(), name="hive1", location_name="location1")
+    with pytest.raises(CustomException) as exc_info:
+        await request_user_hives(user_id=str(hive.owner), method="PUT", hive=hive)
+
+    # Written, then the failure reaches the route instead of leaving a stale version
+    mock_get_collection.return_value.update_one.assert_awaited_once()
+    assert exc_info.value.name == "Error: Object version"
+
+
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+@pytest.mark.asyncio
+async def test_search_user_locations(mock_get_collection):
+    collection = MagicMock()
+    collection.create_index = AsyncMock()
+    collection.aggregate.return_value.to_list = AsyncMock(return_value=[{"_id": 1, "name": "location1", "distance": 12.5}])
+    mock_get_collection.return_value = collection
+    user_id = str(uuid4())
+    with patch("services.mongodb_connectors.geo_indexes_created", False):
+        result = await search_user_locations(user_id=user_id, latitude=45.5, longitude=4.25, max_distance=1000, skip=10, limit=5)
+    assert result == [{"_id": "1", "name": "location1", "distance": 12.5}]
+    pipeline = collection.aggregate.call_args.args[0]
+    geo_near = pipeline[0]["$geoNear"]
+    assert geo_near["near"] == {"type": "Point", "coordinates": [4.25, 45.5]}
+    assert geo_near["query"] == {"owner": user_id}
+    assert geo_near["maxDistance"] == 1000
+    assert pipeline[1:] == [{"$skip": 10}, {"$limit": 5}]
+    assert collection.create_index.await_count == 2
+
+
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+@pytest.mark.asyncio
+async def test_search_user_hives(mock_get_collection):
+    collection = MagicMock()
+    collection.create_index = AsyncMock()
+    collection.aggregate.return_value.to_list = AsyncMock(return_value=[])
+    mock_get_collection.return_value = collection
+    user_id = str(uuid4())
+    with patch("services.mongodb_connectors.geo_indexes_created", True):
+        result = await search_user_hives(user_id=user_id, latitude=45.5, longitude=4.25, max_distance=1000)
+    assert result == []
+    pipeline = collection.aggregate.call_args.args[0]
+    assert pipeline[0]["$geoNear"]["query"] == {"owner": user_id}
+    assert pipeline[1]["$lookup"]["pipeline"] == [{"$match": {"owner": user_id}}]
+    assert pipeline[-1] == {"$limit": 50}
+    collection.create_index.assert_not_awaited()
+
+
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+@pytest.mark.asyncio
+async def test_search_user_locations_failure(mock_get_collection):
+    collection = MagicMock()
+    collection.aggregate.side_effect = Exception("index not found")
+    mock_get_collection.return_value = collection
+    with patch("services.mongodb_connectors.geo_indexes_created", True):
+        with pytest.raises(CustomException) as exc_info:
+            await search_user_locations(user_id=str(uuid4()), latitude=45.5, longitude=4.25, max_distance=1000)
+    assert exc_info.value.message == "Failed to search the locations: index not found"
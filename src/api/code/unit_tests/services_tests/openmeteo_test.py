@@ -0,0 +1,60 @@
+# api/unit_tests/openmeteo_test.py
+# export PYTHONPATH=$(pwd)
+
+
+# Lib
+import pytest
+from openmeteo_sdk.WeatherApiResponse import WeatherApiResponse
+
+from load_tests.fake_openmeteo import build_response_from_params
+from models.weather_base_models import WeatherRequest
+from utils.config import forecast_url, historical_forecast_url, params_current_weather, params_daily_weather, params_hourly_weather
+
+
+
+# Functions to test
+from services.openmeteo import build_openmeteo_params, transform_openmeteoapi_response
+
+
+
+def parse_response(body: bytes) -> WeatherApiResponse:
+    # Size prefixed flatbuffer, as split by openmeteo_requests
+    return WeatherApiResponse.GetRootAs(body, 4)
+
+
+def test_build_openmeteo_params_forecast():
+    url, params = build_openmeteo_params(WeatherRequest(latitude = 48.85, longitude = 2.35, request_type = "forecast", past_days = 7, forecast_days = 7))
+
+    assert url == forecast_url
+    assert params["current"] == params_current_weather
+    assert (params["past_days"], params["forecast_days"]) == (7, 7)
+    assert "start_date" not in params
+
+def test_build_openmeteo_params_archive():
+    url, params = build_openmeteo_params(WeatherRequest(latitude = 48.85, longitude = 2.35, request_type = "archive",
+                                                        start_date = "2024-04-01", end_date = "2024-06-30"))
+
+    assert url == historical_forecast_url
+    assert "current" not in params
+    assert (str(params["start_date"]), str(params["end_date"])) == ("2024-04-01", "2024-06-30")
+
+
+@pytest.mark.parametrize("request_params, days", [
+    ({"request_type": "forecast", "past_days": 7, "forecast_days": 7}, 14),
+    ({"request_type": "archive", "start_date": "2024-04-01", "end_date": "2024-06-30"}, 91),
+])
+def test_transform_openmeteoapi_response_fake(request_params, days):
+    # The load test OpenMeteo fake must build responses the API can transform
+    user_params = WeatherRequest(latitude = 48.85, longitude = 2.35, **request_params)
+    _, params = build_openmeteo_params(user_params)
+    params = {**params, "start_date": str(params.get("start_date")), "end_date": str(params.get("end_date"))}
+
+    response = parse_response(build_response_from_params(params, historical = user_params.request_type == "archive"))
+    *current, daily_data, hourly_data = transform_openmeteoapi_response(response, user_params)
+
+    assert len(daily_data["date"]) == days
+    assert len(hourly_data["date"]) == days * 24
+    assert all(len(daily_data[elt]) == days for elt in params_daily_weather)
+    assert all(len(hourly_data[elt]) == days * 24 for elt in params_hourly_weather)
+    if user_params.request_type == "forecast":
+        assert set(current[0]) == {f"current_{elt}" for elt in params_current_weather}
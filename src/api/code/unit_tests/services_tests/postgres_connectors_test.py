@@ -10,7 +10,7 @@ warnings.filterwarnings("ignore", category=DeprecationWarning, module='crypt')
 # Lib
 import asyncpg
 import pytest
-from unittest.mock import patch, AsyncMock
+from unittest.mock import patch, AsyncMock, MagicMock
 
 from models.users_base_models import Password
 from utils.exceptions import CustomException
@@ -20,6 +20,16 @@ from utils.postgres_requests.user_requests import query_get_user_secure_data, qu
 
 # Functions to test
 from services.postgres_connectors import get_postgres_client, get_user_data_from_database, get_user_info_data, query_update_user_info_data, update_user_info_data, check_if_user_exists_in_database, force_verified_user_to_true, update_user_password, update_user_last_login
+from services.user_cache import user_cache
+
+
+@pytest.fixture(autouse = True)
+def clear_user_cache():
+    # Users data are cached by username between calls
+    user_cache.clear()
+    yield
+    user_cache.clear()
+
 
 
 
@@ -152,19 +162,32 @@ async def test_get_user_info_data_success():
 async def test_update_user_info_data_success():
     user_id_to_update = "test_user_id"
     info_to_update = {
-        "role": "user",
-        "last_login": "2023-01-04"
+        "city": "Paris",
+        "phone": "0102030405"
     }
     
     with patch('services.postgres_connectors.get_postgres_client', new_callable=AsyncMock) as mock_get_client:
         mock_client = AsyncMock()
-        mock_client.fetchrow.return_value = None  # Simulate successful update
+        mock_client.fetchval.return_value = "test_user"  # Simulate successful update (updated username)
         mock_get_client.return_value = mock_client
+        user_cache.set("info_data", "test_user", {"city": "Lyon"})
         
         await update_user_info_data(user_id_to_update, info_to_update)
         
-        mock_client.fetchrow.assert_called_once_with(query_update_user_info_data(user_id_to_update, info_to_update))
+        # Parameterized statement, missing informations are NULL (current value kept)
+        mock_client.fetchval.assert_called_once_with(query_update_user_info_data, user_id_to_update, None, None, "Paris", None, "0102030405", None)
         mock_client.close.assert_called_once()
+        assert user_cache.get("info_data", "test_user") is None
+
+
+@pytest.mark.asyncio
+async def test_update_user_info_data_unknown_field():
+    with patch('services.postgres_connectors.get_postgres_client', new_callable=AsyncMock) as mock_get_client:
+        with pytest.raises(CustomException) as exc_info:
+            await update_user_info_data("test_user_id", {"city": "Paris", "role = 1; --": "x"})
+
+    assert exc_info.value.error_code == 422
+    mock_get_client.assert_not_called()
 
 
 @pytest.mark.asyncio
@@ -254,4 +277,260 @@ async def test_update_user_last_login_failure():
         assert exc_info.value.name == 'User last login error'
         assert exc_info.value.error_code == 500
         assert "Failed to update user last login date in the database: Database error" in exc_info.value.message
-        mock_client.close.assert_called_once()
\ No newline at end of file
+        mock_client.close.assert_called_once()
+
+
+# Connection pools
+from services.postgres_connectors import PooledConnection, postgres_pools
+
+
+@pytest.mark.asyncio
+async def test_get_postgres_client_uses_worker_pool():
+    mock_pool = AsyncMock()
+    mock_connection = AsyncMock()
+    mock_pool.acquire.return_value = mock_connection
+
+    with patch.dict(postgres_pools, {"test_db": mock_pool}), \
+         patch('asyncpg.connect', new_callable=AsyncMock) as mock_connect:
+        client = await get_postgres_client("test_db")
+        await client.fetchrow("SELECT 1")
+        await client.close()
+        await client.close()
+
+    mock_connect.assert_not_called()
+    mock_connection.fetchrow.assert_awaited_once_with("SELECT 1")
+    mock_connection.close.assert_not_called()
+    mock_pool.release.assert_awaited_once_with(mock_connection)
+
+
+@pytest.mark.asyncio
+async def test_get_user_info_data_releases_connection_on_error():
+    mock_client = AsyncMock()
+    mock_client.fetchrow.side_effect = asyncpg.PostgresError("query error")
+
+    with patch('services.postgres_connectors.get_postgres_client', new_callable=AsyncMock) as mock_get_client:
+        mock_get_client.return_value = mock_client
+        with pytest.raises(asyncpg.PostgresError):
+            await get_user_info_data("test_user")
+
+    mock_client.close.assert_awaited_once()
+
+
+
+# Statements registry
+from services.postgres_connectors import get_statements_preparer, run_statement, StatementWarmupRollback
+from utils.postgres_requests.statements import statements
+
+
+@pytest.mark.asyncio
+async def test_statements_prepared_on_pooled_connection():
+    async def execute(query, *args):
+        if query == "bad":
+            raise asyncpg.UndefinedTableError("missing table")
+        if query.startswith("INSERT"):
+            raise asyncpg.NotNullViolationError("null value")
+        return "SELECT 0"
+
+    mock_connection = AsyncMock()
+    mock_connection.execute.side_effect = execute
+    mock_connection.transaction = MagicMock()
+    mock_connection.transaction.return_value.__aexit__.return_value = False
+
+    await get_statements_preparer({"ok": "SELECT $1", "insert": "INSERT INTO t VALUES ($1, $2)", "missing": "bad"})(mock_connection)
+
+    # Executed by query text (asyncpg statement cache) with NULL params, each one in a rolled back transaction
+    mock_connection.execute.assert_any_await("SELECT $1", None)
+    mock_connection.execute.assert_any_await("INSERT INTO t VALUES ($1, $2)", None, None)
+    assert mock_connection.transaction.return_value.__aexit__.await_count == 3
+    assert mock_connection.transaction.return_value.__aexit__.await_args_list[0].args[0] is StatementWarmupRollback
+    mock_connection.prepare.assert_not_called()
+    assert mock_connection.warmed_statements == {"ok", "insert"}
+
+
+@pytest.mark.asyncio
+async def test_run_statement_warmed_and_text():
+    from utils.monitoring import POSTGRES_STATEMENT_EXECUTIONS
+
+    pooled_client = AsyncMock()
+    pooled_client.warmed_statements = {"query_get_username"}
+    pooled_client.fetchrow.return_value = {"username": "test_user"}
+    dedicated_client = AsyncMock()
+
+    def executions(warmed):
+        return POSTGRES_STATEMENT_EXECUTIONS.labels(statement = "query_get_username", warmed = warmed)._value.get()
+    before = executions("true"), executions("false")
+
+    assert await run_statement(pooled_client, "fetchrow", "query_get_username", "test_user") == {"username": "test_user"}
+    await run_statement(dedicated_client, "fetchrow", "query_get_username", "test_user")
+
+    pooled_client.fetchrow.assert_awaited_once_with(statements["query_get_username"], "test_user")
+    dedicated_client.fetchrow.assert_awaited_once_with(statements["query_get_username"], "test_user")
+    assert (executions("true"), executions("false")) == (before[0] + 1, before[1] + 1)
+
+
+# Registration & bulk import
+from models.users_base_models import User
+from services.postgres_connectors import register_user_in_database, import_users_in_database
+from utils.postgres_requests.user_requests import query_register_user
+
+
+def make_user(index: int) -> User:
+    return User(username = f"beekeeper_{index:04d}", password = Password(password = "Password1!"), email = f"beekeeper_{index:04d}@example.com")
+
+
+@pytest.mark.asyncio
+async def test_register_user_in_database_single_statement():
+    new_user = make_user(0)
+    mock_client = AsyncMock()
+
+    with patch('services.postgres_connectors.get_postgres_client', new_callable=AsyncMock, return_value=mock_client), \
+         patch('services.postgres_connectors.hash_string', return_value="hashed"):
+        await register_user_in_database(new_user)
+
+    # users, user_infos & user_logs rows in one round trip
+    mock_client.execute.assert_awaited_once_with(query_register_user, new_user._id, "beekeeper_0000", "hashed", 1, False, "beekeeper_0000@example.com",
+                                                 new_user._created_at, new_user._updated_at, new_user._last_login)
+    mock_client.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_register_user_in_database_concurrent_registration():
+    mock_client = AsyncMock()
+    mock_client.execute.side_effect = asyncpg.UniqueViolationError("duplicate key")
+
+    with patch('services.postgres_connectors.get_postgres_client', new_callable=AsyncMock, return_value=mock_client), \
+         patch('services.postgres_connectors.hash_string', return_value="hashed"):
+        with pytest.raises(CustomException) as exc_info:
+            await register_user_in_database(make_user(0))
+
+    assert exc_info.value.error_code == 409
+    mock_client.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_import_users_in_database_copy():
+    new_users = [make_user(index) for index in range(3)]
+    mock_client = AsyncMock()
+    mock_client.transaction = MagicMock()
+    mock_client.fetch.return_value = []
+
+    with patch('services.postgres_connectors.get_postgres_client', new_callable=AsyncMock, return_value=mock_client), \
+         patch('services.postgres_connectors.hash_string', side_effect=lambda password: f"hashed {password}"):
+        imported_users = await import_users_in_database(new_users, verified = True)
+
+    assert imported_users == 3
+    mock_client.transaction.return_value.__aenter__.assert_awaited_once()
+    copied_tables = {call.args[0]: call.kwargs["records"] for call in mock_client.copy_records_to_table.await_args_list}
+    assert list(copied_tables) == ["users", "user_infos", "user_logs"]
+    assert copied_tables["users"][1] == (new_users[1]._id, "beekeeper_0001", "hashed Password1!", 1, True)
+    assert copied_tables["user_infos"][2] == (new_users[2]._id, "beekeeper_0002@example.com")
+    mock_client.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_import_users_in_database_existing_usernames():
+    mock_client = AsyncMock()
+    mock_client.transaction = MagicMock()
+    mock_client.fetch.return_value = [{"username": "beekeeper_0001"}]
+
+    with patch('services.postgres_connectors.get_postgres_client', new_callable=AsyncMock, return_value=mock_client), \
+         patch('services.postgres_connectors.hash_string', return_value="hashed"):
+        with pytest.raises(CustomException) as exc_info:
+            await import_users_in_database([make_user(index) for index in range(3)])
+
+    assert exc_info.value.error_code == 409
+    assert "beekeeper_0001" in exc_info.value.message
+    mock_client.copy_records_to_table.assert_not_called()
+    mock_client.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_import_users_in_database_duplicated_usernames():
+    with patch('services.postgres_connectors.get_postgres_client', new_callable=AsyncMock) as mock_get_client:
+        with pytest.raises(CustomException) as exc_info:
+            await import_users_in_database([make_user(1), make_user(2), make_user(1)])
+
+    assert exc_info.value.error_code == 422
+    mock_get_client.assert_not_called()
+
+
+# Users cache
+@pytest.mark.asyncio
+async def test_get_user_info_data_cached():
+    mock_client = AsyncMock()
+    mock_client.fetchrow.return_value = {"username": "test_user", "city": "Paris"}
+
+    with patch('services.postgres_connectors.get_postgres_client', new_callable=AsyncMock, return_value=mock_client) as mock_get_client:
+        assert await get_user_info_data("test_user") == {"username": "test_user", "city": "Paris"}
+        assert await get_user_info_data("test_user") == {"username": "test_user", "city": "Paris"}
+        assert mock_get_client.await_count == 1
+
+        # Invalidated by the user updates
+        await force_verified_user_to_true("test_user")
+        await get_user_info_data("test_user")
+        assert mock_get_client.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_get_user_data_from_database_not_cached_when_invalidated_during_read():
+    mock_client = AsyncMock()
+
+    async def fetchrow(query, username):
+        # Password updated by another request while the row is read
+        user_cache.invalidate(username)
+        return {"username": username, "role_name": "basic"}
+
+    mock_client.fetchrow.side_effect = fetchrow
+
+    with patch('services.postgres_connectors.get_postgres_client', new_callable=AsyncMock, return_value=mock_client):
+        await get_user_data_from_database("test_user")
+
+    assert user_cache.get("secure_data", "test_user") is None
+
+
+
+# Land cover summaries
+from models.params_emplacements_base_model import ParamsLocation
+from services.postgres_connectors import get_landcover_summary_from_database
+
+
+@pytest.mark.asyncio
+async def test_get_landcover_summary_builds_missing_summaries_only():
+    async def fetch(query, *args):
+        if query == statements["query_get_built_summaries"]:
+            return [{"dataset": "rpg", "year": 2022}]
+        if query == statements["query_get_rpg_summary"]:
+            return [{"annee": 2022, "code_culture": "CZH", "aire": 12.5, "aire_bio": 0.0, "part": 0.16}]
+        return []
+
+    mock_client = AsyncMock()
+    mock_client.fetch.side_effect = fetch
+    location = ParamsLocation(latitude = 45.1234567, longitude = 4.1234567, data_type = ["rpg", "clc"], years = [2022], radius = 500)
+
+    with patch('services.postgres_connectors.get_postgres_client', new_callable=AsyncMock) as mock_get_client:
+        mock_get_client.return_value = mock_client
+        summary, built = await get_landcover_summary_from_database(location)
+
+    # Only the CLC summary is built, on the rounded location
+    mock_client.execute.assert_awaited_once_with(statements["query_build_clc_summary"], [45.12346], [4.12346], 500, 2022, 2154)
+    assert summary == {"rpg-2022": [{"annee": 2022, "code_culture": "CZH", "aire": 12.5, "aire_bio": 0.0, "part": 0.16}], "clc-2022": []}
+    assert built == 1
+    mock_client.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_get_landcover_summary_max_builds():
+    mock_client = AsyncMock()
+    mock_client.fetch.return_value = []
+    location = ParamsLocation(latitude = 45.1234567, longitude = 4.1234567, data_type = ["rpg", "clc"], years = [2021, 2022], radius = 500)
+
+    with patch('services.postgres_connectors.get_postgres_client', new_callable=AsyncMock) as mock_get_client:
+        mock_get_client.return_value = mock_client
+        summary, built = await get_landcover_summary_from_database(location, max_builds = 1)
+        assert mock_client.execute.await_count == 1
+        no_build_summary, no_build = await get_landcover_summary_from_database(location, max_builds = 0)
+
+    # Summaries not built are left out (not built is not the same as an empty summary)
+    assert (built, list(summary)) == (1, ["rpg-2021"])
+    assert (no_build, no_build_summary) == (0, {})
+    assert mock_client.execute.await_count == 1
@@ -41,4 +41,64 @@ async def test_get_redis_client_failure():
 
         assert exc_info.value.name == "Error: Redis connection"
         assert exc_info.value.error_code == 500
-        assert "Failed to connect to the Redis database: Connection error" in exc_info.value.message
\ No newline at end of file
+        assert "Failed to connect to the Redis database: Connection error" in exc_info.value.message
+
+
+# Objects versions
+from services.redis_connectors import get_object_version, bump_object_version
+from unittest.mock import AsyncMock
+
+
+@pytest.mark.asyncio
+async def test_get_object_version_initializes_missing_version():
+    mock_client = AsyncMock()
+    mock_client.get.side_effect = [None, b"1700000000000000000"]
+    with patch('services.redis_connectors.get_object_version_client', return_value=mock_client):
+        version = await get_object_version("hives", "owner_id")
+
+    assert version == "1700000000000000000"
+    mock_client.set.assert_awaited_once()
+    assert mock_client.set.call_args.kwargs == {"nx": True}
+
+
+@pytest.mark.asyncio
+async def test_get_object_version_redis_unavailable():
+    mock_client = AsyncMock()
+    mock_client.get.side_effect = ConnectionError("Connection refused")
+    with patch('services.redis_connectors.get_object_version_client', return_value=mock_client):
+        assert await get_object_version("hives", "owner_id") is None
+
+
+@pytest.mark.asyncio
+async def test_bump_object_version():
+    mock_client = AsyncMock()
+    mock_client.exists.return_value = 1
+    with patch('services.redis_connectors.get_object_version_client', return_value=mock_client):
+        await bump_object_version("locations", "owner_id")
+
+    mock_client.incr.assert_awaited_once_with("object_version:locations:owner_id")
+    mock_client.set.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_bump_object_version_failure_deletes_version():
+    mock_client = AsyncMock()
+    mock_client.exists.return_value = 1
+    mock_client.incr.side_effect = TimeoutError("Timeout reading from socket")
+    with patch('services.redis_connectors.get_object_version_client', return_value=mock_client):
+        await bump_object_version("locations", "owner_id")
+
+    # Re-seeded from the clock by the next read
+    mock_client.delete.assert_awaited_once_with("object_version:locations:owner_id")
+
+
+@pytest.mark.asyncio
+async def test_bump_object_version_redis_unavailable():
+    mock_client = AsyncMock()
+    mock_client.exists.side_effect = ConnectionError("Connection refused")
+    mock_client.delete.side_effect = ConnectionError("Connection refused")
+    with patch('services.redis_connectors.get_object_version_client', return_value=mock_client):
+        with pytest.raises(CustomException) as exc_info:
+            await bump_object_version("locations", "owner_id")
+
+    assert exc_info.value.name == "Error: Object version"
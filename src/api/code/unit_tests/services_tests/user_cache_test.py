@@ -0,0 +1,80 @@
+# api/unit_tests/user_cache_test.py
+# export PYTHONPATH=$(pwd)
+
+
+# Lib
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+
+
+
+# Functions to test
+from services import user_cache as user_cache_module
+from services.user_cache import UserCache, WORKER_ID, invalidate_user, user_cache
+
+
+
+def test_user_cache_ttl_and_lru():
+    cache = UserCache(max_size = 2, ttl = 60)
+    cache.set("info_data", "alice", {"city": "Paris"})
+    cache.set("info_data", "bob", {"city": "Lyon"})
+    assert cache.get("info_data", "alice") == {"city": "Paris"}
+
+    # bob is the least recently used entry
+    cache.set("info_data", "carol", {"city": "Lille"})
+    assert cache.get("info_data", "bob") is None
+    assert cache.get("info_data", "carol") == {"city": "Lille"}
+
+    expired_cache = UserCache(max_size = 2, ttl = -1)
+    expired_cache.set("info_data", "alice", {"city": "Paris"})
+    assert expired_cache.get("info_data", "alice") is None
+    assert not expired_cache.entries
+
+
+def test_user_cache_invalidate_and_hit_ratio():
+    cache = UserCache(max_size = 10, ttl = 60)
+    cache.set("secure_data", "alice", {"role_name": "basic"})
+    cache.set("credentials", "alice", {"verified": False})
+    cache.set("info_data", "alice", None)          # Missing users are not cached
+    generation = cache.generation
+
+    assert cache.get("secure_data", "alice") == {"role_name": "basic"}
+    cache.invalidate("alice")
+    assert cache.get("credentials", "alice") is None
+    assert cache.get("info_data", "alice") is None
+
+    # Read before the invalidation: not cached
+    cache.set("secure_data", "alice", {"role_name": "basic"}, generation = generation)
+    assert cache.get("secure_data", "alice") is None
+
+    assert cache.hits == {"secure_data": 1, "info_data": 0, "credentials": 0}
+    assert cache.misses == {"secure_data": 1, "info_data": 1, "credentials": 1}
+
+
+def test_user_cache_bypassed_kinds():
+    cache = UserCache(max_size = 10, ttl = 60, kinds = ("secure_data", "info_data"))
+    cache.set("credentials", "alice", {"verified": True})
+    assert cache.get("credentials", "alice") is None
+    assert not cache.entries
+    assert cache.misses["credentials"] == 0
+
+
+def test_credentials_not_cached_without_redis_invalidation():
+    # Workers would accept an old password until the TTL expires
+    assert not user_cache_module.USER_CACHE_REDIS_INVALIDATION
+    assert "credentials" not in user_cache.kinds
+
+
+@pytest.mark.asyncio
+async def test_invalidate_user_broadcast():
+    mock_client = MagicMock()
+    mock_client.publish = AsyncMock(side_effect = ConnectionError("Redis down"))
+    user_cache.set("info_data", "alice", {"city": "Paris"})
+
+    with patch.object(user_cache_module, "USER_CACHE_REDIS_INVALIDATION", True), \
+         patch.object(user_cache_module, "get_object_version_client", return_value = mock_client):
+        # Redis errors are logged, the local entries are removed
+        await invalidate_user("alice")
+
+    mock_client.publish.assert_awaited_once_with("user_cache_invalidation", f"{WORKER_ID}:alice")
+    assert user_cache.get("info_data", "alice") is None
@@ -0,0 +1,66 @@
+# api/unit_tests/utils_tests/carto_preparation_requests_test.py
+# export PYTHONPATH=$(pwd)
+
+
+# Lib
+import re
+import pytest
+
+from utils.common_functions import get_projection
+
+
+
+# Functions to test
+from utils.postgres_requests.carto_preparation_requests import carto_srids, query_create_carto_srid_function, query_create_staging_srid_partition, query_insert_prepared_year
+from utils.postgres_requests.carto_preparation_requests import query_add_staging_year_check, query_attach_year
+
+
+
+def carto_srid(lat: float, lon: float) -> int:
+    """
+    Evaluate the SQL carto_srid function (CASE WHEN <conditions> THEN <srid> ... ELSE <srid> END)
+    """
+    for conditions, srid in re.findall(r"WHEN (.+?) THEN (\d+)", query_create_carto_srid_function):
+        if eval(conditions.replace(" AND ", " and "), {}, {"lat": lat, "lon": lon}):
+            return int(srid)
+    return int(re.search(r"ELSE (\d+)", query_create_carto_srid_function).group(1))
+
+
+@pytest.mark.parametrize("lat, lon", [
+    (48.8566, 2.3522),      # Metropole
+    (-21.1, 55.5),          # Reunion
+    (14.6, -61.0),          # Martinique
+    (16.2, -61.5),          # Guadeloupe
+    (4.9, -52.3),           # Guyane
+    (-12.8, 45.1),          # Mayotte
+    (60.0, 20.0),           # Outside the territories
+])
+def test_carto_srid_matches_get_projection(lat, lon):
+    # Geometries must be prepared in the SRID the API requests for the same location
+    assert carto_srid(lat, lon) == get_projection(lat, lon)
+
+
+def test_carto_srids_are_all_partitioned():
+    # A SRID without subpartition would make the insert of its geometries fail
+    assert set(carto_srids) == {int(srid) for srid in re.findall(r"(?:THEN|ELSE) (\d+)", query_create_carto_srid_function)}
+
+
+def test_query_create_staging_srid_partition():
+    query = query_create_staging_srid_partition("rpg", 2023, 2154)
+
+    assert query == "CREATE TABLE registre_parcellaire_graphique_prepared_2023_staging_2154 PARTITION OF registre_parcellaire_graphique_prepared_2023_staging FOR VALUES IN (2154);"
+    with pytest.raises(ValueError):
+        query_create_staging_srid_partition("rpg", "2023; DROP TABLE users", 2154)
+
+
+def test_staging_check_matches_partition_bound():
+    # The check constraint must imply the bound, otherwise ATTACH PARTITION scans the whole year under lock
+    assert "CHECK (annee_clc IS NOT NULL AND annee_clc = 2018)" in query_add_staging_year_check("clc", 2018)
+    assert query_attach_year("clc", 2018) == "ALTER TABLE corine_land_cover_prepared ATTACH PARTITION corine_land_cover_prepared_2018 FOR VALUES IN (2018);"
+
+
+def test_query_insert_prepared_year():
+    query = query_insert_prepared_year("clc", 2018)
+
+    assert query.startswith("INSERT INTO corine_land_cover_prepared_2018_staging (code_18, annee_clc, srid, geometry)")
+    assert "WHERE s.annee_clc = $1" in query
@@ -12,7 +12,16 @@ import jwt
 import pytest
 from unittest.mock import MagicMock, patch
 
-from utils.common_functions import hash_string, get_current_user
+from fastapi import Depends, FastAPI, Request
+from fastapi.testclient import TestClient
+
+# The limiter key function is chosen at import, make sure it has one (the user key function is tested)
+import utils.config
+utils.config.LIMITER_TYPE = utils.config.LIMITER_TYPE or "user"
+
+from utils.common_functions import hash_string, get_current_user, get_jwt_token, verified_tokens_cache
+from utils.decorators import require_role
+from utils.limiter import limiter
 from utils.config import PWD_CONTEXT, JWT_SECRET_KEY, ENCODING_ALGORITHM, PWD_CONTEXT
 from utils.exceptions import CustomException
 
@@ -58,4 +67,108 @@ def test_get_current_user_invalid_token(invalid_token):
             get_current_user(token=invalid_token)
         assert excinfo.value.name == 'Auth_token_error'
         assert excinfo.value.error_code == 500
-        assert excinfo.value.message == "Invalid token"
\ No newline at end of file
+        assert excinfo.value.message == "Invalid token"
+
+
+
+# Single decode per request
+@pytest.fixture
+def claims_app():
+    app = FastAPI()
+    app.state.limiter = limiter
+
+    @app.get("/secured")
+    @limiter.limit("100/minute", key_func = get_jwt_token)
+    @require_role(role = "admin")
+    def get_secured(request: Request, JWT_TOKEN: dict = Depends(get_current_user)):
+        return {"limiter_key": get_jwt_token(request), "username": JWT_TOKEN["username"]}
+
+    return app
+
+
+@pytest.fixture
+def admin_token():
+    return jwt.encode({"id": "user_id", "username": "test_admin", "role_name": "admin"}, JWT_SECRET_KEY, algorithm=ENCODING_ALGORITHM)
+
+
+def test_one_verification_per_request(claims_app, admin_token):
+    verified_tokens_cache.clear()
+    client = TestClient(claims_app)
+    with patch('utils.common_functions.jwt.decode', wraps=jwt.decode) as mock_decode:
+        response = client.get("/secured", headers={"Authorization": f"Bearer {admin_token}"})
+
+    assert response.status_code == 200
+    assert response.json() == {"limiter_key": "user_id", "username": "test_admin"}
+    assert mock_decode.call_count == 1
+
+
+def test_verified_token_is_reused_across_requests(claims_app, admin_token):
+    verified_tokens_cache.clear()
+    client = TestClient(claims_app)
+    with patch('utils.common_functions.jwt.decode', wraps=jwt.decode) as mock_decode:
+        for _ in range(3):
+            response = client.get("/secured", headers={"Authorization": f"Bearer {admin_token}"})
+            assert response.status_code == 200
+
+    assert mock_decode.call_count == 1
+
+
+def test_tampered_token_with_cached_signature_is_verified(admin_token):
+    verified_tokens_cache.clear()
+    get_current_user(token=admin_token)
+
+    header, _, signature = admin_token.split(".")
+    forged_payload = jwt.encode({"id": "user_id", "username": "test_admin", "role_name": "superadmin"}, "other_key", algorithm=ENCODING_ALGORITHM).split(".")[1]
+    with pytest.raises(CustomException) as excinfo:
+        get_current_user(token=f"{header}.{forged_payload}.{signature}")
+    assert excinfo.value.name == 'Auth_token_error'
+
+
+
+# Batch projections
+import numpy as np
+
+from utils.common_functions import get_projection, get_projections, group_by_projection, PROJECTION_BOUNDING_BOXES
+
+
+def territories_grid() -> tuple:
+    """
+    Coordinates on, inside & around each territory bounding box edges, plus random points worldwide
+    """
+    latitudes, longitudes = [], []
+    for lat_min, lat_max, lon_min, lon_max, _ in PROJECTION_BOUNDING_BOXES:
+        lats = np.concatenate([np.linspace(lat_min - 0.5, lat_max + 0.5, 41), [lat_min, lat_max]])
+        lons = np.concatenate([np.linspace(lon_min - 0.5, lon_max + 0.5, 41), [lon_min, lon_max]])
+        grid_lats, grid_lons = np.meshgrid(lats, lons)
+        latitudes.append(grid_lats.ravel())
+        longitudes.append(grid_lons.ravel())
+    rng = np.random.default_rng(0)
+    latitudes.append(rng.uniform(-90, 90, 5000))
+    longitudes.append(rng.uniform(-180, 180, 5000))
+    return np.concatenate(latitudes), np.concatenate(longitudes)
+
+
+def test_get_projections_matches_get_projection():
+    latitudes, longitudes = territories_grid()
+
+    srids = get_projections(latitudes, longitudes)
+
+    assert srids.tolist() == [get_projection(lat, lon) for lat, lon in zip(latitudes.tolist(), longitudes.tolist())]
+    assert set(srids.tolist()) == {2154, 2972, 2975, 4471, 5490}
+
+
+def test_get_projections_edge_cases():
+    # Lists, empty batches & NaN (no territory matches) behave as the scalar version
+    assert get_projections([48.85], [2.35]).tolist() == [2154]
+    assert get_projections([], []).tolist() == []
+    assert get_projections([np.nan, -21.1], [55.5, np.nan]).tolist() == [get_projection(np.nan, 55.5), get_projection(-21.1, np.nan)]
+
+
+def test_group_by_projection():
+    latitudes = [48.85, -21.1, 14.6, 45.76, 16.2, 4.9]
+    longitudes = [2.35, 55.5, -61.0, 4.83, -61.5, -52.3]
+
+    groups = group_by_projection(latitudes, longitudes)
+
+    assert {srid: indices.tolist() for srid, indices in groups.items()} == {2154: [0, 3], 2972: [5], 2975: [1], 5490: [2, 4]}
+    assert group_by_projection([], []) == {}
@@ -0,0 +1,189 @@
+# api/unit_tests/utils_tests/compression_test.py
+# export PYTHONPATH=$(pwd)
+
+# Suppress DeprecationWarnings from passlib and crypt (python 1.13)
+import warnings
+warnings.filterwarnings("ignore", category=DeprecationWarning, module='passlib')
+warnings.filterwarnings("ignore", category=DeprecationWarning, module='crypt')
+
+
+# Lib
+import gzip
+import pytest
+import threading
+from fastapi import FastAPI
+from fastapi.responses import Response
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+
+from utils.compression import CompressedResponseCache, CompressionMiddleware, negotiate_encoding
+
+
+
+# Negotiation
+def test_negotiate_encoding_prefers_server_order():
+    assert negotiate_encoding("gzip, deflate, br, zstd") == "br"
+
+def test_negotiate_encoding_respects_quality():
+    assert negotiate_encoding("br;q=0.5, gzip;q=1.0") == "gzip"
+
+def test_negotiate_encoding_refused():
+    assert negotiate_encoding("br;q=0, zstd;q=0, gzip;q=0") is None
+    assert negotiate_encoding("identity") is None
+    assert negotiate_encoding(None) is None
+
+def test_negotiate_encoding_wildcard():
+    assert negotiate_encoding("*") == "br"
+
+
+
+# Middleware
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size = 100)
+
+    @app.get("/large")
+    def get_large():
+        return {"data": "x" * 1000}
+
+    @app.get("/small")
+    def get_small():
+        return {"data": "x"}
+
+    @app.get("/binary")
+    def get_binary():
+        return Response(content = b"x" * 1000, media_type = "application/octet-stream")
+
+    @app.get("/etag")
+    def get_etag():
+        return Response(content = b"x" * 1000, media_type = "application/json", headers = {"ETag": '"abc"'})
+
+    @app.get("/weak_etag")
+    def get_weak_etag():
+        return Response(content = b"x" * 1000, media_type = "application/json", headers = {"ETag": 'W/"hives-42"'})
+
+    @app.get("/encoded")
+    def get_encoded():
+        return Response(content = gzip.compress(b"x" * 1000), media_type = "application/json", headers = {"Content-Encoding": "gzip"})
+
+    return TestClient(app)
+
+
+def test_middleware_compresses_large_json(client):
+    response = client.get("/large", headers = {"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.json() == {"data": "x" * 1000}
+
+def test_middleware_skips_small_responses(client):
+    response = client.get("/small", headers = {"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+def test_middleware_skips_not_allowed_content_types(client):
+    response = client.get("/binary", headers = {"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+def test_middleware_does_not_recompress(client):
+    response = client.get("/encoded", headers = {"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.content == b"x" * 1000
+
+
+def test_middleware_encoding_specific_etag(client):
+    assert client.get("/etag", headers = {"Accept-Encoding": "gzip"}).headers["etag"] == '"abc-gzip"'
+    assert client.get("/etag", headers = {"Accept-Encoding": "identity"}).headers["etag"] == '"abc"'
+    assert client.get("/weak_etag", headers = {"Accept-Encoding": "gzip"}).headers["etag"] == 'W/"hives-42"'
+
+def test_middleware_compresses_large_responses_outside_event_loop():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size = 100, thread_size = 500)
+    loop_threads, compress_threads = [], []
+
+    @app.get("/large")
+    async def get_large():
+        loop_threads.append(threading.current_thread())
+        return {"data": "x" * 1000}
+
+    def compress(body, encoding):
+        compress_threads.append(threading.current_thread())
+        return gzip.compress(body)
+
+    with patch("utils.compression.compress", side_effect = compress):
+        response = TestClient(app).get("/large", headers = {"Accept-Encoding": "gzip"})
+
+    assert response.json() == {"data": "x" * 1000}
+    assert compress_threads and compress_threads[0] is not loop_threads[0]
+
+
+
+# Compressed responses cache
+@pytest.mark.asyncio
+async def test_cache_compresses_once():
+    cache = CompressedResponseCache(max_bytes = 10 ** 6, ttl = 60)
+    cache.set("key", b"x" * 1000)
+
+    with patch("utils.compression.compress", wraps = lambda body, encoding, high_level: gzip.compress(body)) as mock_compress:
+        first = await cache.get("key", "gzip")
+        second = await cache.get("key", "gzip")
+
+    assert first == second
+    assert gzip.decompress(first) == b"x" * 1000
+    assert mock_compress.call_count == 1
+    assert await cache.get("key", None) == b"x" * 1000
+
+@pytest.mark.asyncio
+async def test_cache_compresses_outside_event_loop():
+    cache = CompressedResponseCache(max_bytes = 10 ** 6, ttl = 60)
+    cache.set("key", b"x" * 1000)
+    compress_threads = []
+
+    def compress(body, encoding, high_level):
+        compress_threads.append(threading.current_thread())
+        return gzip.compress(body)
+
+    with patch("utils.compression.compress", side_effect = compress):
+        await cache.get("key", "gzip")
+
+    assert compress_threads and compress_threads[0] is not threading.main_thread()
+
+@pytest.mark.asyncio
+async def test_cache_compressed_entry_replaced_meanwhile():
+    cache = CompressedResponseCache(max_bytes = 10 ** 6, ttl = 60)
+    cache.set("key", b"x" * 1000)
+
+    def compress(body, encoding, high_level):
+        cache.entries["key"] = {**cache.entries["key"], "bodies": {"identity": b"y" * 1000}}
+        return gzip.compress(body)
+
+    with patch("utils.compression.compress", side_effect = compress):
+        assert gzip.decompress(await cache.get("key", "gzip")) == b"x" * 1000
+
+    # The compressed previous body is not stored with the new one
+    assert "gzip" not in cache.entries["key"]["bodies"]
+
+@pytest.mark.asyncio
+async def test_cache_evicts_least_recently_used():
+    cache = CompressedResponseCache(max_bytes = 1000, ttl = 60)
+    cache.set("first", b"x" * 200)
+    cache.set("second", b"x" * 200)
+    await cache.get("first", None)
+    for index in range(4):
+        cache.set(f"key_{index}", b"x" * 200)
+
+    assert await cache.get("first", None) is not None
+    assert await cache.get("second", None) is None
+    assert cache.size <= 1000
+
+@pytest.mark.asyncio
+async def test_cache_expires_entries():
+    cache = CompressedResponseCache(max_bytes = 10 ** 6, ttl = -1)
+    cache.set("key", b"x")
+    assert await cache.get("key", None) is None
+    assert cache.size == 0
+
+def test_cache_stores_etag():
+    cache = CompressedResponseCache(max_bytes = 10 ** 6, ttl = 60)
+    cache.set("key", b"x", etag = '"abc"')
+    assert cache.get_etag("key") == '"abc"'
+    assert cache.get_etag("missing") is None
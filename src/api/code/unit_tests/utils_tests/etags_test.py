@@ -0,0 +1,49 @@
+# api/unit_tests/utils_tests/etags_test.py
+# export PYTHONPATH=$(pwd)
+
+# Suppress DeprecationWarnings from passlib and crypt (python 1.13)
+import warnings
+warnings.filterwarnings("ignore", category=DeprecationWarning, module='passlib')
+warnings.filterwarnings("ignore", category=DeprecationWarning, module='crypt')
+
+
+# Lib
+from utils.etags import content_etag, encoded_etag, etag_matches, make_etag, not_modified_response
+
+
+
+def test_make_etag():
+    assert make_etag("1", "abc") == '"1-abc"'
+    assert make_etag("hives", 42, weak = True) == 'W/"hives-42"'
+
+
+def test_content_etag_depends_on_body():
+    assert content_etag(b"a") == content_etag(b"a")
+    assert content_etag(b"a") != content_etag(b"b")
+
+
+def test_encoded_etag():
+    assert encoded_etag('"abc"', "br") == '"abc-br"'
+    assert encoded_etag('"abc"', None) == '"abc"'
+    assert encoded_etag('W/"hives-42"', "br") == 'W/"hives-42"'
+    assert encoded_etag(None, "br") is None
+
+
+def test_etag_matches_weak_comparison():
+    assert etag_matches('W/"hives-42"', 'W/"hives-42"')
+    assert etag_matches('"hives-42"', 'W/"hives-42"')
+    assert etag_matches('"other", W/"hives-42"', 'W/"hives-42"')
+    assert etag_matches("*", '"abc"')
+
+
+def test_etag_matches_no_match():
+    assert not etag_matches('W/"hives-41"', 'W/"hives-42"')
+    assert not etag_matches(None, '"abc"')
+    assert not etag_matches('"abc"', None)
+
+
+def test_not_modified_response():
+    response = not_modified_response('"abc"')
+    assert response.status_code == 304
+    assert response.headers["etag"] == '"abc"'
+    assert response.body == b""
@@ -0,0 +1,100 @@
+# api/unit_tests/utils_tests/logger_test.py
+# export PYTHONPATH=$(pwd)
+
+# Suppress DeprecationWarnings from passlib and crypt (python 1.13)
+import warnings
+warnings.filterwarnings("ignore", category=DeprecationWarning, module='passlib')
+warnings.filterwarnings("ignore", category=DeprecationWarning, module='crypt')
+
+
+# Lib
+import json
+import os
+import pytest
+import tempfile
+from starlette.requests import Request
+from unittest.mock import patch
+
+# The file handler is created at import, make sure it has a path
+import utils.config
+utils.config.LOG_FILE_PATH = utils.config.LOG_FILE_PATH or os.path.join(tempfile.gettempdir(), "api_logger_test.log")
+
+import utils.logger
+from utils.logger import SanitizeLoggingMiddleware, MASK, start_log_listener, stop_log_listener
+
+
+
+def build_request(body:bytes, content_type:str, content_length:str = None, method:str = "POST", query:bytes = b"") -> Request:
+    headers = [(b"content-type", content_type.encode())]
+    headers.append((b"content-length", (content_length or str(len(body))).encode()))
+    received = {"called": False}
+
+    async def receive():
+        received["called"] = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    scope = {"type": "http", "method": method, "path": "/", "query_string": query, "headers": headers}
+    request = Request(scope, receive)
+    request.received = received
+    return request
+
+
+@pytest.fixture
+def middleware():
+    return SanitizeLoggingMiddleware(app = None)
+
+
+
+def test_sanitize_body_form(middleware):
+    sanitized = middleware.sanitize_body("username=test_user&password=Secret1!")
+    assert "Secret1" not in sanitized
+    assert "username=test_user" in sanitized
+
+
+def test_sanitize_json_body_nested(middleware):
+    body = json.dumps({"username": "test_user", "password": {"password": "Secret1!"}, "users": [{"new_password": "Secret2!"}]})
+    sanitized = json.loads(middleware.sanitize_json_body(body))
+    assert sanitized["username"] == "test_user"
+    assert sanitized["password"] == MASK
+    assert sanitized["users"][0]["new_password"] == MASK
+
+
+def test_sanitize_url_query(middleware):
+    sanitized = middleware.sanitize_url("http://testserver/v1/users/password/update/?current_password=Secret1!")
+    assert "Secret1" not in sanitized
+    assert "current_password=" in sanitized
+
+
+@pytest.mark.asyncio
+async def test_get_sanitized_body_json(middleware):
+    request = build_request(json.dumps({"password": "Secret1!"}).encode(), "application/json")
+    assert json.loads(await middleware.get_sanitized_body(request)) == {"password": MASK}
+
+
+@pytest.mark.asyncio
+async def test_get_sanitized_body_above_cap_is_not_read(middleware):
+    request = build_request(b"x", "application/json", content_length = str(10 ** 7))
+    sanitized = await middleware.get_sanitized_body(request)
+    assert sanitized.startswith("<not logged")
+    assert request.received["called"] == False
+
+
+@pytest.mark.asyncio
+async def test_get_sanitized_body_upload_is_not_read(middleware):
+    request = build_request(b"binary", "multipart/form-data; boundary=xyz")
+    sanitized = await middleware.get_sanitized_body(request)
+    assert "multipart/form-data" in sanitized
+    assert request.received["called"] == False
+
+
+
+def test_log_listener_started_once():
+    with patch.object(utils.logger.queue_listener, "start") as mock_start, patch.object(utils.logger.queue_listener, "stop") as mock_stop:
+        start_log_listener()
+        start_log_listener()
+        stop_log_listener()
+        stop_log_listener()
+
+    mock_start.assert_called_once()
+    mock_stop.assert_called_once()
+    assert utils.logger.queue_listener_running == False
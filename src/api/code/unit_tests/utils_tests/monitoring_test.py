@@ -0,0 +1,80 @@
+# api/unit_tests/utils_tests/monitoring_test.py
+# export PYTHONPATH=$(pwd)
+
+# Suppress DeprecationWarnings from passlib and crypt (python 1.13)
+import warnings
+warnings.filterwarnings("ignore", category=DeprecationWarning, module='passlib')
+warnings.filterwarnings("ignore", category=DeprecationWarning, module='crypt')
+
+
+# Lib
+import asyncio
+import logging
+import pytest
+import time
+from prometheus_client import REGISTRY
+
+from utils.monitoring import EventLoopMonitor, track_operation
+
+
+
+def get_sample(name:str, dependency:str, operation:str, **labels) -> float:
+    value = REGISTRY.get_sample_value(name, {"dependency": dependency, "operation": operation, **labels})
+    return value if value is not None else 0.0
+
+
+
+def test_track_operation_observes_duration():
+    before = get_sample("fastapi_dependency_operation_duration_seconds_count", "postgres", "test_duration")
+
+    with track_operation("postgres", "test_duration"):
+        pass
+
+    after = get_sample("fastapi_dependency_operation_duration_seconds_count", "postgres", "test_duration")
+    assert after == before + 1
+
+
+def test_track_operation_observes_rows_and_payload():
+    with track_operation("postgres", "test_rows") as tracker:
+        tracker.set_rows(12)
+        tracker.set_payload_bytes(2048)
+
+    assert get_sample("fastapi_dependency_operation_rows_sum", "postgres", "test_rows") == 12
+    assert get_sample("fastapi_dependency_operation_payload_bytes_sum", "postgres", "test_rows") == 2048
+
+
+def test_track_operation_counts_exceptions():
+    with pytest.raises(ValueError):
+        with track_operation("mongodb", "test_exception"):
+            raise ValueError("Database error")
+
+    assert get_sample("fastapi_dependency_operation_exceptions_total", "mongodb", "test_exception", exception_type="ValueError") == 1
+    assert get_sample("fastapi_dependency_operation_duration_seconds_count", "mongodb", "test_exception") == 1
+
+
+
+@pytest.mark.asyncio
+async def test_event_loop_monitor_samples_lag_and_tasks():
+    monitor = EventLoopMonitor(app_name = "test_app", interval = 0.01)
+    monitor.start()
+    await asyncio.sleep(0.05)
+    await monitor.stop()
+
+    assert REGISTRY.get_sample_value("fastapi_event_loop_lag_distribution_seconds_count", {"app_name": "test_app"}) > 0
+    assert REGISTRY.get_sample_value("fastapi_event_loop_tasks", {"app_name": "test_app"}) >= 1
+    assert REGISTRY.get_sample_value("fastapi_threadpool_queue_depth", {"app_name": "test_app"}) == 0
+
+
+@pytest.mark.asyncio
+async def test_event_loop_monitor_logs_blocking_callback(caplog):
+    monitor = EventLoopMonitor(app_name = "test_blocking_app", interval = 0.01, slow_callback_threshold = 0.05)
+    monitor.start()
+    await asyncio.sleep(0.02)
+
+    with caplog.at_level(logging.WARNING, logger = "utils.monitoring"):
+        time.sleep(0.3)     # Blocking call on the event loop
+        await asyncio.sleep(0.02)
+    await monitor.stop()
+
+    assert REGISTRY.get_sample_value("fastapi_event_loop_slow_callbacks_total", {"app_name": "test_blocking_app"}) == 1
+    assert "test_event_loop_monitor_logs_blocking_callback" in caplog.text
@@ -0,0 +1,50 @@
+# api/unit_tests/utils_tests/responses_test.py
+# export PYTHONPATH=$(pwd)
+
+# Suppress DeprecationWarnings from passlib and crypt (python 1.13)
+import warnings
+warnings.filterwarnings("ignore", category=DeprecationWarning, module='passlib')
+warnings.filterwarnings("ignore", category=DeprecationWarning, module='crypt')
+
+
+# Lib
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from datetime import datetime
+from decimal import Decimal
+from uuid import UUID
+
+from utils.responses import FastJSONResponse
+
+
+
+def render(content) -> dict:
+    return json.loads(FastJSONResponse(content).body)
+
+
+
+def test_render_numpy_arrays_with_nan():
+    content = {"temperature_2m": np.array([12.5, np.nan], dtype = np.float32)}
+    assert render(content) == {"temperature_2m": [12.5, None]}
+
+
+def test_render_numpy_scalars():
+    content = {"count": np.int64(3), "value": np.float32(1.5)}
+    assert render(content) == {"count": 3, "value": 1.5}
+
+
+def test_render_datetimes_as_isoformat():
+    content = {"timestamp": pd.Timestamp("2024-01-01", tz = "UTC"), "datetime": datetime(2024, 1, 1, 12)}
+    assert render(content) == {"timestamp": "2024-01-01T00:00:00+00:00", "datetime": "2024-01-01T12:00:00"}
+
+
+def test_render_misc_types():
+    content = {"id": UUID("12345678123456781234567812345678"), "aire": Decimal("1.5"), "tuple": (1, 2)}
+    assert render(content) == {"id": "12345678-1234-5678-1234-567812345678", "aire": 1.5, "tuple": [1, 2]}
+
+
+def test_render_unsupported_type():
+    with pytest.raises(TypeError):
+        FastJSONResponse({"object": object()})
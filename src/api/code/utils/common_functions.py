@@ -4,35 +4,109 @@
 # Lib
 from utils.config import PWD_CONTEXT
 import logging
+import threading
+import time
+from collections import OrderedDict
 from fastapi import Depends, Request
 from fastapi.security import OAuth2PasswordBearer
 from utils.exceptions import CustomException
 import jwt
-from utils.config import JWT_SECRET_KEY, ENCODING_ALGORITHM
+from utils.config import JWT_SECRET_KEY, ENCODING_ALGORITHM, JWT_CACHE_SIZE
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
+
+"""
+Verified tokens cache
+- Bounded LRU of recently verified tokens, keyed on the token signature
+- Avoids a new HMAC verification for each request sent with the same token
+"""
+verified_tokens_cache:OrderedDict = OrderedDict()
+verified_tokens_cache_lock = threading.Lock()
+
+
+
+def decode_jwt_token(token: str) -> dict:
     """
-    - Decode the JWT token and return the token
+    - Return the claims of a JWT token, verify the token only if it is not in the verified tokens cache
 
     Args:
         - token (str): The JWT token
 
     Raises:
-        - CustomException if the token is invalid
+        - CustomException if the token is invalid or expired
 
     Returns:
         - The decoded token
     """
+    signature = token.rsplit(".", 1)[-1] if token else None
+
+    with verified_tokens_cache_lock:
+        cached = verified_tokens_cache.get(signature)
+        if cached is not None:
+            verified_tokens_cache.move_to_end(signature)
+
+    if cached is not None and cached[0] == token:
+        decoded_token = cached[1]
+        if "exp" not in decoded_token or decoded_token["exp"] > time.time():
+            return decoded_token
+
     try:
         decoded_token = jwt.decode(token, JWT_SECRET_KEY, algorithms=ENCODING_ALGORITHM)
     except Exception as e:
         raise CustomException(name='Auth_token_error', error_code=500, message="Invalid token") from e
+
+    with verified_tokens_cache_lock:
+        verified_tokens_cache[signature] = (token, decoded_token)
+        verified_tokens_cache.move_to_end(signature)
+        while len(verified_tokens_cache) > JWT_CACHE_SIZE:
+            verified_tokens_cache.popitem(last = False)
+
+    return decoded_token
+
+
+
+def get_request_claims(request: Request, token: str) -> dict:
+    """
+    - Return the JWT claims of the request, decoded once and stored on request.state
+    - Shared by the route dependencies, the limiter key function and require_role
+
+    Args:
+        - request (Request): The current request
+        - token (str): The JWT token
+
+    Returns:
+        - The decoded token
+    """
+    decoded_token = getattr(request.state, "jwt_claims", None)
+    if decoded_token is None:
+        decoded_token = decode_jwt_token(token)
+        request.state.jwt_claims = decoded_token
     return decoded_token
 
 
 
+def get_current_user(token: str = Depends(oauth2_scheme), request: Request = None) -> dict:
+    """
+    - Decode the JWT token and return the token
+    - When called as a route dependency, the claims are cached on request.state
+
+    Args:
+        - token (str): The JWT token
+        - request (Request): The current request (injected by FastAPI)
+
+    Raises:
+        - CustomException if the token is invalid
+
+    Returns:
+        - The decoded token
+    """
+    if request is None:
+        return decode_jwt_token(token)
+    return get_request_claims(request, token)
+
+
+
 
 
 def hash_string(string_to_hash:str) -> str:
@@ -51,18 +125,18 @@ def hash_string(string_to_hash:str) -> str:
 
 def get_jwt_token(request: Request) -> str:
     """
-    Extract the JWT token from the request headers.
+    Extract the JWT token from the request headers and return a stable user key for the limiter.
     """
     token = request.headers.get("Authorization")
     if token and token.startswith("Bearer "):
         token = token[len("Bearer "):]
 
     try:
-        decoded_token = get_current_user(token = token)
+        decoded_token = get_request_claims(request, token)
     except CustomException as e:
         raise e
     else:
-        return decoded_token
+        return str(decoded_token.get("id", decoded_token.get("username")))
     
 
 
@@ -96,4 +170,60 @@ def get_projection(lat:float, lon:float) -> int:
         return 2154
 
     else:
-        return 2154
\ No newline at end of file
+        return 2154
+
+
+"""
+Batch projections
+- Same territories as get_projection as bounding boxes (lat min, lat max, lon min, lon max, SRID), checked in the same order (first match wins)
+- numpy is imported on first call (API startup time)
+"""
+PROJECTION_BOUNDING_BOXES = (
+    (-21.5, -20.8, 55, 56, 2975),       # Reunion
+    (14, 15, -61.5, -60, 5490),         # Martinique
+    (15.8, 16.6, -62, -60.5, 5490),     # Guadeloupe
+    (2, 6, -55.5, -51.1, 2972),         # Guyane
+    (-13, -12, 44.5, 45.5, 4471),       # Mayotte
+)
+DEFAULT_PROJECTION = 2154               # Metropole & outside the territories
+
+
+
+def get_projections(latitudes, longitudes):
+    """
+    Return the SRID codes of arrays of coordinates (vectorized get_projection)
+
+    Args:
+        - latitudes, longitudes: array-like of the same shape
+    Returns:
+        - A numpy array of SRID codes (int32)
+    """
+    import numpy as np
+
+    latitudes = np.asarray(latitudes, dtype = np.float64)
+    longitudes = np.asarray(longitudes, dtype = np.float64)
+    srids = np.full(latitudes.shape, DEFAULT_PROJECTION, dtype = np.int32)
+    unassigned = np.ones(latitudes.shape, dtype = bool)
+
+    for lat_min, lat_max, lon_min, lon_max, srid in PROJECTION_BOUNDING_BOXES:
+        mask = unassigned & (latitudes > lat_min) & (latitudes < lat_max) & (longitudes > lon_min) & (longitudes < lon_max)
+        srids[mask] = srid
+        unassigned &= ~mask
+
+    return srids
+
+
+
+def group_by_projection(latitudes, longitudes) -> dict:
+    """
+    Group a batch of coordinates by SRID, to send one query per projection
+
+    Returns:
+        - A dictionary {SRID: numpy array of the indices of its coordinates in the batch (ascending)}
+    """
+    import numpy as np
+
+    srids = get_projections(latitudes, longitudes)
+    order = np.argsort(srids, kind = "stable")
+    projections, starts = np.unique(srids[order], return_index = True)
+    return {int(srid): indices for srid, indices in zip(projections, np.split(order, starts[1:]))}
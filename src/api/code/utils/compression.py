@@ -0,0 +1,226 @@
+# api/utils/compression.py
+
+
+# Lib
+import gzip
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import anyio.to_thread
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from utils.config import COMPRESSION_MINIMUM_SIZE, COMPRESSION_THREAD_SIZE, COMPRESSION_CONTENT_TYPES
+from utils.etags import encoded_etag
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+
+"""
+Encodings
+- Server preference order, an encoding is only offered if its library is installed
+- Levels: fast levels for on the fly compression, high levels for cached (compressed once) responses
+"""
+AVAILABLE_ENCODINGS = [encoding for encoding, module in (("br", brotli), ("zstd", zstandard), ("gzip", gzip)) if module is not None]
+FAST_LEVELS = {"br": 4, "zstd": 3, "gzip": 6}
+HIGH_LEVELS = {"br": 9, "zstd": 12, "gzip": 9}
+
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Return the preferred encoding accepted by the client (Accept-Encoding header), None if identity must be used
+
+    Args:
+        - accept_encoding (str): The Accept-Encoding header value
+    """
+    if not accept_encoding:
+        return None
+
+    accepted: dict = {}
+    for part in accept_encoding.lower().split(","):
+        encoding, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[encoding.strip()] = quality
+
+    wildcard_quality = accepted.get("*", 0.0)
+    candidates = [(accepted.get(encoding, wildcard_quality), -index, encoding) for index, encoding in enumerate(AVAILABLE_ENCODINGS)]
+    quality, _, encoding = max(candidates)
+    return encoding if quality > 0 else None
+
+
+
+def compress(body: bytes, encoding: str, high_level: bool = False) -> bytes:
+    """
+    Compress a body with the given encoding (br, zstd or gzip)
+    """
+    level = (HIGH_LEVELS if high_level else FAST_LEVELS)[encoding]
+    if encoding == "br":
+        return brotli.compress(body, quality = level)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level = level).compress(body)
+    return gzip.compress(body, compresslevel = level, mtime = 0)
+
+
+
+def is_compressible(content_type: str) -> bool:
+    media_type = content_type.split(";")[0].strip().lower()
+    return media_type in COMPRESSION_CONTENT_TYPES
+
+
+
+"""
+Compression middleware
+- ASGI middleware: compresses complete responses bigger than COMPRESSION_MINIMUM_SIZE whose content type is allowed
+- Responses already encoded (eg: served from the compressed cache) and streamed responses are sent as is
+- Responses bigger than COMPRESSION_THREAD_SIZE are compressed in a worker thread, not in the event loop
+- A strong ETag is made specific to the encoding, a compressed response is not byte-for-byte the identity one
+"""
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MINIMUM_SIZE, thread_size: int = COMPRESSION_THREAD_SIZE) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.thread_size = thread_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope = scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        bypass = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start_message, bypass
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw = message["headers"])
+                start_message = message
+                bypass = "content-encoding" in headers or not is_compressible(headers.get("content-type", ""))
+                if bypass:
+                    await send(message)
+                return
+
+            if bypass or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            # Streamed or small responses are sent without compression
+            if message.get("more_body", False) or len(body) < self.minimum_size:
+                bypass = True
+                await send(start_message)
+                await send(message)
+                return
+
+            if len(body) >= self.thread_size:
+                compressed_body = await anyio.to_thread.run_sync(compress, body, encoding)
+            else:
+                compressed_body = compress(body, encoding)
+            headers = MutableHeaders(raw = start_message["headers"])
+            headers["Content-Encoding"] = encoding
+            if "etag" in headers:
+                headers["ETag"] = encoded_etag(headers["etag"], encoding)
+            headers["Content-Length"] = str(len(compressed_body))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressed_body, "more_body": False})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+
+"""
+Compressed responses cache
+- Bounded (total bytes) LRU with TTL, storing the rendered body, its compressed variants and its ETag
+- Variants are compressed once (high level) on the first request asking for them, hits are never recompressed
+- High level compression of a large body takes hundreds of ms: it runs in a worker thread, not in the event loop
+"""
+class CompressedResponseCache:
+    def __init__(self, max_bytes: int, ttl: int) -> None:
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.entries: OrderedDict = OrderedDict()
+
+
+    def get_entry(self, key: str) -> Optional[dict]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry["expires_at"] < time.monotonic():
+            self.delete(key)
+            return None
+
+        self.entries.move_to_end(key)
+        return entry
+
+
+    async def get(self, key: str, encoding: Optional[str]) -> Optional[bytes]:
+        """
+        Return the cached body for the given encoding (None: identity), None if the key is not cached
+        """
+        entry = self.get_entry(key)
+        if entry is None:
+            return None
+
+        variant = encoding or "identity"
+        if variant in entry["bodies"]:
+            return entry["bodies"][variant]
+
+        compressed_body = await anyio.to_thread.run_sync(compress, entry["bodies"]["identity"], variant, True)
+        # Stored if the entry was not replaced, evicted or given the variant by a concurrent request meanwhile
+        if self.entries.get(key) is entry and variant not in entry["bodies"]:
+            entry["bodies"][variant] = compressed_body
+            self.size += len(compressed_body)
+            self.evict()
+        return compressed_body
+
+
+    def get_etag(self, key: str) -> Optional[str]:
+        """
+        Return the ETag stored with the cached body, None if the key is not cached
+        """
+        entry = self.get_entry(key)
+        return entry["etag"] if entry is not None else None
+
+
+    def set(self, key: str, body: bytes, etag: Optional[str] = None) -> None:
+        if len(body) > self.max_bytes // 4:
+            return
+        self.delete(key)
+        self.entries[key] = {"expires_at": time.monotonic() + self.ttl, "bodies": {"identity": body}, "etag": etag}
+        self.size += len(body)
+        self.evict()
+
+
+    def delete(self, key: str) -> None:
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= sum(len(body) for body in entry["bodies"].values())
+
+
+    def evict(self) -> None:
+        while self.size > self.max_bytes and self.entries:
+            self.delete(next(iter(self.entries)))
@@ -15,12 +15,29 @@ General configuration
 DEBUG = os.getenv("DEBUG", False)
 LOGGER = os.getenv("LOGGER", False)
 LOG_FILE_PATH = os.getenv("LOG_FILE_PATH")
+LOG_BODY_MAX_BYTES = int(os.getenv("LOG_BODY_MAX_BYTES", 4096))      # Larger bodies are not read by the logger
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", 1.0))           # Share of requests logged (exceptions are always logged)
 
 
 # API informations
 CURRENT_VERSION = os.getenv("API_VERSION", "v0")
 
 
+# Production server (server.py): worker processes, event loop & HTTP parser, connections tuning
+API_WORKERS = int(os.getenv("API_WORKERS", os.cpu_count() or 1))
+API_LOOP = os.getenv("API_LOOP", "uvloop")                      # uvloop, asyncio or auto
+API_HTTP = os.getenv("API_HTTP", "httptools")                   # httptools, h11 or auto
+API_BACKLOG = int(os.getenv("API_BACKLOG", 2048))               # Pending connections queue size
+API_KEEP_ALIVE = int(os.getenv("API_KEEP_ALIVE", 5))            # In seconds, idle keep-alive connections timeout
+API_GRACEFUL_SHUTDOWN_TIMEOUT = int(os.getenv("API_GRACEFUL_SHUTDOWN_TIMEOUT", 20))     # In seconds, in-flight requests drain on SIGTERM
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus_multiproc")
+
+
+# Monitoring (event loop lag sampling, slow callback logger disabled if threshold is not set)
+EVENT_LOOP_MONITOR_INTERVAL = float(os.getenv("EVENT_LOOP_MONITOR_INTERVAL", 0.5))
+SLOW_CALLBACK_THRESHOLD = float(os.getenv("SLOW_CALLBACK_THRESHOLD")) if os.getenv("SLOW_CALLBACK_THRESHOLD") else None
+
+
 """
 Algorithms, security, secrets
 """
@@ -35,6 +52,12 @@ else:
 
 
 ACCESS_TOKEN_EXPIRATION_IN_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRATION_IN_MINUTES", 60))
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", 1024))     # Recently verified tokens kept in memory (LRU)
+
+# Users profile, role & credentials cache (per worker, LRU with TTL), invalidated on each user update
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 4096))        # Cached entries
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", 30))          # In seconds, longest delay for another worker to see an update without Redis invalidation
+USER_CACHE_REDIS_INVALIDATION = os.getenv("USER_CACHE_REDIS_INVALIDATION", "False") == "True"   # Broadcast invalidations to the other workers (Redis pub/sub)
 
 
 # PWD CONTEXT (Passlib, Hash Algorithm)
@@ -58,6 +81,10 @@ else:
 USER_DATABASE = os.getenv("USER_DATABASE")
 CARTO_DATABASE = os.getenv("CARTO_DATABASE")
 
+# Connection pools (per worker process)
+POSTGRES_POOL_MIN_SIZE = int(os.getenv("POSTGRES_POOL_MIN_SIZE", 1))
+POSTGRES_POOL_MAX_SIZE = int(os.getenv("POSTGRES_POOL_MAX_SIZE", 10))
+
 
 MONGODB_HOST = os.getenv("MONGODB_HOST")
 MONGODB_PORT = os.getenv("MONGODB_PORT")
@@ -74,12 +101,24 @@ MONGODB_DATABASE = os.getenv("MONGODB_DATABASE")
 MONGODB_LOCATION_COLLECTION_NAME = os.getenv("MONGODB_LOCATION_COLLECTION_NAME")
 MONGODB_HIVE_COLLECTION_NAME = os.getenv("MONGODB_HIVE_COLLECTION_NAME")
 
+# Locations & hives geo search (nearest first, paged)
+GEO_SEARCH_MAX_DISTANCE = float(os.getenv("GEO_SEARCH_MAX_DISTANCE", 50000))     # In meters
+GEO_SEARCH_PAGE_SIZE = int(os.getenv("GEO_SEARCH_PAGE_SIZE", 50))
+GEO_SEARCH_MAX_PAGE_SIZE = int(os.getenv("GEO_SEARCH_MAX_PAGE_SIZE", 200))
+
 
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = os.getenv("REDIS_PORT", 6379)
 # REDIS_API_USER = os.getenv("REDIS_API_USER")              # Not used (Redis open connetions but private network)
 # REDIS_API_PASSWORD = os.getenv("REDIS_API_PASSWORD")      # Not used (Redis open connetions but private network)
 
+# Per-owner objects versions (ETags of locations & hives), short timeout: requests are served without ETag if Redis is slow
+OBJECT_VERSION_TIMEOUT = float(os.getenv("OBJECT_VERSION_TIMEOUT", 0.2))      # In seconds
+
+# Deep health check (/health/deep): per dependency probe timeout, result cached per worker so healthchecks cannot load the databases
+HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", 2))      # In seconds
+HEALTH_CACHE_TTL = float(os.getenv("HEALTH_CACHE_TTL", 5))              # In seconds
+
 
 
 # -----------------------------------------------------------------------------------------------------#
@@ -90,6 +129,10 @@ LIMITER SERVICE - BASE LIMITS
 # LIMITER SERVICE
 LIMITER_TYPE = os.getenv("LIMITER_TYPE") # "ip" or "user_id"
 DEFAULT_LIMITS_FOR_LIMITER = os.getenv("DEFAULT_LIMITS_FOR_LIMITER")
+LIMITER_STORAGE_URI = os.getenv("LIMITER_STORAGE_URI", "memory://")     # eg: redis://beem-redis:6379/1 (shared by workers & replicas)
+LIMITER_STRATEGY = os.getenv("LIMITER_STRATEGY", "fixed-window")       # "fixed-window", "moving-window" or "sliding-log" (alias of moving-window)
+if LIMITER_STRATEGY == "sliding-log":
+    LIMITER_STRATEGY = "moving-window"
 
 
 ## ROUTER AUTHENTICATOR
@@ -109,6 +152,7 @@ UPDATE_INFOS_LIMIT = os.getenv("UPDATE_INFOS_LIMIT")
 PASSWORD_UPDATE_LIMIT = os.getenv("PASSWORD_UPDATE_LIMIT")
 USER_LOCATIONS_LIMIT = os.getenv("USER_LOCATIONS_LIMIT")
 USER_HIVES_LIMIT = os.getenv("USER_HIVES_LIMIT")
+USERS_IMPORT_MAX_SIZE = int(os.getenv("USERS_IMPORT_MAX_SIZE", 10000))      # Users per admin bulk import request
 
 ## ROUTER WEATHER
 WEATHER_LIMIT = os.getenv("WEATHER_LIMIT")
@@ -123,8 +167,9 @@ CARTO_LIMIT = os.getenv("CARTO_LIMIT")
 """
 OPENMETEO API
 """
-forecast_url = "https://api.open-meteo.com/v1/forecast"
-historical_forecast_url = "https://historical-forecast-api.open-meteo.com/v1/forecast"
+# URLs can be overridden to use a local OpenMeteo fake (load tests)
+forecast_url = os.getenv("OPENMETEO_FORECAST_URL", "https://api.open-meteo.com/v1/forecast")
+historical_forecast_url = os.getenv("OPENMETEO_HISTORICAL_FORECAST_URL", "https://historical-forecast-api.open-meteo.com/v1/forecast")
 openmeteo_models = ["meteofrance_arpege_europe", "meteofrance_arome_france"]
 params_current_weather = ["temperature_2m", "relative_humidity_2m", "precipitation", "rain", "showers", "cloud_cover", "wind_speed_10m", "wind_direction_10m"]
 params_daily_weather = ["temperature_2m_max", "temperature_2m_min", "sunrise", "sunset", "precipitation_sum", "rain_sum", "showers_sum"]
@@ -137,5 +182,28 @@ params_hourly_weather = ["temperature_2m", "relative_humidity_2m", "precipitatio
 """
 CARTOGRAPHIC DATA TYPES
 """
-AVAILABLE_DATA_TYPES = os.getenv("AVAILABLE_CARTO_DATA_TYPES", "rpg, clc").split(",")
+AVAILABLE_DATA_TYPES = [data_type.strip() for data_type in os.getenv("AVAILABLE_CARTO_DATA_TYPES", "rpg, clc").split(",")]
+
+# Carto responses cache (rendered & compressed bodies, in memory)
+CARTO_CACHE_MAX_BYTES = int(os.getenv("CARTO_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+CARTO_CACHE_TTL = int(os.getenv("CARTO_CACHE_TTL", 3600))       # In seconds
+
+# Carto ETags: bump CARTO_DATA_VERSION when geodata is reloaded, past years layers are then revalidated without querying
+CARTO_DATA_VERSION = os.getenv("CARTO_DATA_VERSION", "1")
+
+# Land cover summaries (/carto/summary): locations rounded to CARTO_SUMMARY_PRECISION decimals (1e-5 degree ~ 1 m), locations per request
+CARTO_SUMMARY_PRECISION = int(os.getenv("CARTO_SUMMARY_PRECISION", 5))
+CARTO_SUMMARY_MAX_LOCATIONS = int(os.getenv("CARTO_SUMMARY_MAX_LOCATIONS", 500))
+CARTO_SUMMARY_MAX_BUILDS = int(os.getenv("CARTO_SUMMARY_MAX_BUILDS", 20))      # Summaries built on demand per request, the others by maintenance/build_landcover_summary.py
+
+
+
+# -----------------------------------------------------------------------------------------------------#
+
+"""
+RESPONSES COMPRESSION (br, zstd, gzip)
+"""
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", 1024))     # In bytes, smaller responses are not compressed
+COMPRESSION_THREAD_SIZE = int(os.getenv("COMPRESSION_THREAD_SIZE", 65536))     # In bytes, bigger responses are compressed in a worker thread (not in the event loop)
+COMPRESSION_CONTENT_TYPES = [content_type.strip() for content_type in os.getenv("COMPRESSION_CONTENT_TYPES", "application/json,application/geo+json,text/plain,text/html").split(",")]
 
@@ -18,18 +18,29 @@ exception = CustomException(name = "Auth_role_error",
 """
 DECORATORS
 """
+def get_user_data(kwargs: dict) -> dict:
+    """
+    Return the decoded JWT of the route: JWT_TOKEN argument, or the claims cached on request.state
+    """
+    user_data = kwargs.get("JWT_TOKEN")
+    if user_data is None and kwargs.get("request") is not None:
+        user_data = getattr(kwargs["request"].state, "jwt_claims", None)
+    return user_data
+
+
+
 def require_role(role: str):
     def decorator(func):
         @wraps(func)
         async def async_wrapper(*args, **kwargs):
-            user_data = kwargs.get("JWT_TOKEN")
+            user_data = get_user_data(kwargs)
             if not user_data or user_data.get("role_name") != role:
                 raise exception
             return await func(*args, **kwargs)
 
         @wraps(func)
         def sync_wrapper(*args, **kwargs):
-            user_data = kwargs.get("JWT_TOKEN")
+            user_data = get_user_data(kwargs)
             if not user_data or user_data.get("role_name") != role:
                 raise exception
             return func(*args, **kwargs)
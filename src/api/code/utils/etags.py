@@ -0,0 +1,67 @@
+# api/utils/etags.py
+
+
+# Lib
+import hashlib
+from typing import Optional
+
+from fastapi import Response
+
+
+
+"""
+ETags
+- Strong ETags are content hashes or versions of immutable data (past years carto layers)
+- Weak ETags (W/ prefix) are versions of user objects (locations, hives), incremented on each write
+- Strong ETags are byte-for-byte: the encoding is appended to the ETag of a compressed representation
+"""
+def make_etag(*parts, weak: bool = False) -> str:
+    """
+    Build an ETag from the given parts (versions, keys...)
+    """
+    tag = "-".join(str(part) for part in parts)
+    return f'W/"{tag}"' if weak else f'"{tag}"'
+
+
+
+def content_etag(body: bytes) -> str:
+    """
+    Build a strong ETag from a rendered (identity) body
+    """
+    return make_etag(hashlib.sha256(body).hexdigest()[:32])
+
+
+
+def encoded_etag(etag: Optional[str], encoding: Optional[str]) -> Optional[str]:
+    """
+    ETag of the representation sent with the given Content-Encoding (None: identity), weak ETags are shared by all encodings
+    """
+    if etag is None or encoding is None or etag.startswith("W/"):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    """
+    Return True if the If-None-Match header matches the ETag (weak comparison, as required for If-None-Match)
+
+    Args:
+        - if_none_match (str): The If-None-Match header value
+        - etag (str): The current ETag of the resource
+    """
+    if not if_none_match or etag is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    opaque_tag = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque_tag for candidate in if_none_match.split(","))
+
+
+
+def not_modified_response(etag: str) -> Response:
+    """
+    304 response, sent without body
+    """
+    return Response(status_code = 304, headers = {"ETag": etag})
@@ -2,15 +2,55 @@
 
 
 # Lib
+import time
 from slowapi import Limiter
+from slowapi.errors import RateLimitExceeded
 from slowapi.util import get_remote_address
 
 from utils.common_functions import get_jwt_token
-from utils.config import LIMITER_TYPE, DEFAULT_LIMITS_FOR_LIMITER
+from utils.config import LIMITER_TYPE, DEFAULT_LIMITS_FOR_LIMITER, LIMITER_STORAGE_URI, LIMITER_STRATEGY
+from utils.monitoring import LIMITER_DECISION_TIME, LIMITER_REJECTIONS
+
+
+
+"""
+Limiter class
+- Counters are stored in LIMITER_STORAGE_URI (memory:// or redis://), shared by every worker and replica when using Redis
+- Falls back to a local in-memory storage when Redis is unreachable
+- Expose decision latency and rejection counts as Prometheus metrics
+- slowapi has no public hook around the limit check: _check_request_limit and _storage_dead are private, slowapi is pinned (requirements.txt)
+"""
+class MonitoredLimiter(Limiter):
+    def _check_request_limit(self, request, endpoint_func, in_middleware = True) -> None:
+        # slowapi calls this method again when switching to the fallback storage, only the outer call is measured
+        if getattr(request.state, "_rate_limit_check_in_progress", False):
+            return super()._check_request_limit(request, endpoint_func, in_middleware)
+
+        request.state._rate_limit_check_in_progress = True
+        before_time = time.perf_counter()
+        try:
+            super()._check_request_limit(request, endpoint_func, in_middleware)
+        except RateLimitExceeded as e:
+            LIMITER_REJECTIONS.labels(route = endpoint_func.__name__ if endpoint_func else request.url.path,
+                                      storage = self.storage_name).inc()
+            raise e
+        finally:
+            LIMITER_DECISION_TIME.labels(storage = self.storage_name).observe(time.perf_counter() - before_time)
+            request.state._rate_limit_check_in_progress = False
+
+
+    @property
+    def storage_name(self) -> str:
+        if self._storage_dead:
+            return "memory_fallback"
+        return LIMITER_STORAGE_URI.split(":", 1)[0]
+
+
 
 """"
 Limiter definition
 - key_func: Function to extract the client IP address
+- strategy: "fixed-window" or "moving-window" (sliding log, atomic Lua scripts with Redis)
 """
 if LIMITER_TYPE == "ip":
     function_to_use = get_remote_address
@@ -21,4 +61,8 @@ elif LIMITER_TYPE == "user":
 
 
 
-limiter = Limiter(key_func = function_to_use, default_limits = default_limits)
\ No newline at end of file
+limiter = MonitoredLimiter(key_func = function_to_use,
+                           default_limits = default_limits,
+                           storage_uri = LIMITER_STORAGE_URI,
+                           strategy = LIMITER_STRATEGY,
+                           in_memory_fallback_enabled = not LIMITER_STORAGE_URI.startswith("memory://"))
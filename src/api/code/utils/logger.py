@@ -3,17 +3,23 @@
 
 # Lib
 from fastapi import Request
+import json
 import logging
+import logging.handlers
+import queue
+import random
 from starlette.middleware.base import BaseHTTPMiddleware
 import traceback
 import urllib.parse
 
 
-from utils.config import LOG_FILE_PATH
+from utils.config import LOG_FILE_PATH, LOG_BODY_MAX_BYTES, LOG_SAMPLE_RATE
 
 
 """
 Create logging object and configuration
+- Records are pushed in a queue by the event loop (QueueHandler, non blocking)
+- A background thread (QueueListener) writes them in the log file
 """
 
 # File handler
@@ -24,58 +30,144 @@ file_handler.setLevel(logging.INFO)
 formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 file_handler.setFormatter(formatter)
 
+# Queue handler & listener
+log_queue = queue.SimpleQueue()
+queue_handler = logging.handlers.QueueHandler(log_queue)
+queue_listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level = True)
+queue_listener_running = False
+
 # Logger
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("api logger")
-logger.addHandler(file_handler)
+logger.addHandler(queue_handler)
+
+
+
+def start_log_listener() -> None:
+    """
+    Start the background thread writing queued records to the log file
+    """
+    global queue_listener_running
+    if not queue_listener_running:
+        queue_listener.start()
+        queue_listener_running = True
+
+
+
+def stop_log_listener() -> None:
+    """
+    Flush queued records and stop the background thread
+    """
+    global queue_listener_running
+    if queue_listener_running:
+        queue_listener.stop()
+        queue_listener_running = False
 
 
 
 """
 Create middleware to sanitize sensitive information
 - Avoid logging sensitive information such as passwords
+- Only small form / JSON bodies are read and logged, other bodies (uploads, large carto requests) are never buffered
+- Requests are sampled (LOG_SAMPLE_RATE), exceptions are always logged
 """
 
+SENSITIVE_KEYS = {"password", "new_password", "current_password", "access_token", "refresh_token"}
+MASK = "********"
+SANITIZABLE_CONTENT_TYPES = ("application/x-www-form-urlencoded", "application/json")
+
+
 class SanitizeLoggingMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
-        # Extract client IP
-        client_ip = request.client.host
+        sampled = LOG_SAMPLE_RATE >= 1 or random.random() < LOG_SAMPLE_RATE
 
-        # Extract request body
-        body = await request.body()
-        body_str = body.decode("utf-8")
+        if sampled:
+            # Extract client IP
+            client_ip = request.client.host if request.client else "unknown"
 
-        # Sanitize sensitive information
-        sanitized_body_str = self.sanitize_body(body_str)
+            # Extract & sanitize request body
+            sanitized_body_str = await self.get_sanitized_body(request)
+            sanitized_url = self.sanitize_url(str(request.url))
 
-        # Log sanitized request details
-        logger.info(f"Request: {request.method} {request.url} from {client_ip} with body: {sanitized_body_str}")
+            # Log sanitized request details
+            logger.info(f"Request: {request.method} {sanitized_url} from {client_ip} with body: {sanitized_body_str}")
 
         try:
             # Process request
             response = await call_next(request)
         except Exception as e:
             # Log exception details
-            logger.error(f"Exception occurred: {str(e)}")
+            logger.error(f"Exception occurred on {request.method} {request.url.path}: {str(e)}")
             logger.error(traceback.format_exc())
             raise e
 
         # Log response status
-        logger.info(f"Response status: {response.status_code}\n")
+        if sampled:
+            logger.info(f"Response status: {response.status_code}\n")
         return response
 
+
+    async def get_sanitized_body(self, request: Request) -> str:
+        """
+        Return the sanitized request body, or a placeholder if the body must not be read
+        """
+        content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+        content_length = request.headers.get("content-length")
+
+        if content_length is None or not content_length.isdigit():
+            return "<not logged: unknown size>" if request.method in ("POST", "PUT", "PATCH") else ""
+        if int(content_length) == 0:
+            return ""
+        if content_type not in SANITIZABLE_CONTENT_TYPES:
+            return f"<not logged: {content_length} bytes of {content_type or 'unknown content type'}>"
+        if int(content_length) > LOG_BODY_MAX_BYTES:
+            return f"<not logged: {content_length} bytes, above {LOG_BODY_MAX_BYTES} bytes>"
+
+        body = await request.body()
+        body_str = body.decode("utf-8", errors = "replace")
+
+        if content_type == "application/json":
+            return self.sanitize_json_body(body_str)
+        return self.sanitize_body(body_str)
+
+
     def sanitize_body(self, body_str: str) -> str:
         # Parse the body string into a dictionary
         parsed_body = urllib.parse.parse_qs(body_str)
 
-        # Replace the value of the "password" key with asterisks
-        if "password" in parsed_body:
-            parsed_body["password"] = ["********"]
-        if "new_password" in parsed_body:
-            parsed_body["new_password"] = ["********"]
-        if "current_password" in parsed_body:
-            parsed_body["current_password"] = ["********"]
+        # Replace the value of the sensitive keys with asterisks
+        for key in SENSITIVE_KEYS.intersection(parsed_body):
+            parsed_body[key] = [MASK]
 
         # Recompose the body string
         sanitized_body_str = urllib.parse.urlencode(parsed_body, doseq=True)
-        return sanitized_body_str
\ No newline at end of file
+        return sanitized_body_str
+
+
+    def sanitize_json_body(self, body_str: str) -> str:
+        try:
+            parsed_body = json.loads(body_str)
+        except ValueError:
+            return "<not logged: invalid JSON body>"
+        return json.dumps(self.mask_sensitive_values(parsed_body))
+
+
+    def mask_sensitive_values(self, value):
+        """
+        Recursively replace the value of the sensitive keys with asterisks
+        """
+        if isinstance(value, dict):
+            return {key: MASK if key in SENSITIVE_KEYS else self.mask_sensitive_values(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self.mask_sensitive_values(item) for item in value]
+        return value
+
+
+    def sanitize_url(self, url: str) -> str:
+        """
+        Mask sensitive query parameters (eg: current_password on the password update route)
+        """
+        split_url = urllib.parse.urlsplit(url)
+        if not split_url.query:
+            return url
+        return split_url._replace(query = self.sanitize_body(split_url.query)).geturl()
@@ -1,18 +1,20 @@
 
+import asyncio
+import os
+import sys
+import threading
 import time
 import logging
+import traceback
 
-from typing import Tuple
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+
+import anyio.to_thread
 
 from opentelemetry import trace
-from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import \
-    OTLPSpanExporter
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
-from opentelemetry.instrumentation.logging import LoggingInstrumentor
-from opentelemetry.sdk.resources import Resource
-from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import BatchSpanProcessor
-from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, multiprocess
 from prometheus_client.openmetrics.exposition import (CONTENT_TYPE_LATEST,
                                                       generate_latest)
 from starlette.middleware.base import (BaseHTTPMiddleware,
@@ -36,7 +38,8 @@ def metrics():
 
 INFO = Gauge(
     "fastapi_app_info", "FastAPI application information.", [
-        "app_name"]
+        "app_name"],
+    multiprocess_mode="max",
 )
 REQUESTS = Counter(
     "fastapi_requests_total", "Total count of requests by method and path.", [
@@ -61,6 +64,92 @@ REQUESTS_IN_PROGRESS = Gauge(
     "fastapi_requests_in_progress",
     "Gauge of requests by method and path currently being processed",
     ["method", "path", "app_name"],
+    multiprocess_mode="livesum",
+)
+OPERATIONS_PROCESSING_TIME = Histogram(
+    "fastapi_dependency_operation_duration_seconds",
+    "Histogram of dependency operations processing time by dependency and operation (in seconds)",
+    ["dependency", "operation"],
+    buckets=(.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, float("inf")),
+)
+OPERATIONS_ROWS = Histogram(
+    "fastapi_dependency_operation_rows",
+    "Histogram of rows (records, documents, values) returned by dependency and operation",
+    ["dependency", "operation"],
+    buckets=(0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000, 50000, float("inf")),
+)
+OPERATIONS_PAYLOAD_BYTES = Histogram(
+    "fastapi_dependency_operation_payload_bytes",
+    "Histogram of payload size returned by dependency and operation (in bytes)",
+    ["dependency", "operation"],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, float("inf")),
+)
+OPERATIONS_EXCEPTIONS = Counter(
+    "fastapi_dependency_operation_exceptions_total",
+    "Total count of exceptions raised by dependency, operation and exception type",
+    ["dependency", "operation", "exception_type"],
+)
+POSTGRES_STATEMENT_EXECUTIONS = Counter(
+    "fastapi_postgres_statement_executions_total",
+    "Total count of registered Postgres statements executions by statement and warmed (true: prepared in the connection statement cache by the pool init callback)",
+    ["statement", "warmed"],
+)
+USER_CACHE_REQUESTS = Counter(
+    "fastapi_user_cache_requests_total",
+    "Total count of users cache lookups by kind (secure_data, info_data, credentials) and result (hit, miss)",
+    ["kind", "result"],
+)
+USER_CACHE_HIT_RATIO = Gauge(
+    "fastapi_user_cache_hit_ratio",
+    "Users cache hit ratio by kind since the worker start",
+    ["kind"],
+    multiprocess_mode="liveall",
+)
+EVENT_LOOP_LAG = Gauge(
+    "fastapi_event_loop_lag_seconds",
+    "Last sampled event loop scheduling lag (in seconds)",
+    ["app_name"],
+    multiprocess_mode="max",
+)
+EVENT_LOOP_LAG_HISTOGRAM = Histogram(
+    "fastapi_event_loop_lag_distribution_seconds",
+    "Histogram of sampled event loop scheduling lag (in seconds)",
+    ["app_name"],
+    buckets=(.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, float("inf")),
+)
+EVENT_LOOP_TASKS = Gauge(
+    "fastapi_event_loop_tasks",
+    "Gauge of asyncio tasks currently alive on the event loop",
+    ["app_name"],
+    multiprocess_mode="livesum",
+)
+THREADPOOL_BUSY_WORKERS = Gauge(
+    "fastapi_threadpool_busy_workers",
+    "Gauge of threadpool workers currently running sync routes and dependencies",
+    ["app_name"],
+    multiprocess_mode="livesum",
+)
+THREADPOOL_QUEUE_DEPTH = Gauge(
+    "fastapi_threadpool_queue_depth",
+    "Gauge of sync routes and dependencies waiting for a free threadpool worker",
+    ["app_name"],
+    multiprocess_mode="livesum",
+)
+LIMITER_DECISION_TIME = Histogram(
+    "fastapi_limiter_decision_duration_seconds",
+    "Histogram of rate limiter decision time by storage (in seconds)",
+    ["storage"],
+    buckets=(.0001, .00025, .0005, .001, .0025, .005, .01, .025, .05, .1, .25, float("inf")),
+)
+LIMITER_REJECTIONS = Counter(
+    "fastapi_limiter_rejections_total",
+    "Total count of requests rejected by the rate limiter by route and storage",
+    ["route", "storage"],
+)
+SLOW_CALLBACKS = Counter(
+    "fastapi_event_loop_slow_callbacks_total",
+    "Total count of event loop callbacks blocking the loop longer than the slow callback threshold",
+    ["app_name"],
 )
 
 
@@ -118,10 +207,167 @@ class PrometheusMiddleware(BaseHTTPMiddleware):
 
 
 def metrics(request: Request) -> Response:
-    return Response(generate_latest(REGISTRY), headers={"Content-Type": CONTENT_TYPE_LATEST})
+    # Multi-worker server (PROMETHEUS_MULTIPROC_DIR set by server.py): aggregate the metrics files of all workers
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
+
+def mark_worker_metrics_dead() -> None:
+    """
+    Remove the live gauges of the current worker from the multiprocess metrics, called on worker shutdown
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+class OperationTracker:
+    """
+    Handle yielded by track_operation, used by the call site to report what the operation returned
+    """
+    def __init__(self, dependency: str, operation: str, span: trace.Span) -> None:
+        self.dependency = dependency
+        self.operation = operation
+        self.span = span
+
+    def set_rows(self, rows: int) -> None:
+        self.span.set_attribute("beem.rows", rows)
+        OPERATIONS_ROWS.labels(dependency=self.dependency, operation=self.operation).observe(rows)
+
+    def set_payload_bytes(self, payload_bytes: int) -> None:
+        self.span.set_attribute("beem.payload_bytes", payload_bytes)
+        OPERATIONS_PAYLOAD_BYTES.labels(dependency=self.dependency, operation=self.operation).observe(payload_bytes)
+
+
+@contextmanager
+def track_operation(dependency: str, operation: str) -> Iterator[OperationTracker]:
+    """
+    Measure a single call to a dependency (postgres, mongodb, redis, openmeteo) or a local processing step.
+    - Opens an OpenTelemetry child span named "<dependency> <operation>"
+    - Observes the duration in OPERATIONS_PROCESSING_TIME, with the trace id as exemplar
+    - Counts raised exceptions in OPERATIONS_EXCEPTIONS
+
+    Usage:
+        with track_operation("postgres", "query_get_rpg_location") as tracker:
+            records = await client.fetch(query_get_rpg_location, *params)
+            tracker.set_rows(len(records))
+    """
+    tracer = trace.get_tracer(__name__)
+    with tracer.start_as_current_span(f"{dependency} {operation}") as span:
+        span.set_attribute("beem.dependency", dependency)
+        span.set_attribute("beem.operation", operation)
+        before_time = time.perf_counter()
+        try:
+            yield OperationTracker(dependency, operation, span)
+        except BaseException as e:
+            OPERATIONS_EXCEPTIONS.labels(dependency=dependency, operation=operation,
+                                         exception_type=type(e).__name__).inc()
+            raise
+        finally:
+            after_time = time.perf_counter()
+            trace_id = trace.format_trace_id(span.get_span_context().trace_id)
+            OPERATIONS_PROCESSING_TIME.labels(dependency=dependency, operation=operation).observe(
+                after_time - before_time, exemplar={'TraceID': trace_id}
+            )
+
+
+class EventLoopMonitor:
+    """
+    Background monitor sampling the event loop health.
+    - Scheduling lag: time between the expected and the real wake up of a sleeping task
+    - Running task count
+    - Threadpool (anyio default limiter, used by FastAPI for sync routes) busy workers and queue depth
+    - Optional slow callback logger: a watchdog thread logs the event loop thread stack when the loop
+      has not been able to run the monitor for longer than slow_callback_threshold seconds
+    """
+    def __init__(self, app_name: str = "fastapi-app", interval: float = 0.5,
+                 slow_callback_threshold: Optional[float] = None) -> None:
+        self.app_name = app_name
+        self.interval = interval
+        self.slow_callback_threshold = slow_callback_threshold
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat = time.monotonic()
+
+    def start(self) -> None:
+        """
+        Start the sampling task (and the watchdog thread if a threshold is set), must be called from the running loop
+        """
+        if self._task is not None:
+            return
+        self._stop_event.clear()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+        if self.slow_callback_threshold:
+            self._watchdog = threading.Thread(target=self._watch, name="event-loop-watchdog", daemon=True)
+            self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stop_event.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=self.interval)
+            self._watchdog = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            before_time = loop.time()
+            await asyncio.sleep(self.interval)
+            self._heartbeat = time.monotonic()
+            self.sample(max(0.0, loop.time() - before_time - self.interval))
+
+    def sample(self, lag: float) -> None:
+        EVENT_LOOP_LAG.labels(app_name=self.app_name).set(lag)
+        EVENT_LOOP_LAG_HISTOGRAM.labels(app_name=self.app_name).observe(lag)
+        EVENT_LOOP_TASKS.labels(app_name=self.app_name).set(len(asyncio.all_tasks()))
+
+        statistics = anyio.to_thread.current_default_thread_limiter().statistics()
+        THREADPOOL_BUSY_WORKERS.labels(app_name=self.app_name).set(statistics.borrowed_tokens)
+        THREADPOOL_QUEUE_DEPTH.labels(app_name=self.app_name).set(statistics.tasks_waiting)
+
+    def _watch(self) -> None:
+        reported_heartbeat = None
+        while not self._stop_event.wait(self.slow_callback_threshold / 2):
+            heartbeat = self._heartbeat
+            blocked_for = time.monotonic() - heartbeat - self.interval
+            # Report a blocking callback only once
+            if blocked_for < self.slow_callback_threshold or heartbeat == reported_heartbeat:
+                continue
+            reported_heartbeat = heartbeat
+
+            SLOW_CALLBACKS.labels(app_name=self.app_name).inc()
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "unavailable"
+            logger.warning(f"Event loop blocked for more than {blocked_for:.3f}s, loop thread stack:\n{stack}")
+
+
+def instrument_app(app: ASGIApp) -> None:
+    # Spans are created through the global tracer provider, set per worker by setting_otlp (lifespan)
+    FastAPIInstrumentor.instrument_app(app)
+
 
+def setting_otlp(app_name: str, endpoint: str, log_correlation: bool = True) -> "TracerProvider":
+    # Exporter, SDK & logging instrumentation imported per worker in the lifespan (API startup time)
+    from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+    from opentelemetry.instrumentation.logging import LoggingInstrumentor
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
 
-def setting_otlp(app: ASGIApp, app_name: str, endpoint: str, log_correlation: bool = True) -> None:
     # Setting OpenTelemetry
     # set the service name to show in traces
     resource = Resource.create(attributes={
@@ -139,4 +385,4 @@ def setting_otlp(app: ASGIApp, app_name: str, endpoint: str, log_correlation: bo
     if log_correlation:
         LoggingInstrumentor().instrument(set_logging_format=True)
 
-    FastAPIInstrumentor.instrument_app(app, tracer_provider=tracer)
+    return tracer
@@ -0,0 +1,228 @@
+#api/utils/postgres_requests/carto_preparation_requests.py
+
+
+# Lib
+###
+
+
+"""
+REQUESTS
+- Contains POSTGRES requests preparing the cartographic data (maintenance/prepare_carto.py)
+- The prepared tables store the geometries already made valid and projected into the SRID of their territory (carto_srid)
+- Partitioned by year (list), each year subpartitioned by srid (territory): with the year & srid params of the carto queries,
+  the planner only reads one leaf and its GiST index, whatever the number of years loaded
+- A year is built in a staging table then attached (ATTACH PARTITION does not block the carto queries)
+- Land cover summaries of the hives locations (hive_landcover_summary), dropped with the year they were built from
+"""
+
+
+
+# Prepared datasets: source table, prepared table, year column, attribute columns copied as is
+prepared_datasets:dict = {
+    "rpg": {
+        "source": "registre_parcellaire_graphique",
+        "prepared": "registre_parcellaire_graphique_prepared",
+        "year_column": "annee_rpg",
+        "columns": ("code_culture", "bio2"),
+    },
+    "clc": {
+        "source": "corine_land_cover",
+        "prepared": "corine_land_cover_prepared",
+        "year_column": "annee_clc",
+        "columns": ("code_18",),
+    },
+}
+
+# Subpartitions of each year: all the SRID returned by carto_srid (same as get_projection)
+carto_srids:tuple = (2154, 2972, 2975, 4471, 5490)
+
+
+
+"""
+Schema
+"""
+# Same territories & SRID as utils/common_functions.py get_projection
+query_create_carto_srid_function:str = (
+    "CREATE OR REPLACE FUNCTION carto_srid(lat DOUBLE PRECISION, lon DOUBLE PRECISION) RETURNS INTEGER " \
+    "LANGUAGE SQL IMMUTABLE PARALLEL SAFE AS $$ " \
+    "SELECT CASE " \
+    "WHEN lat < -20.8 AND lat > -21.5 AND lon < 56 AND lon > 55 THEN 2975 " \
+    "WHEN lon < -60 AND lon > -61.5 AND lat < 15 AND lat > 14 THEN 5490 " \
+    "WHEN lon < -60.5 AND lon > -62 AND lat < 16.6 AND lat > 15.8 THEN 5490 " \
+    "WHEN lon < -51.1 AND lon > -55.5 AND lat < 6 AND lat > 2 THEN 2972 " \
+    "WHEN lon < 45.5 AND lon > 44.5 AND lat < -12 AND lat > -13 THEN 4471 " \
+    "ELSE 2154 END " \
+    "$$;"
+)
+
+query_create_rpg_prepared_table:str = (
+    "CREATE TABLE IF NOT EXISTS registre_parcellaire_graphique_prepared ( " \
+    "code_culture VARCHAR(5) NOT NULL, " \
+    "bio2 INTEGER, " \
+    "annee_rpg INTEGER NOT NULL, " \
+    "srid INTEGER NOT NULL, " \
+    "geometry geometry NOT NULL" \
+    ") PARTITION BY LIST (annee_rpg);"
+)
+
+query_create_clc_prepared_table:str = (
+    "CREATE TABLE IF NOT EXISTS corine_land_cover_prepared ( " \
+    "code_18 VARCHAR(3) NOT NULL, " \
+    "annee_clc INTEGER NOT NULL, " \
+    "srid INTEGER NOT NULL, " \
+    "geometry geometry NOT NULL" \
+    ") PARTITION BY LIST (annee_clc);"
+)
+
+# Land cover summaries around the hives (area & share per RPG culture / CLC class), built on demand by the carto summary route
+# and in batch by maintenance/build_landcover_summary.py. A row of hive_landcover_summary_builds marks a (location, radius, dataset, year)
+# as built, even if nothing intersects its area
+query_create_landcover_summary_table:str = (
+    "CREATE TABLE IF NOT EXISTS hive_landcover_summary ( " \
+    "latitude DOUBLE PRECISION NOT NULL, " \
+    "longitude DOUBLE PRECISION NOT NULL, " \
+    "radius DOUBLE PRECISION NOT NULL, " \
+    "dataset VARCHAR(3) NOT NULL, " \
+    "year INTEGER NOT NULL, " \
+    "code VARCHAR(5) NOT NULL, " \
+    "aire DOUBLE PRECISION NOT NULL, " \
+    "aire_bio DOUBLE PRECISION, " \
+    "part DOUBLE PRECISION NOT NULL, " \
+    "PRIMARY KEY (latitude, longitude, radius, dataset, year, code)" \
+    ");"
+)
+
+query_create_landcover_summary_builds_table:str = (
+    "CREATE TABLE IF NOT EXISTS hive_landcover_summary_builds ( " \
+    "latitude DOUBLE PRECISION NOT NULL, " \
+    "longitude DOUBLE PRECISION NOT NULL, " \
+    "radius DOUBLE PRECISION NOT NULL, " \
+    "dataset VARCHAR(3) NOT NULL, " \
+    "year INTEGER NOT NULL, " \
+    "built_at TIMESTAMP NOT NULL DEFAULT now(), " \
+    "PRIMARY KEY (latitude, longitude, radius, dataset, year)" \
+    ");"
+)
+
+# Params: $1: dataset, $2: year. Summaries of a reloaded year, built again on the next request
+query_delete_landcover_summary_year:str = (
+    "WITH builds AS (DELETE FROM hive_landcover_summary_builds WHERE dataset = $1 AND year = $2) " \
+    "DELETE FROM hive_landcover_summary WHERE dataset = $1 AND year = $2;"
+)
+
+# Params: $1: table name. Returns "p" (partitioned), "r" (table, layout before partitioning) or None
+query_get_relation_kind:str = "SELECT relkind::text FROM pg_class WHERE oid = to_regclass($1);"
+
+
+
+def query_create_prepared_index(dataset:str) -> str:
+    """
+    GiST index of the partitioned table: created on each leaf, the staging indexes are attached with their year
+    """
+    table = prepared_datasets[dataset]
+    return f"CREATE INDEX IF NOT EXISTS {table['prepared']}_geometry_idx ON {table['prepared']} USING GIST (geometry);"
+
+
+
+def get_partition_name(dataset:str, year:int, suffix:str = "") -> str:
+    """
+    Name of the partition of a year (suffix: "_staging" while built, "_old" while replaced), year is cast to int (DDL is not parameterized)
+    """
+    return f"{prepared_datasets[dataset]['prepared']}_{int(year)}{suffix}"
+
+
+
+def query_drop_table(name:str) -> str:
+    return f"DROP TABLE IF EXISTS {name};"
+
+
+
+def query_rename_table(name:str, new_name:str) -> str:
+    return f"ALTER TABLE {name} RENAME TO {new_name};"
+
+
+
+"""
+Data preparation (one year of one dataset, built in a staging table)
+"""
+def query_get_source_years(dataset:str) -> str:
+    """
+    Params: none. Returns the years available in the source table
+    """
+    table = prepared_datasets[dataset]
+    return f"SELECT DISTINCT {table['year_column']} AS year FROM {table['source']} ORDER BY 1;"
+
+
+
+def query_create_staging_year(dataset:str, year:int) -> str:
+    """
+    Staging table of a year, same columns as the prepared table, subpartitioned by srid
+    """
+    table = prepared_datasets[dataset]
+    return f"CREATE TABLE {get_partition_name(dataset, year, '_staging')} (LIKE {table['prepared']}) PARTITION BY LIST (srid);"
+
+
+
+def query_create_staging_srid_partition(dataset:str, year:int, srid:int) -> str:
+    staging = get_partition_name(dataset, year, "_staging")
+    return f"CREATE TABLE {staging}_{int(srid)} PARTITION OF {staging} FOR VALUES IN ({int(srid)});"
+
+
+
+def query_insert_prepared_year(dataset:str, year:int) -> str:
+    """
+    Params: $1: year (int)
+    - Geometries made valid (polygons only), projected into the SRID of the territory of their point on surface
+    """
+    table = prepared_datasets[dataset]
+    columns = ", ".join(table["columns"])
+    source_columns = ", ".join(f"s.{column}" for column in table["columns"])
+    return (
+        f"INSERT INTO {get_partition_name(dataset, year, '_staging')} ({columns}, {table['year_column']}, srid, geometry) " \
+        f"SELECT {source_columns}, s.{table['year_column']}, p.srid, ST_Transform(ST_CollectionExtract(ST_MakeValid(s.geometry), 3), p.srid) " \
+        f"FROM {table['source']} s " \
+        f"CROSS JOIN LATERAL (SELECT carto_srid(ST_Y(ST_PointOnSurface(s.geometry)), ST_X(ST_PointOnSurface(s.geometry))) AS srid) p " \
+        f"WHERE s.{table['year_column']} = $1 AND NOT ST_IsEmpty(s.geometry);"
+    )
+
+
+
+def query_create_staging_index(dataset:str, year:int) -> str:
+    """
+    GiST index of the staging leaves, built before the attach (nothing is indexed under lock)
+    """
+    return f"CREATE INDEX ON {get_partition_name(dataset, year, '_staging')} USING GIST (geometry);"
+
+
+
+def query_add_staging_year_check(dataset:str, year:int) -> str:
+    """
+    Constraint matching the partition bound: ATTACH PARTITION skips the validation scan of the year
+    """
+    year_column = prepared_datasets[dataset]["year_column"]
+    return (
+        f"ALTER TABLE {get_partition_name(dataset, year, '_staging')} ADD CONSTRAINT {get_partition_name(dataset, year)}_check " \
+        f"CHECK ({year_column} IS NOT NULL AND {year_column} = {int(year)});"
+    )
+
+
+
+"""
+Swap (short transaction)
+"""
+def query_detach_year(dataset:str, year:int) -> str:
+    return f"ALTER TABLE {prepared_datasets[dataset]['prepared']} DETACH PARTITION {get_partition_name(dataset, year)};"
+
+
+
+def query_attach_year(dataset:str, year:int) -> str:
+    return f"ALTER TABLE {prepared_datasets[dataset]['prepared']} ATTACH PARTITION {get_partition_name(dataset, year)} FOR VALUES IN ({int(year)});"
+
+
+
+def query_drop_year_check(dataset:str, year:int) -> str:
+    """
+    The constraint is implied by the partition bound once attached
+    """
+    partition = get_partition_name(dataset, year)
+    return f"ALTER TABLE {partition} DROP CONSTRAINT {partition}_check;"
@@ -18,36 +18,117 @@ Queries that return data
 
 
  # Params: $1: lat, $2: lon, $3: rayon, $4: source_parcellaire, $5: projection, $6: emplacement
+# Geometries prepared by maintenance/prepare_carto.py (valid, projected in $5): only the intersection is computed per request
+# annee & srid compared to the params as is (partition keys): planned with their values, only the (year, srid) leaf is read
 query_get_rpg_location = (
-    "SELECT rpg.culture, rpg.bio2 AS bio, rpg.legende, rpg.couleur, CONCAT('RPG ', $4) AS source, $6 AS emplacement, "
-    "((st_area(st_transform(rpg.geometry, CAST($5 AS INTEGER))))/10000) AS aire, rpg.geometry "
+    "SELECT rc.libelle_culture AS culture, rpg.bio2 AS bio, rg.libelle_apicole AS legende, rg.couleur, CONCAT('RPG ', $4) AS source, $6 AS emplacement, "
+    "(st_area(rpg.geometry)/10000) AS aire, st_transform(rpg.geometry, 4326) AS geometry "
     "FROM ( "
-    "SELECT rc.libelle_culture AS culture, r.bio2, rg.libelle_apicole AS legende, rg.couleur, "
-    "st_intersection(ST_MakeValid(r.geometry), (SELECT "
-    "st_transform(ST_Buffer(st_transform(st_SetSRID "
-    "(ST_point($2, $1), 4326), CAST($5 AS INTEGER)), $3, 10), 4326))) AS geometry "
-    "FROM registre_parcellaire_graphique r "
-    "JOIN rpg_code_culture rc ON r.code_culture=rc.code_culture "
-    "JOIN rpg_typologie_apicole rg ON rc.code_apicole=rg.code_apicole "
-    "WHERE r.annee_rpg=$4 and st_intersects(r.geometry, (SELECT st_transform(ST_Buffer(st_transform(st_SetSRID "
-    "(ST_point($2, $1), 4326), CAST($5 AS INTEGER)), $3, 10), 4326))) "
-    ") rpg"
+    "SELECT r.code_culture, r.bio2, st_intersection(r.geometry, area.geometry) AS geometry "
+    "FROM registre_parcellaire_graphique_prepared r, "
+    "(SELECT ST_Buffer(st_transform(st_SetSRID(ST_point($2, $1), 4326), CAST($5 AS INTEGER)), $3, 10) AS geometry) area "
+    "WHERE r.annee_rpg=$4 AND r.srid=CAST($5 AS INTEGER) AND st_intersects(r.geometry, area.geometry) "
+    ") rpg "
+    "JOIN rpg_code_culture rc ON rpg.code_culture=rc.code_culture "
+    "JOIN rpg_typologie_apicole rg ON rc.code_apicole=rg.code_apicole"
 )
 
 # Params: $1: lat, $2: lon, $3: rayon, $4: source_parcellaire, $5: projection, $6: emplacement
+# Geometries prepared by maintenance/prepare_carto.py (valid, projected in $5): only the intersection is computed per request
+# annee & srid compared to the params as is (partition keys): planned with their values, only the (year, srid) leaf is read
 query_get_clc_location = (
-    "SELECT clc.legende, clc.couleur, CONCAT('CLC ', $4) AS source, $6 AS emplacement, "
-    "((st_area(st_transform(clc.geometry, CAST($5 AS INTEGER))))/10000) AS aire, clc.geometry "
+    "SELECT lc.libelle_clc AS legende, lc.couleur, CONCAT('CLC ', $4) AS source, $6 AS emplacement, "
+    "(st_area(clc.geometry)/10000) AS aire, st_transform(clc.geometry, 4326) AS geometry "
     "FROM ( "
-    "SELECT lc.libelle_clc AS legende, lc.couleur, "
-    "st_intersection(ST_MakeValid(c.geometry), (SELECT "
-    "st_transform(ST_Buffer(st_transform(st_SetSRID "
-    "(ST_point($2, $1), 4326), CAST($5 AS INTEGER)), $3, 10), 4326))) AS geometry "
-    "FROM corine_land_cover c "
-    "JOIN libelle_clc lc ON lc.code_18=c.code_18 "
-    "WHERE c.annee_clc=$4 and st_intersects(c.geometry, (SELECT st_transform(ST_Buffer(st_transform(st_SetSRID "
-    "(ST_point($2, $1), 4326), CAST($5 AS INTEGER)), $3, 10), 4326))) "
-    ") clc"
+    "SELECT c.code_18, st_intersection(c.geometry, area.geometry) AS geometry "
+    "FROM corine_land_cover_prepared c, "
+    "(SELECT ST_Buffer(st_transform(st_SetSRID(ST_point($2, $1), 4326), CAST($5 AS INTEGER)), $3, 10) AS geometry) area "
+    "WHERE c.annee_clc=$4 AND c.srid=CAST($5 AS INTEGER) AND st_intersects(c.geometry, area.geometry) "
+    ") clc "
+    "JOIN libelle_clc lc ON lc.code_18=clc.code_18"
+)
+
+
+
+"""
+Land cover summaries (hive_landcover_summary, schema created by maintenance/prepare_carto.py)
+"""
+# Params: $1: lats (float[]), $2: lons (float[]), $3: rayon, $4: annee, $5: projection (of all the locations, distinct locations)
+# Area (ha) & share of the buffer per location & culture (organic area apart), the builds are recorded even if nothing intersects
+query_build_rpg_summary = (
+    "WITH locations AS ( "
+    "SELECT l.latitude, l.longitude, ST_Buffer(st_transform(st_SetSRID(ST_point(l.longitude, l.latitude), 4326), CAST($5 AS INTEGER)), $3, 10) AS geometry "
+    "FROM unnest($1::double precision[], $2::double precision[]) AS l(latitude, longitude) "
+    "), "
+    "parcels AS ( "
+    "SELECT l.latitude, l.longitude, r.code_culture, r.bio2, st_area(st_intersection(r.geometry, l.geometry)) AS aire, st_area(l.geometry) AS aire_buffer "
+    "FROM locations l "
+    "JOIN registre_parcellaire_graphique_prepared r ON r.annee_rpg=$4 AND r.srid=CAST($5 AS INTEGER) AND st_intersects(r.geometry, l.geometry) "
+    "), "
+    "summary AS ( "
+    "INSERT INTO hive_landcover_summary (latitude, longitude, radius, dataset, year, code, aire, aire_bio, part) "
+    "SELECT p.latitude, p.longitude, $3, 'rpg', $4, p.code_culture, SUM(p.aire)/10000, COALESCE(SUM(p.aire) FILTER (WHERE p.bio2 = 1), 0)/10000, "
+    "SUM(p.aire)/MAX(p.aire_buffer) "
+    "FROM parcels p GROUP BY p.latitude, p.longitude, p.code_culture "
+    "ON CONFLICT (latitude, longitude, radius, dataset, year, code) DO UPDATE SET aire=EXCLUDED.aire, aire_bio=EXCLUDED.aire_bio, part=EXCLUDED.part "
+    ") "
+    "INSERT INTO hive_landcover_summary_builds (latitude, longitude, radius, dataset, year) "
+    "SELECT l.latitude, l.longitude, $3, 'rpg', $4 FROM locations l "
+    "ON CONFLICT (latitude, longitude, radius, dataset, year) DO UPDATE SET built_at=now()"
+)
+
+# Params: $1: lats (float[]), $2: lons (float[]), $3: rayon, $4: annee, $5: projection (of all the locations, distinct locations)
+query_build_clc_summary = (
+    "WITH locations AS ( "
+    "SELECT l.latitude, l.longitude, ST_Buffer(st_transform(st_SetSRID(ST_point(l.longitude, l.latitude), 4326), CAST($5 AS INTEGER)), $3, 10) AS geometry "
+    "FROM unnest($1::double precision[], $2::double precision[]) AS l(latitude, longitude) "
+    "), "
+    "polygons AS ( "
+    "SELECT l.latitude, l.longitude, c.code_18, st_area(st_intersection(c.geometry, l.geometry)) AS aire, st_area(l.geometry) AS aire_buffer "
+    "FROM locations l "
+    "JOIN corine_land_cover_prepared c ON c.annee_clc=$4 AND c.srid=CAST($5 AS INTEGER) AND st_intersects(c.geometry, l.geometry) "
+    "), "
+    "summary AS ( "
+    "INSERT INTO hive_landcover_summary (latitude, longitude, radius, dataset, year, code, aire, part) "
+    "SELECT p.latitude, p.longitude, $3, 'clc', $4, p.code_18, SUM(p.aire)/10000, SUM(p.aire)/MAX(p.aire_buffer) "
+    "FROM polygons p GROUP BY p.latitude, p.longitude, p.code_18 "
+    "ON CONFLICT (latitude, longitude, radius, dataset, year, code) DO UPDATE SET aire=EXCLUDED.aire, part=EXCLUDED.part "
+    ") "
+    "INSERT INTO hive_landcover_summary_builds (latitude, longitude, radius, dataset, year) "
+    "SELECT l.latitude, l.longitude, $3, 'clc', $4 FROM locations l "
+    "ON CONFLICT (latitude, longitude, radius, dataset, year) DO UPDATE SET built_at=now()"
+)
+
+# Params: $1: lat, $2: lon, $3: rayon. Returns the (dataset, year) already built for the location
+query_get_built_summaries = (
+    "SELECT dataset, year FROM hive_landcover_summary_builds "
+    "WHERE latitude=$1 AND longitude=$2 AND radius=$3"
+)
+
+# Params: $1: rayon, $2: dataset, $3: annee. Returns the locations already built
+query_get_built_locations = (
+    "SELECT latitude, longitude FROM hive_landcover_summary_builds "
+    "WHERE radius=$1 AND dataset=$2 AND year=$3"
+)
+
+# Params: $1: lat, $2: lon, $3: rayon, $4: annees (int[])
+query_get_rpg_summary = (
+    "SELECT s.year AS annee, s.code AS code_culture, rc.libelle_culture AS culture, rg.libelle_apicole AS legende, rg.couleur, "
+    "s.aire, s.aire_bio, s.part "
+    "FROM hive_landcover_summary s "
+    "JOIN rpg_code_culture rc ON s.code=rc.code_culture "
+    "JOIN rpg_typologie_apicole rg ON rc.code_apicole=rg.code_apicole "
+    "WHERE s.latitude=$1 AND s.longitude=$2 AND s.radius=$3 AND s.dataset='rpg' AND s.year=ANY($4::integer[]) "
+    "ORDER BY s.year, s.part DESC"
+)
+
+# Params: $1: lat, $2: lon, $3: rayon, $4: annees (int[])
+query_get_clc_summary = (
+    "SELECT s.year AS annee, s.code AS code_18, lc.libelle_clc AS legende, lc.couleur, s.aire, s.part "
+    "FROM hive_landcover_summary s "
+    "JOIN libelle_clc lc ON s.code=lc.code_18 "
+    "WHERE s.latitude=$1 AND s.longitude=$2 AND s.radius=$3 AND s.dataset='clc' AND s.year=ANY($4::integer[]) "
+    "ORDER BY s.year, s.part DESC"
 )
 
 
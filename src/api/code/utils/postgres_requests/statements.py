@@ -0,0 +1,50 @@
+#api/utils/postgres_requests/statements.py
+
+
+# Lib
+from utils.postgres_requests.user_requests import query_get_username, query_get_existing_usernames, query_get_user_credentials_in_database, query_get_user_secure_data, query_get_user_info_data
+from utils.postgres_requests.user_requests import query_insert_new_user, query_insert_user_info, query_insert_user_log, query_register_user
+from utils.postgres_requests.user_requests import query_update_user_info_data, query_force_user_verified_true, query_update_user_password, query_update_user_last_login
+from utils.postgres_requests.cartographic_requests import query_get_rpg_location, query_get_clc_location
+from utils.postgres_requests.cartographic_requests import query_build_rpg_summary, query_build_clc_summary, query_get_built_summaries, query_get_built_locations, query_get_rpg_summary, query_get_clc_summary
+
+
+"""
+STATEMENTS REGISTRY
+- Statements prepared into the statement cache of each new pooled connection, by database (services/postgres_connectors.py, get_statements_preparer)
+- Executed by name (run_statement), the name is also the label of the execution counts metric
+"""
+
+
+
+user_statements:dict = {
+    "query_get_username": query_get_username,
+    "query_get_existing_usernames": query_get_existing_usernames,
+    "query_get_user_credentials_in_database": query_get_user_credentials_in_database,
+    "query_get_user_secure_data": query_get_user_secure_data,
+    "query_get_user_info_data": query_get_user_info_data,
+    "query_insert_new_user": query_insert_new_user,
+    "query_insert_user_info": query_insert_user_info,
+    "query_insert_user_log": query_insert_user_log,
+    "query_register_user": query_register_user,
+    "query_update_user_info_data": query_update_user_info_data,
+    "query_force_user_verified_true": query_force_user_verified_true,
+    "query_update_user_password": query_update_user_password,
+    "query_update_user_last_login": query_update_user_last_login,
+}
+
+
+carto_statements:dict = {
+    "query_get_rpg_location": query_get_rpg_location,
+    "query_get_clc_location": query_get_clc_location,
+    "query_build_rpg_summary": query_build_rpg_summary,
+    "query_build_clc_summary": query_build_clc_summary,
+    "query_get_built_summaries": query_get_built_summaries,
+    "query_get_built_locations": query_get_built_locations,
+    "query_get_rpg_summary": query_get_rpg_summary,
+    "query_get_clc_summary": query_get_clc_summary,
+}
+
+
+# All statements by name (query text sent on connections without prepared statements)
+statements:dict = {**user_statements, **carto_statements}
@@ -24,6 +24,13 @@ query_get_username:str = (
     "WHERE username = $1;"
     )
 
+# Params: $1: usernames (list of str)
+query_get_existing_usernames:str = (
+    "SELECT username " \
+    "FROM users " \
+    "WHERE username = ANY($1::varchar[])"
+    )
+
 # Params: $1: username (str)
 query_get_user_credentials_in_database:str = (
     "SELECT username, password, verified " \
@@ -75,21 +82,41 @@ query_insert_user_log:str = (
     "VALUES ($1, $2, $3, $4);"
 )
 
+# Registration in one statement (atomic, one round trip): users, user_infos & user_logs rows
+# Params: $1: id (uuid4), $2: username (str), $3: password (str), $4: role (int), $5: verified (bool), $6: email (str),
+#         $7: created_at (datetime), $8: updated_at (datetime), $9: last_login (datetime)
+query_register_user:str = (
+    "WITH new_user AS ( " \
+    "INSERT INTO users (id, username, password, role, verified) " \
+    "VALUES ($1, $2, $3, $4, $5) RETURNING id" \
+    "), new_user_info AS ( " \
+    "INSERT INTO user_infos (user_id, email) " \
+    "SELECT id, $6 FROM new_user" \
+    ") " \
+    "INSERT INTO user_logs (user_id, created_at, updated_at, last_login) " \
+    "SELECT id, $7, $8, $9 FROM new_user;"
+)
 
-# Params: $1: username (str), $2: updated_informations (dict)
-def query_update_user_info_data(user_id_to_update:str, info_to_update:dict) -> None:
-    """
-    
-    """
-    values_to_set = ", ".join([f"{key} = '{value}'" for key, value in info_to_update.items()])
-        
-    query: str = f"""
-    UPDATE user_infos
-    SET {values_to_set}
-    WHERE user_id = '{user_id_to_update}';
-    """
-
-    return query
+# Columns of the bulk import (copy_records_to_table), in the order of the records
+users_import_columns:dict = {
+    "users": ("id", "username", "password", "role", "verified"),
+    "user_infos": ("user_id", "email"),
+    "user_logs": ("user_id", "created_at", "updated_at", "last_login"),
+}
+
+
+# User informations updatable by the user, in the order of query_update_user_info_data params
+user_info_fields:tuple = ("address", "zipcode", "city", "country", "phone", "email")
+
+# Params: $1: user_id (uuid4), $2: address (str), $3: zipcode (str), $4: city (str), $5: country (str), $6: phone (str), $7: email (str)
+# A NULL param keeps the current value, returns the username (users cache invalidation)
+query_update_user_info_data:str = (
+    "UPDATE user_infos " \
+    "SET address = COALESCE($2, address), zipcode = COALESCE($3, zipcode), city = COALESCE($4, city), " \
+    "country = COALESCE($5, country), phone = COALESCE($6, phone), email = COALESCE($7, email) " \
+    "WHERE user_id = $1 " \
+    "RETURNING (SELECT username FROM users WHERE id = user_infos.user_id);"
+)
 
 
 
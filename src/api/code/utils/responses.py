@@ -0,0 +1,43 @@
+# api/utils/responses.py
+
+
+# Lib
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+
+
+"""
+Fast JSON response
+- orjson serializes dicts, lists, str, numbers, UUID, datetime and numpy arrays natively (NaN -> null)
+- default handles the remaining types returned by the services (pandas Timestamp, Decimal, numpy scalars, ...)
+"""
+def orjson_default(obj: Any) -> Any:
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if type(obj).__module__ == "numpy" and hasattr(obj, "item"):
+        # numpy scalars, checked without importing numpy (API startup time)
+        return obj.item()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode = "json")
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+
+class FastJSONResponse(ORJSONResponse):
+    """
+    App-wide default response class (orjson with numpy and datetime support)
+    """
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content,
+                            default = orjson_default,
+                            option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
@@ -9,5 +9,9 @@ db = db.getSiblingDB("data_user_beegis");
 db.createCollection("locations");
 db.createCollection("hives");
 
+// Index de la recherche géographique (routes nearby) : position GeoJSON des emplacements, ruches par propriétaire
+db.locations.createIndex({position: "2dsphere", owner: 1}, {name: "position_owner"});
+db.hives.createIndex({owner: 1, location_name: 1}, {name: "owner_location_name"});
+
 // Afficher un message de confirmation
 print("Database and initial data have been set up successfully!");
\ No newline at end of file
@@ -13,10 +13,27 @@ DEBUG=True
 # Logging
 LOGGER=False
 LOG_FILE_PATH=/app/logs/api.log
+LOG_BODY_MAX_BYTES=4096
+LOG_SAMPLE_RATE=1.0
+
+# Production server (server.py), API_WORKERS defaults to the CPU count
+API_WORKERS=4
+API_LOOP=uvloop
+API_HTTP=httptools
+API_BACKLOG=2048
+API_KEEP_ALIVE=5
+API_GRACEFUL_SHUTDOWN_TIMEOUT=20
+# PROMETHEUS_MULTIPROC_DIR=/tmp/prometheus_multiproc     # Set by server.py with several workers, only set it to move the directory
+
+# Monitoring (leave SLOW_CALLBACK_THRESHOLD empty to disable the slow callback logger)
+EVENT_LOOP_MONITOR_INTERVAL=0.5
+SLOW_CALLBACK_THRESHOLD=0.25
 
 # Route limiter
 LIMITER_TYPE=user  # Change to ip if needed
 DEFAULT_LIMITS_FOR_LIMITER=60/minute
+LIMITER_STORAGE_URI=redis://beem-redis:6379/1
+LIMITER_STRATEGY=moving-window
 STATUS_LIMIT=5/minute
 DATABASE_CHECK_LIMIT=5/minute
 TEST_LIMIT=10/minute
@@ -31,6 +48,10 @@ CARTO_LIMIT=60/minute
 HASH_ALGORITHM=argon2
 ENCODING_ALGORITHM=HS256
 ACCESS_TOKEN_EXPIRATION_IN_MINUTES=60
+JWT_CACHE_SIZE=1024
+USER_CACHE_SIZE=4096
+USER_CACHE_TTL=30
+USER_CACHE_REDIS_INVALIDATION=False
 
 # Database connections
 POSTGRES_HOST=postgres_beem
@@ -44,11 +65,29 @@ MONGODB_API_USER=jag
 MONGODB_DATABASE=data_user_beegis
 MONGODB_LOCATION_COLLECTION_NAME=locations
 MONGODB_HIVES_COLLECTION_NAME=hives
+GEO_SEARCH_MAX_DISTANCE=50000
+GEO_SEARCH_PAGE_SIZE=50
+GEO_SEARCH_MAX_PAGE_SIZE=200
 REDIS_HOST=beem-redis
 REDIS_PORT=6379
+OBJECT_VERSION_TIMEOUT=0.2
+HEALTH_PROBE_TIMEOUT=2
+HEALTH_CACHE_TTL=5
+POSTGRES_POOL_MIN_SIZE=1
+POSTGRES_POOL_MAX_SIZE=10
 
 # Cartographic data types
 AVAILABLE_CARTO_DATA_TYPES=rpg,clc,forest_v2,c1l
+CARTO_CACHE_MAX_BYTES=67108864
+CARTO_CACHE_TTL=3600
+CARTO_DATA_VERSION=1
+CARTO_SUMMARY_PRECISION=5
+CARTO_SUMMARY_MAX_LOCATIONS=500
+CARTO_SUMMARY_MAX_BUILDS=20
+
+# Responses compression (br, zstd, gzip)
+COMPRESSION_MINIMUM_SIZE=1024
+COMPRESSION_CONTENT_TYPES=application/json,application/geo+json,text/plain,text/html
 
 EOF
 